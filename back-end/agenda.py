@@ -0,0 +1,72 @@
+"""
+Agenda: "what should I do next" for a user
+
+Open activities (not 'fatta') in three groups, filled in order up to a
+total limit:
+
+- overdue: ended before today, oldest first, then by priority and time
+- today: in progress today (including multi-day ones), by time and priority
+- upcoming: starting after today, by date, priority and time
+
+Every group is read with one query per open status on the index
+(user_id, status, date, priority_rank, time), each with a LIMIT, and the
+per-status results are merged: only the top items are read, never the
+user's completed history.
+"""
+from datetime import date
+from typing import Dict, List
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models_fastapi import Activity, priority_to_rank
+from serializers import select_activity_rows
+
+OPEN_STATUSES = ('da-fare', 'in-corso', 'rimandata')
+
+
+def _by_date(activity: dict) -> tuple:
+    return activity['date'], priority_to_rank(activity['priority']), activity['time'] or ''
+
+
+def _by_time(activity: dict) -> tuple:
+    return activity['time'] or '', priority_to_rank(activity['priority'])
+
+
+def build_agenda(db: Session, user_id: int, today: date, limit: int) -> Dict[str, object]:
+    """
+    Return the agenda of `user_id` as of `today` with at most `limit` items
+
+    Returns:
+        {'date': ..., 'overdue': [...], 'today': [...], 'upcoming': [...]}
+    """
+    due = func.coalesce(Activity.end_date, Activity.date)
+    by_date = (Activity.date, Activity.priority_rank, Activity.time)
+    groups = (
+        ('overdue', (Activity.date < today, due < today), by_date, _by_date),
+        ('today', (Activity.date <= today, due >= today), (Activity.time, Activity.priority_rank), _by_time),
+        ('upcoming', (Activity.date > today,), by_date, _by_date),
+    )
+
+    agenda: Dict[str, object] = {'date': today.isoformat()}
+    remaining = limit
+
+    for name, criteria, order_by, sort_key in groups:
+        items: List[dict] = []
+        if remaining > 0:
+            for status in OPEN_STATUSES:
+                items.extend(select_activity_rows(
+                    db,
+                    Activity.user_id == user_id,
+                    Activity.status == status,
+                    *criteria,
+                    order_by=order_by,
+                    limit=remaining
+                ))
+            items.sort(key=sort_key)
+            del items[remaining:]
+            remaining -= len(items)
+        agenda[name] = items
+
+    return agenda
+
@@ -0,0 +1,189 @@
+"""
+Archive tier for completed activities
+
+Completed activities ('fatta') whose last day is older than
+`archive_after_days` are moved from `activities` to `activities_archive`
+(same database/shard, same id) by a periodic job, so that per-user queries
+and index scans only touch recent and upcoming items. On SQLite the archive
+is split into yearly tables (see partitions.py).
+
+Every archived row has `date` before archive_horizon(): list endpoints only
+query the archive when their filters reach before that date (see
+archive_reaches). If archive_after_days is raised, the job moves rows that
+are now inside the horizon back to `activities`.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, exists, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from config_fastapi import settings
+from database import get_shard_session
+from job_queue import enqueue, job
+from models_fastapi import Activity, ArchivedActivity, priority_rank_expression
+from partitions import archive_insert_table
+from periodic import PeriodicTask
+from serializers import ACTIVITY_COLUMNS
+from single_flight import bump_data_version
+
+ARCHIVE_STATUS = 'fatta'
+
+# Colonne copiate tra le due tabelle (archived_at ha il suo default)
+_COLUMNS = [column.key for column in ACTIVITY_COLUMNS] + ['user_id']
+
+
+def archive_horizon(today: Optional[date] = None) -> date:
+    """Activities that ended before this date can be archived"""
+    return (today or date.today()) - timedelta(days=settings.archive_after_days)
+
+
+def archive_reaches(date_from: Optional[date], status: Optional[str] = None) -> bool:
+    """True if a list query with these filters can match archived activities"""
+    if status and status != ARCHIVE_STATUS:
+        return False
+    return date_from is None or date_from < archive_horizon()
+
+
+def _move(db: Session, source, target_for: Callable[[date], object], rows: List[tuple]) -> None:
+    """
+    Move rows (id, user_id, date) from `source` to `target_for(date)`,
+    one user and target table at a time
+
+    The INSERT fails if an id is already in the target, and only the rows
+    found in the target afterwards are deleted from `source`.
+    """
+    groups = defaultdict(list)
+    for activity_id, user_id, activity_date in rows:
+        groups[(user_id, target_for(activity_date))].append(activity_id)
+
+    current_user_id = None
+    for (user_id, target), ids in groups.items():
+        if user_id != current_user_id:
+            # I trigger RLS verificano l'utente del contesto
+            db.execute(
+                text("UPDATE rls_context SET current_user_id = :user_id WHERE id = 1"),
+                {"user_id": user_id}
+            )
+            current_user_id = user_id
+        columns = [getattr(source, key) for key in _COLUMNS]
+        keys = _COLUMNS
+        if target is Activity.__table__:
+            # priority_rank esiste solo nella tabella principale
+            columns.append(priority_rank_expression(source.priority))
+            keys = _COLUMNS + ['priority_rank']
+        db.execute(insert(target).from_select(keys, select(*columns).where(source.id.in_(ids))))
+        db.execute(
+            delete(source)
+            .where(source.id.in_(select(target.c.id).where(target.c.id.in_(ids))))
+        )
+
+
+def archive_shard(db: Session, horizon: date, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Archive completed activities of one shard and restore the ones that are
+    inside the horizon again, in batches with one commit each
+
+    Rows whose id is already taken on the other side (ids reused before
+    migration 0010) are left where they are and counted as skipped.
+
+    Returns:
+        Number of archived, restored and skipped activities
+    """
+    counts = {'archived': 0, 'restored': 0, 'skipped': 0}
+    passes = (
+        # Su SQLite l'archivio è diviso per anno (partitions.py)
+        ('archived', Activity, ArchivedActivity,
+         lambda activity_date: archive_insert_table(db, activity_date.year), (
+             Activity.status == ARCHIVE_STATUS,
+             func.coalesce(Activity.end_date, Activity.date) < horizon
+         )),
+        ('restored', ArchivedActivity, Activity, lambda activity_date: Activity.__table__, (
+            ArchivedActivity.date >= horizon,
+        )),
+    )
+
+    for key, source, other, target_for, criteria in passes:
+        taken = exists().where(other.id == source.id)
+        skipped = db.execute(select(func.count()).select_from(source).where(*criteria, taken)).scalar()
+        if skipped:
+            print(f"⚠️  Archivio attività: {skipped} attività non spostate, id già presente in {other.__tablename__}")
+            counts['skipped'] += skipped
+
+        while True:
+            rows = db.execute(
+                select(source.id, source.user_id, source.date).where(*criteria, ~taken).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            try:
+                _move(db, source, target_for, rows)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            # Liste e statistiche in cache cambiano: anche l'archivio vi è incluso
+            for user_id in {row.user_id for row in rows}:
+                bump_data_version(user_id)
+            counts[key] += len(rows)
+            if len(rows) < batch_size:
+                break
+
+    return counts
+
+
+def archive_activities() -> Dict[str, int]:
+    """Run the archive job on every shard"""
+    horizon = archive_horizon()
+    totals = {'archived': 0, 'restored': 0, 'skipped': 0}
+
+    for shard in range(settings.shard_count):
+        db = get_shard_session(shard)
+        try:
+            counts = archive_shard(db, horizon, settings.archive_batch_size)
+        finally:
+            db.close()
+        for key, count in counts.items():
+            totals[key] += count
+
+    if totals['archived'] or totals['restored']:
+        print(f"🗄️  Archivio attività: {totals['archived']} archiviate, {totals['restored']} ripristinate")
+    return totals
+
+
+@job('archive')
+def _archive_job(payload: dict) -> None:
+    archive_activities()
+
+
+_task: Optional[PeriodicTask] = None
+
+
+def start_archiver() -> None:
+    """
+    Start the periodic archive job (no-op if disabled)
+
+    The timer only enqueues the job: it runs on a job queue worker, once
+    even with several server processes.
+    """
+    global _task
+
+    if settings.archive_enabled and _task is None:
+        _task = PeriodicTask(
+            'activity-archive', settings.archive_interval_seconds, lambda: enqueue('archive', unique=True)
+        ).start()
+
+
+def stop_archiver() -> None:
+    """Stop the periodic archive job (called on application shutdown)"""
+    global _task
+
+    if _task is not None:
+        _task.stop()
+        _task = None
+
+
+if __name__ == '__main__':
+    # Esecuzione manuale: python archive.py
+    print(archive_activities())
@@ -1,26 +1,42 @@
 """
 JWT Authentication for FastAPI
 """
+import time
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from config_fastapi import settings
 from database import get_db
 from models_fastapi import User
+import queries
+from jwt_backends import TokenCache, get_jwt_backend
+from token_revocation import get_revocation_store
 
 # Security scheme
 security = HTTPBearer()
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+# Claims dei token verificati di recente (lo stesso token arriva a ogni richiesta)
+token_cache = TokenCache(settings.jwt_cache_size)
+
+# Tipi di token (claim "type"); i token senza tipo sono access token
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+
+def create_access_token(
+    data: dict,
+    expires_delta: Optional[timedelta] = None,
+    token_type: str = ACCESS_TOKEN
+) -> str:
     """
     Create JWT access token
     
     Args:
         data: Dictionary with user data (typically user_id)
         expires_delta: Optional expiration time delta
+        token_type: ACCESS_TOKEN or REFRESH_TOKEN (sets the default lifetime)
         
     Returns:
         Encoded JWT token
@@ -29,51 +45,127 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
+    elif token_type == REFRESH_TOKEN:
+        expire = datetime.utcnow() + timedelta(days=settings.jwt_refresh_token_days)
     else:
-        expire = datetime.utcnow() + timedelta(hours=settings.jwt_expiration_hours)
+        expire = datetime.utcnow() + timedelta(minutes=settings.jwt_access_token_minutes)
     
+    # iat con frazioni di secondo: un token emesso subito dopo una revoca
+    # per utente (cambio password) non ricade nella revoca
     to_encode.update({
         "exp": expire,
-        "iat": datetime.utcnow()
+        "iat": time.time(),
+        "jti": uuid.uuid4().hex,
+        "type": token_type
     })
     
-    encoded_jwt = jwt.encode(
-        to_encode, 
-        settings.jwt_secret_key, 
-        algorithm=settings.jwt_algorithm
-    )
+    return get_jwt_backend().encode(to_encode)
+
+def create_token_pair(user_id: int, is_admin: bool, shard_key: int) -> dict:
+    """
+    Create a short-lived access token and a refresh token
+    
+    The access token carries the user status used by the request hot path
+    (see get_token_user), so it must only be issued to active users.
     
-    return encoded_jwt
+    Returns:
+        Dictionary with token, refresh_token and expires_in (seconds)
+    """
+    return {
+        "token": create_access_token(data={
+            "user_id": user_id,
+            "is_admin": bool(is_admin),
+            "shard_key": shard_key
+        }),
+        "refresh_token": create_access_token(data={"user_id": user_id}, token_type=REFRESH_TOKEN),
+        "expires_in": settings.jwt_access_token_minutes * 60
+    }
 
-def verify_token(token: str) -> Optional[dict]:
+def verify_token(token: str, token_type: str = ACCESS_TOKEN) -> Optional[dict]:
     """
     Verify and decode JWT token
     
+    Recently verified tokens are served from token_cache until they expire.
+    The returned payload is shared with the cache and must not be modified.
+    
     Args:
         token: JWT token string
+        token_type: Expected token type
         
     Returns:
         Decoded payload or None if invalid
     """
-    try:
-        payload = jwt.decode(
-            token, 
-            settings.jwt_secret_key, 
-            algorithms=[settings.jwt_algorithm]
-        )
-        return payload
-    except JWTError:
+    payload = token_cache.get(token)
+    
+    if payload is None:
+        payload = get_jwt_backend().decode(token)
+        if payload is None:
+            return None
+        token_cache.put(token, payload)
+    
+    # Un refresh token non è accettato come access token (e viceversa)
+    if payload.get("type", ACCESS_TOKEN) != token_type:
         return None
+    
+    return payload
+
+def get_token_payload(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
+    """
+    Dependency to get the payload of a valid, non-revoked access token
+    
+    The revocation check is an in-memory lookup (no database access).
+    
+    Raises:
+        HTTPException: If token is invalid or revoked
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token mancante o non valido",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    
+    payload = verify_token(credentials.credentials)
+    
+    if payload is None or payload.get("user_id") is None:
+        raise credentials_exception
+    
+    if get_revocation_store().is_revoked(payload):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token revocato",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return payload
+
+class TokenUser:
+    """
+    Authenticated user described by the access-token claims
+    
+    Exposes the User attributes needed by the activity and admin routes
+    (id, is_admin, is_active, shard_key) without a users-table lookup.
+    """
+    
+    def __init__(self, id: int, is_admin: bool, shard_key: int):
+        self.id = id
+        self.is_admin = is_admin
+        self.shard_key = shard_key
+        self.is_active = True
+    
+    def __repr__(self):
+        return f'<TokenUser {self.id}>'
 
 def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    payload: dict = Depends(get_token_payload),
     db: Session = Depends(get_db)
 ) -> User:
     """
     Dependency to get current authenticated user
     
     Args:
-        credentials: HTTP Bearer token credentials
+        payload: Decoded, non-revoked token payload
         db: Database session
         
     Returns:
@@ -82,31 +174,15 @@ def get_current_user(
     Raises:
         HTTPException: If token is invalid or user not found
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Token mancante o non valido",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    try:
-        token = credentials.credentials
-        payload = verify_token(token)
-        
-        if payload is None:
-            raise credentials_exception
-        
-        user_id: int = payload.get("user_id")
-        if user_id is None:
-            raise credentials_exception
-            
-    except JWTError:
-        raise credentials_exception
-    
-    # Get user from database
-    user = db.query(User).filter(User.id == user_id).first()
+    # Get user from database (cached statement, queries.py)
+    user = queries.get_user(db, payload["user_id"])
     
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token mancante o non valido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     if not user.is_active:
         raise HTTPException(
@@ -116,6 +192,25 @@ def get_current_user(
     
     return user
 
+def get_token_user(
+    payload: dict = Depends(get_token_payload),
+    db: Session = Depends(get_db)
+):
+    """
+    Dependency to get the current user from the token claims
+    
+    Access tokens are short-lived and only issued to active users, so their
+    claims are trusted as they are. Tokens issued before the claims were
+    added fall back to get_current_user.
+    
+    Returns:
+        TokenUser, or User for older tokens
+    """
+    if "shard_key" not in payload:
+        return get_current_user(payload, db)
+    
+    return TokenUser(payload["user_id"], payload.get("is_admin", False), payload["shard_key"])
+
 def get_current_admin_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -152,7 +247,7 @@ def get_optional_current_user(
         return None
     
     try:
-        return get_current_user(credentials, db)
+        return get_current_user(get_token_payload(credentials), db)
     except HTTPException:
         return None
 
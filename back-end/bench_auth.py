@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark dell'autenticazione per richiesta
+
+Misura il costo di verifica dell'access token (decodifica + firma + exp +
+controllo di revoca) con i backend di jwt_backends.py: python-jose senza
+cache (percorso originale), PyJWT (se installato), HMAC nativo, e HMAC
+nativo con la cache LRU dei token già verificati.
+
+Uso:
+    python bench_auth.py [ripetizioni]
+"""
+
+import os
+import sys
+import time
+
+# Aggiungi il percorso del progetto al Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config_fastapi import settings
+from jwt_backends import JoseBackend, PyJWTBackend, NativeHMACBackend, TokenCache
+from token_revocation import RevocationStore
+from auth_fastapi import create_access_token
+
+
+def measure(verify, tokens, repeat: int) -> float:
+    """Microsecondi medi per verifica"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for token in tokens:
+            verify(token)
+    return (time.perf_counter() - start) / (repeat * len(tokens)) * 1e6
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    # Pochi token distinti, come gli utenti attivi in un intervallo breve
+    tokens = [
+        create_access_token(data={"user_id": user_id, "is_admin": False, "shard_key": 0})
+        for user_id in range(1, 11)
+    ]
+    store = RevocationStore(session_factory=None)
+
+    def with_revocation(decode):
+        def verify(token):
+            payload = decode(token)
+            assert payload is not None and not store.is_revoked(payload)
+        return verify
+
+    def cached(backend):
+        cache = TokenCache(settings.jwt_cache_size)
+
+        def decode(token):
+            payload = cache.get(token)
+            if payload is None:
+                payload = backend.decode(token)
+                cache.put(token, payload)
+            return payload
+        return decode
+
+    key, algorithm = settings.jwt_secret_key, settings.jwt_algorithm
+    jose = JoseBackend(key, algorithm)
+    native = NativeHMACBackend(key, algorithm)
+
+    cases = [('python-jose (originale)', jose.decode)]
+    try:
+        cases.append(('PyJWT', PyJWTBackend(key, algorithm).decode))
+    except ImportError:
+        print("ℹ️  PyJWT non installato, backend saltato")
+    cases.append(('HMAC nativo', native.decode))
+    cases.append(('HMAC nativo + cache LRU', cached(native)))
+
+    print(f"🔐 Verifica access token ({len(tokens)} token, {repeat} ripetizioni)\n")
+    baseline = None
+    for name, decode in cases:
+        # Riscaldamento (import lazy, cache)
+        measure(with_revocation(decode), tokens, 1)
+        micros = measure(with_revocation(decode), tokens, repeat)
+        baseline = baseline or micros
+        print(f"  {name:<26} {micros:8.1f} µs/richiesta   {baseline / micros:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
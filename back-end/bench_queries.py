@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Profilo delle query calde: costruzione ORM per richiesta vs lambda statement
+
+Per le query di get_current_user, GET /activities/{id}, DELETE e
+GET /activities/stats confronta il percorso originale (db.query(...)
+.filter(...) ricostruito a ogni richiesta) con gli statement in cache di
+queries.py: tempo CPU Python e chiamate di funzione per richiesta
+(cProfile), su SQLite in memoria per isolare il costo lato Python.
+
+Uso:
+    python bench_queries.py [ripetizioni]
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import time
+from datetime import date, timedelta
+
+# Aggiungi il percorso del progetto al Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models_fastapi import User, Activity
+import queries
+
+
+def seed(db) -> User:
+    """Un utente con qualche centinaio di attività"""
+    user = User(username='bench', email='bench@example.com', password_hash='x')
+    db.add(user)
+    db.flush()
+    statuses = ['da-fare', 'in-corso', 'fatta', 'rimandata']
+    priorities = ['bassa', 'media', 'alta']
+    db.add_all([
+        Activity(
+            title=f'Attività {i}',
+            date=date.today() + timedelta(days=i % 60),
+            status=statuses[i % 4],
+            priority=priorities[i % 3],
+            category=f'cat-{i % 5}',
+            user_id=user.id
+        )
+        for i in range(500)
+    ])
+    db.commit()
+    return user
+
+
+def legacy_user(db, user_id, activity_id):
+    return db.query(User).filter(User.id == user_id).first()
+
+
+def legacy_activity(db, user_id, activity_id):
+    activity = db.query(Activity).filter(Activity.id == activity_id, Activity.user_id == user_id).first()
+    return activity.to_dict()
+
+
+def legacy_delete(db, user_id, activity_id):
+    # Senza commit: misura solo SELECT + delete ORM + flush
+    activity = db.query(Activity).filter(Activity.id == activity_id, Activity.user_id == user_id).first()
+    db.delete(activity)
+    db.flush()
+    db.rollback()
+
+
+def legacy_stats(db, user_id, activity_id):
+    counts = [db.query(Activity).filter(Activity.user_id == user_id).count()]
+    for value in ('da-fare', 'in-corso', 'fatta', 'rimandata'):
+        counts.append(db.query(Activity).filter(Activity.status == value, Activity.user_id == user_id).count())
+    for value in ('alta', 'media', 'bassa'):
+        counts.append(db.query(Activity).filter(Activity.priority == value, Activity.user_id == user_id).count())
+    return counts
+
+
+def cached_user(db, user_id, activity_id):
+    return queries.get_user(db, user_id)
+
+
+def cached_activity(db, user_id, activity_id):
+    return queries.get_activity_row(db, activity_id, user_id)
+
+
+def cached_delete(db, user_id, activity_id):
+    queries.delete_activity(db, activity_id, user_id)
+    db.rollback()
+
+
+def cached_stats(db, user_id, activity_id):
+    return queries.count_by(db, user_id, 'status'), queries.count_by(db, user_id, 'priority')
+
+
+def profile(func, db, user_id, repeat: int):
+    """(µs di CPU, chiamate di funzione) per richiesta"""
+    for activity_id in range(1, 11):
+        func(db, user_id, activity_id)  # riscaldamento: cache degli statement
+
+    start = time.process_time()
+    for i in range(repeat):
+        func(db, user_id, i % 500 + 1)
+        db.expunge_all()
+    cpu = (time.process_time() - start) / repeat * 1e6
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for i in range(100):
+        func(db, user_id, i % 500 + 1)
+        db.expunge_all()
+    profiler.disable()
+    calls = pstats.Stats(profiler).total_calls / 100
+    return cpu, calls
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    user = seed(db)
+
+    cases = [
+        ('get_current_user', legacy_user, cached_user),
+        ('GET /activities/{id}', legacy_activity, cached_activity),
+        ('DELETE /activities/{id}', legacy_delete, cached_delete),
+        ('GET /activities/stats (conteggi)', legacy_stats, cached_stats),
+    ]
+
+    print(f"⏱️  CPU Python per richiesta ({repeat} ripetizioni, SQLite in memoria)\n")
+    for name, legacy, cached in cases:
+        legacy_cpu, legacy_calls = profile(legacy, db, user.id, repeat)
+        cached_cpu, cached_calls = profile(cached, db, user.id, repeat)
+        print(f"🔍 {name}")
+        print(f"   Originale: {legacy_cpu:8.1f} µs  {legacy_calls:7.0f} chiamate")
+        print(f"   In cache:  {cached_cpu:8.1f} µs  {cached_calls:7.0f} chiamate  (x{legacy_cpu / cached_cpu:.1f})")
+
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark della serializzazione delle liste di attività
+
+Confronta il percorso originale (ORM + to_dict() + ActivityResponse +
+jsonable_encoder + json stdlib) con il percorso leggero (select per colonne
++ FastJSONResponse) sui payload di routers/activities.py e routers/admin.py.
+
+Uso:
+    python bench_responses.py [numero_attivita] [ripetizioni]
+"""
+
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+# Aggiungi il percorso del progetto al Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models_fastapi import User, Activity
+from schemas import ActivityResponse, UserResponse
+from serializers import select_activity_rows
+from responses import FastJSONResponse, orjson
+
+
+def seed(db, count: int) -> User:
+    """Crea un utente con `count` attività"""
+    user = User(username='bench', email='bench@example.com', password_hash='x')
+    db.add(user)
+    db.flush()
+
+    statuses = ['da-fare', 'in-corso', 'fatta', 'rimandata']
+    priorities = ['bassa', 'media', 'alta']
+    start = date.today() - timedelta(days=count // 4)
+    now = datetime.utcnow()
+    db.add_all([
+        Activity(
+            title=f'Attività {i}',
+            description='Descrizione di prova ' * 3,
+            date=start + timedelta(days=i % 365),
+            status=statuses[i % 4],
+            priority=priorities[i % 3],
+            category=f'cat-{i % 7}',
+            user_id=user.id,
+            created_at=now,
+            updated_at=now
+        )
+        for i in range(count)
+    ])
+    db.commit()
+    return user
+
+
+def legacy_activities(db, user_id: int) -> bytes:
+    """Percorso originale di GET /activities"""
+    activities = db.query(Activity).filter(Activity.user_id == user_id).order_by(
+        Activity.date.desc(), Activity.time.desc()
+    ).all()
+    content = [ActivityResponse(**activity.to_dict()) for activity in activities]
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_activities(db, user_id: int) -> bytes:
+    """Percorso leggero di GET /activities"""
+    activities = select_activity_rows(
+        db, Activity.user_id == user_id,
+        order_by=(Activity.date.desc(), Activity.time.desc())
+    )
+    return FastJSONResponse(activities).body
+
+
+def legacy_admin(db, user: User) -> bytes:
+    """Percorso originale di GET /admin/users/{id}/activities"""
+    activities = db.query(Activity).filter(Activity.user_id == user.id).order_by(
+        Activity.date.desc(), Activity.time.desc()
+    ).all()
+    content = {
+        'user': UserResponse(**user.to_dict()),
+        'activities': [ActivityResponse(**activity.to_dict()) for activity in activities]
+    }
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_admin(db, user: User) -> bytes:
+    """Percorso leggero di GET /admin/users/{id}/activities"""
+    activities = select_activity_rows(
+        db, Activity.user_id == user.id,
+        order_by=(Activity.date.desc(), Activity.time.desc())
+    )
+    return FastJSONResponse({'user': user.to_dict(), 'activities': activities}).body
+
+
+def measure(fn, repeat: int) -> float:
+    """Restituisce il tempo migliore in millisecondi"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    user = seed(db, count)
+
+    print("=" * 60)
+    print(f"📊 BENCHMARK LISTE ATTIVITÀ ({count} righe, migliore di {repeat})")
+    print(f"   Serializzatore JSON: {'orjson' if orjson else 'json (stdlib)'}")
+    print("=" * 60)
+
+    cases = [
+        ("GET /activities", lambda: legacy_activities(db, user.id), lambda: fast_activities(db, user.id)),
+        ("GET /admin/users/{id}/activities", lambda: legacy_admin(db, user), lambda: fast_admin(db, user)),
+    ]
+    for name, legacy, fast in cases:
+        db.expire_all()
+        legacy_ms = measure(legacy, repeat)
+        fast_ms = measure(fast, repeat)
+        size_kb = len(fast()) / 1024
+        print(f"\n🔍 {name} ({size_kb:.0f} KB)")
+        print(f"   Originale: {legacy_ms:8.1f} ms")
+        print(f"   Leggero:   {fast_ms:8.1f} ms  (x{legacy_ms / fast_ms:.1f})")
+
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Confronto dei formati di risposta per le liste di attività
+
+Per una lista di attività sintetiche misura dimensione (anche con gzip) e
+tempo di parsing lato client dei formati di responses.py: JSON per righe
+(originale), JSON colonnare e MessagePack colonnare (se installato).
+
+Uso:
+    python bench_wire.py [numero_attività]
+"""
+
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+# Aggiungi il percorso del progetto al Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from responses import (
+    ACTIVITY_ENUMS, COLUMNAR_MEDIA_TYPE, JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE,
+    msgpack, render_activity_rows
+)
+
+
+def sample_rows(count: int) -> list:
+    """Attività nel formato di ActivityResponse"""
+    start = date(2026, 1, 1)
+    now = datetime(2026, 1, 1, 8, 0)
+    rows = []
+    for i in range(count):
+        day = start + timedelta(days=i % 365)
+        rows.append({
+            'id': i + 1,
+            'title': f'Attività {i + 1}',
+            'description': 'Descrizione di esempio' if i % 3 == 0 else None,
+            'date': day.isoformat(),
+            'time': f'{8 + i % 10:02d}:00' if i % 2 == 0 else None,
+            'endDate': None,
+            'endTime': None,
+            'isMultiDay': False,
+            'isMultiHour': False,
+            'status': ACTIVITY_ENUMS['status'][i % 4],
+            'priority': ACTIVITY_ENUMS['priority'][i % 3],
+            'category': 'lavoro' if i % 2 else 'personale',
+            'createdAt': (now + timedelta(minutes=i)).isoformat(),
+            'updatedAt': (now + timedelta(minutes=i)).isoformat(),
+        })
+    return rows
+
+
+def measure(parse, body: bytes, repeat: int) -> float:
+    """Millisecondi medi di parsing"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(body)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = 20
+    rows = sample_rows(count)
+
+    cases = [
+        ('JSON per righe (originale)', JSON_MEDIA_TYPE, json.loads),
+        ('JSON colonnare', COLUMNAR_MEDIA_TYPE, json.loads),
+    ]
+    if msgpack is not None:
+        cases.append(('MessagePack colonnare', MSGPACK_MEDIA_TYPE, msgpack.unpackb))
+    else:
+        print("ℹ️  msgpack non installato, formato saltato")
+
+    print(f"📦 Lista di {count} attività ({repeat} ripetizioni del parsing)\n")
+    for name, media_type, parse in cases:
+        body = render_activity_rows(rows, media_type)
+        gzipped = len(gzip.compress(body, 6))
+        millis = measure(parse, body, repeat)
+        print(f"  {name:<28} {len(body) / 1024:8.1f} KiB   gzip {gzipped / 1024:7.1f} KiB   "
+              f"parsing {millis:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
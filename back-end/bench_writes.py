@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark della latenza di scrittura delle attività
+
+Confronta il percorso originale (ORM add/commit + db.refresh()) con
+INSERT/UPDATE ... RETURNING (mutations.py) per la creazione di un'attività
+e per l'aggiornamento dello stato. Usa un database SQLite su file, così il
+costo di ogni COMMIT è quello reale.
+
+Uso:
+    python bench_writes.py [operazioni]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+# Aggiungi il percorso del progetto al Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models_fastapi import User, Activity
+from serializers import ACTIVITY_COLUMNS, activity_row_to_dict
+from mutations import insert_returning, update_returning
+
+STATUSES = ['da-fare', 'in-corso', 'fatta', 'rimandata']
+
+
+def legacy_create(db, user_id: int, i: int) -> dict:
+    """Percorso originale di POST /activities"""
+    activity = Activity(title=f'Attività {i}', date=date.today(), category='bench', user_id=user_id)
+    db.add(activity)
+    db.commit()
+    db.refresh(activity)
+    return activity.to_dict()
+
+
+def fast_create(db, user_id: int, i: int) -> dict:
+    """POST /activities con INSERT ... RETURNING"""
+    row = insert_returning(db, Activity, dict(
+        title=f'Attività {i}', date=date.today(), category='bench', user_id=user_id
+    ), ACTIVITY_COLUMNS)
+    db.commit()
+    return activity_row_to_dict(row)
+
+
+def legacy_status(db, user_id: int, activity_id: int, i: int) -> dict:
+    """Percorso originale di PATCH /activities/{id}/status"""
+    activity = db.query(Activity).filter(
+        Activity.id == activity_id,
+        Activity.user_id == user_id
+    ).first()
+    activity.status = STATUSES[i % 4]
+    activity.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(activity)
+    return activity.to_dict()
+
+
+def fast_status(db, user_id: int, activity_id: int, i: int) -> dict:
+    """PATCH /activities/{id}/status con UPDATE ... RETURNING"""
+    row = update_returning(
+        db, Activity,
+        (Activity.id == activity_id, Activity.user_id == user_id),
+        {'status': STATUSES[i % 4], 'updated_at': datetime.utcnow()},
+        ACTIVITY_COLUMNS
+    )
+    db.commit()
+    return activity_row_to_dict(row)
+
+
+def measure(fn, count: int, counter: dict) -> tuple:
+    """Restituisce (media ms, p95 ms, statement per operazione)"""
+    timings = []
+    counter['statements'] = 0
+    for i in range(count):
+        start = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.mean(timings), timings[int(len(timings) * 0.95)], counter['statements'] / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+
+        counter = {'statements': 0}
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def count_statements(*args):
+            counter['statements'] += 1
+
+        db = sessionmaker(bind=engine)()
+        user = User(username='bench', email='bench@example.com', password_hash='x')
+        db.add(user)
+        db.commit()
+        user_id = user.id
+        activity_id = fast_create(db, user_id, 0)['id']
+
+        print("=" * 60)
+        print(f"✍️  BENCHMARK SCRITTURE ({count} operazioni, SQLite su file)")
+        print("=" * 60)
+
+        cases = [
+            ("POST /activities",
+             lambda i: legacy_create(db, user_id, i),
+             lambda i: fast_create(db, user_id, i)),
+            ("PATCH /activities/{id}/status",
+             lambda i: legacy_status(db, user_id, activity_id, i),
+             lambda i: fast_status(db, user_id, activity_id, i)),
+        ]
+        for name, legacy, fast in cases:
+            legacy_mean, legacy_p95, legacy_sql = measure(legacy, count, counter)
+            fast_mean, fast_p95, fast_sql = measure(fast, count, counter)
+            print(f"\n🔍 {name}")
+            print(f"   Originale: media {legacy_mean:6.2f} ms  p95 {legacy_p95:6.2f} ms  ({legacy_sql:.0f} statement)")
+            print(f"   RETURNING: media {fast_mean:6.2f} ms  p95 {fast_p95:6.2f} ms  ({fast_sql:.0f} statement)")
+
+        db.close()
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Verifica del budget di import time del backend FastAPI
+
+Esegue `python -X importtime -c "import main"` in processi separati (cold
+start) e fallisce se:
+- il tempo cumulativo di import di `main` supera il budget
+- vengono importati moduli che devono restare fuori dal percorso di avvio
+  (stack Flask, passlib, python-jose, alembic: caricati solo quando servono)
+
+Uso:
+    python check_import_time.py [budget_ms] [ripetizioni]
+
+Il budget si può impostare anche con la variabile IMPORT_TIME_BUDGET_MS.
+"""
+
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_BUDGET_MS = 1500
+
+# Moduli che non devono essere importati da `import main`
+FORBIDDEN_MODULES = ('flask', 'flask_sqlalchemy', 'app_factory', 'models', 'passlib', 'jose', 'alembic')
+
+# "import time:   self |   cumulative | module"
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def run_importtime() -> list:
+    """Esegue un cold import di main e restituisce (self_us, cumulative_us, modulo)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        raise SystemExit("❌ Import di main fallito")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            entries.append((int(match.group(1)), int(match.group(2)), match.group(4)))
+    return entries
+
+
+def main():
+    budget_ms = int(sys.argv[1]) if len(sys.argv) > 1 else int(
+        os.getenv('IMPORT_TIME_BUDGET_MS', DEFAULT_BUDGET_MS)
+    )
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    print("=" * 60)
+    print(f"⏱️  IMPORT TIME DI main.py (budget {budget_ms} ms, {repeat} run)")
+    print("=" * 60)
+
+    runs = [run_importtime() for _ in range(repeat)]
+    totals_ms = sorted(
+        next(cumulative for _, cumulative, module in entries if module == 'main') / 1000
+        for entries in runs
+    )
+    median_ms = totals_ms[len(totals_ms) // 2]
+
+    # Pacchetti più costosi (tempo self sommato per pacchetto di primo livello)
+    by_package = defaultdict(int)
+    for self_us, _, module in runs[-1]:
+        by_package[module.split('.')[0]] += self_us
+    print("\n📦 Pacchetti più costosi (ultimo run):")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:10]:
+        print(f"   {package:30} {self_us / 1000:8.1f} ms")
+
+    imported = {module.split('.')[0] for _, _, module in runs[-1]}
+    forbidden = sorted(imported.intersection(FORBIDDEN_MODULES))
+
+    print(f"\n📊 import main: mediana {median_ms:.0f} ms (min {totals_ms[0]:.0f}, max {totals_ms[-1]:.0f})")
+
+    ok = True
+    if median_ms > budget_ms:
+        print(f"❌ Budget superato: {median_ms:.0f} ms > {budget_ms} ms")
+        ok = False
+    else:
+        print(f"✅ Entro il budget di {budget_ms} ms")
+
+    if forbidden:
+        print(f"❌ Moduli importati all'avvio che dovrebbero essere lazy: {', '.join(forbidden)}")
+        ok = False
+    else:
+        print("✅ Nessun modulo pesante/Flask importato all'avvio")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+HTTP response compression middleware
+
+Negotiates brotli/gzip with the client through Accept-Encoding and
+compresses responses above a size threshold. Streaming responses
+(more_body=True) are compressed chunk by chunk and flushed after every
+chunk, so clients keep receiving data progressively.
+"""
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli è opzionale: senza, si negozia solo gzip
+    brotli = None
+
+# Content-Type che vale la pena comprimere
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/x-msgpack",
+    "text/",
+)
+
+# Suffissi strutturati (RFC 6839), es. application/vnd.planner.columnar+json
+COMPRESSIBLE_SUFFIXES = (
+    "+json",
+    "+xml",
+)
+
+# Content-Type da non toccare (lo streaming SSE richiede flush immediati)
+EXCLUDED_TYPES = (
+    "text/event-stream",
+)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the best supported encoding from an Accept-Encoding header
+
+    Args:
+        accept_encoding: Raw Accept-Encoding header value
+
+    Returns:
+        'br', 'gzip' or None if the client accepts neither
+    """
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    weights = {}
+
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        # A parità di peso vince l'ordine di `supported` (br prima di gzip)
+        if q > best_q:
+            best, best_q = encoding, q
+
+    return best
+
+
+class _Compressor:
+    """Incremental compressor with a common interface for gzip and brotli"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._impl = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._impl = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self.encoding == "br":
+            out = self._impl.process(data)
+            return out + self._impl.flush() if flush else out
+        out = self._impl.compress(data)
+        return out + self._impl.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._impl.finish()
+        return self._impl.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware for negotiated gzip/brotli compression
+
+    Args:
+        app: ASGI application
+        minimum_size: Responses smaller than this (in bytes) are sent as-is
+        gzip_level: zlib compression level (1-9)
+        brotli_quality: brotli quality (0-11)
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Per-request state of CompressionMiddleware"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    def _is_compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").lower()
+        if content_type.startswith(EXCLUDED_TYPES):
+            return False
+        media_type = content_type.split(";", 1)[0].strip()
+        return media_type.startswith(COMPRESSIBLE_TYPES) or media_type.endswith(COMPRESSIBLE_SUFFIXES)
+
+    async def send(self, message: Message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Trattieni l'header finché non si conosce il primo blocco del body
+            self.start_message = message
+            self.passthrough = not self._is_compressible(Headers(raw=message["headers"]))
+            return
+
+        if message_type != "http.response.body":
+            await self.downstream(message)
+            return
+
+        if self.passthrough:
+            if self.start_message is not None:
+                await self.downstream(self.start_message)
+                self.start_message = None
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+
+            if not more_body and len(body) < self.middleware.minimum_size:
+                # Risposta piccola e completa: non conviene comprimere
+                await self.downstream(self.start_message)
+                self.start_message = None
+                await self.downstream(message)
+                self.passthrough = True
+                return
+
+            self.compressor = _Compressor(
+                self.encoding,
+                self.middleware.gzip_level,
+                self.middleware.brotli_quality
+            )
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+
+            if not more_body:
+                body = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                await self.downstream(self.start_message)
+                self.start_message = None
+                await self.downstream({"type": "http.response.body", "body": body})
+                return
+
+            # Streaming: la lunghezza finale non è nota
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            await self.downstream(self.start_message)
+            self.start_message = None
+
+        if more_body:
+            chunk = self.compressor.compress(body, flush=True)
+            await self.downstream({"type": "http.response.body", "body": chunk, "more_body": True})
+        else:
+            chunk = self.compressor.compress(body) + self.compressor.finish()
+            await self.downstream({"type": "http.response.body", "body": chunk})
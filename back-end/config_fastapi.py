@@ -2,7 +2,7 @@
 FastAPI Configuration
 """
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List, Optional
 import os
 
 class Settings(BaseSettings):
@@ -15,11 +15,88 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = "sqlite:///./instance/planner_activities_dev.db"
+    # Applica le migrazioni Alembic mancanti all'avvio
+    db_auto_migrate: bool = True
+    # Pool di connessioni di ogni engine (primario, shard, repliche):
+    # connessioni fisse, extra temporanee, secondi di attesa di una
+    # connessione libera, riciclo dopo N secondi (-1 = mai) e verifica della
+    # connessione prima dell'uso
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = -1
+    db_pool_pre_ping: bool = False
     
     # JWT Settings
     jwt_secret_key: str = "your-secret-key-change-in-production"
     jwt_algorithm: str = "HS256"
-    jwt_expiration_hours: int = 24
+    # Access token brevi (contengono lo stato dell'utente, nessuna lettura
+    # della tabella users per richiesta) rinnovati con un refresh token
+    jwt_access_token_minutes: int = 15
+    jwt_refresh_token_days: int = 30
+    # Un refresh token già ruotato riusato dopo questi secondi (non una
+    # richiesta concorrente di un'altra scheda) fa revocare tutte le sessioni
+    jwt_refresh_reuse_grace_seconds: int = 60
+    # Verifica dei token: "native" (HMAC della stdlib), "pyjwt" o "jose";
+    # jwt_cache_size token verificati restano in cache fino alla scadenza
+    jwt_backend: str = "native"
+    jwt_cache_size: int = 4096
+    # Intervallo di pulizia delle revoche di token già scaduti
+    token_revocation_prune_seconds: int = 3600
+    
+    # Group commit per PATCH /activities/{id}/status: gli aggiornamenti
+    # concorrenti vengono raccolti per window_ms e confermati con un solo COMMIT
+    status_group_commit: bool = False
+    status_group_commit_window_ms: int = 5
+    status_group_commit_max_batch: int = 64
+    
+    # Sharding delle attività: ogni utente è assegnato (User.shard_key) a uno
+    # di shard_count database SQLite. Lo shard 0 è il database principale
+    shard_count: int = 1
+    shard_path_template: str = "./instance/planner_activities_shard_{shard}.db"
+    
+    # Replica di lettura per le query di reporting admin: URL di una replica
+    # esterna del database principale, oppure (SQLite) intervallo in secondi
+    # tra due copie in sola lettura dei database. 0 = letture sul primario
+    read_replica_url: Optional[str] = None
+    read_replica_snapshot_seconds: int = 0
+    
+    # Archivio: le attività 'fatta' concluse da più di archive_after_days
+    # giorni vengono spostate in activities_archive ogni archive_interval_seconds
+    archive_enabled: bool = False
+    archive_after_days: int = 365
+    archive_interval_seconds: int = 3600
+    archive_batch_size: int = 1000
+    
+    # Coda di job in background (tabella jobs): worker thread, attesa tra due
+    # controlli della coda vuota, secondi di lock di un job in esecuzione
+    # prima che torni disponibile, tentativi, backoff iniziale tra tentativi
+    # (raddoppia a ogni errore) e giorni di conservazione dei job conclusi
+    job_queue_enabled: bool = True
+    job_workers: int = 2
+    job_poll_interval: float = 1.0
+    job_visibility_timeout: int = 300
+    job_max_attempts: int = 5
+    job_retry_backoff: float = 10.0
+    job_retention_days: int = 7
+    
+    # Promemoria: reminder_lead_minutes prima dell'inizio delle attività con
+    # orario; in memoria solo le prossime reminder_window_hours ore (al più
+    # reminder_max_pending), ricaricate ogni reminder_refill_seconds.
+    # Destinazione: "log", "publish" (canale "reminders" di shared_state)
+    # o "webhook" (POST a reminder_webhook_url tramite la coda di job)
+    reminders_enabled: bool = False
+    reminder_lead_minutes: int = 15
+    reminder_window_hours: int = 6
+    reminder_max_pending: int = 100000
+    reminder_refill_seconds: int = 60
+    reminder_sink: str = "log"
+    reminder_webhook_url: Optional[str] = None
+    
+    # Partizionamento per data (PostgreSQL): partizioni mensili di activities
+    # create in anticipo per i prossimi partition_months_ahead mesi
+    partition_months_ahead: int = 3
+    partition_maintenance_seconds: int = 86400
     
     # CORS
     cors_origins: List[str] = [
@@ -31,6 +108,48 @@ class Settings(BaseSettings):
     # Server
     host: str = "0.0.0.0"
     port: int = 5000
+    # Numero di processi worker (>1 disattiva il reload)
+    workers: int = 1
+    # Secondi concessi alle richieste in corso durante lo shutdown
+    graceful_shutdown_timeout: int = 30
+    
+    # Shared state tra worker: 'local' (singolo processo) o 'sqlite'
+    shared_state_backend: str = "local"
+    shared_state_path: str = "./instance/shared_state.db"
+    shared_state_poll_interval: float = 0.2
+    
+    # Richieste GET identiche e concorrenti (liste, statistiche) condividono
+    # una sola esecuzione delle query
+    single_flight_enabled: bool = True
+    
+    # Sovrapposizioni tra attività con orario: durata assunta per quelle
+    # senza ora di fine e numero di utenti con l'indice in memoria
+    activity_default_duration_minutes: int = 60
+    conflict_index_cache_size: int = 1024
+    # Risultati di /activities/free-slots tenuti in memoria
+    free_slots_cache_size: int = 1024
+    
+    # Rate limiting (token bucket per utente, o per IP sulle route di auth):
+    # budget "N/second|minute|hour" per "METODO /percorso" (prefisso con "*")
+    rate_limit_enabled: bool = True
+    rate_limit_rules: Dict[str, str] = {
+        "POST /api/auth/login": "10/minute",
+        "POST /api/auth/register": "5/minute",
+        "POST /api/auth/refresh": "30/minute",
+        "GET /api/activities/stats": "60/minute",
+    }
+    rate_limit_default: Optional[str] = "600/minute"
+    # Controllo di ammissione: richieste elaborate in parallelo (0 = nessun
+    # limite; default = db_pool_size + db_max_overflow) e secondi di attesa
+    # di un posto libero prima di rispondere 503
+    max_concurrent_requests: int = 15
+    request_queue_timeout: float = 2.0
+    
+    # Compression (gzip/brotli negoziati via Accept-Encoding)
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
     
     class Config:
         env_file = ".env"
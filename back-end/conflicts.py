@@ -0,0 +1,207 @@
+"""
+Overlap detection between timed activities
+
+Every timed activity occupies [date + time, endDate + endTime). Activities
+without an end time last activity_default_duration_minutes, or until the
+end of endDate for multi-day ones; activities without a time (all-day)
+never conflict.
+
+The intervals of a user are kept in memory in an IntervalIndex, built with
+one query and cached per (user, data version). Writes made through the
+activity routes update the cached index in place (note_activity_write);
+any other write (archive, admin, group commit) bumps the data version and
+the index is rebuilt on the next lookup.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from config_fastapi import settings
+from models_fastapi import Activity
+from serializers import select_activity_rows
+from single_flight import get_data_version
+
+Interval = Tuple[datetime, datetime]
+
+
+def activity_interval(activity: dict) -> Optional[Interval]:
+    """Time span of a serialized activity, None for all-day activities"""
+    if not activity['time']:
+        return None
+
+    start = datetime.fromisoformat(f"{activity['date']}T{activity['time']}")
+    end_day = activity['endDate'] or activity['date']
+    if activity['endTime']:
+        end = datetime.fromisoformat(f"{end_day}T{activity['endTime']}")
+    elif activity['endDate']:
+        end = datetime.fromisoformat(end_day) + timedelta(days=1)
+    else:
+        end = start
+    if end <= start:
+        end = start + timedelta(minutes=settings.activity_default_duration_minutes)
+    return start, end
+
+
+class IntervalIndex:
+    """
+    Static interval tree over (start, end, activity)
+
+    Intervals are sorted by start and read as an implicit balanced binary
+    search tree (the middle element of a range is its root); every node
+    stores the maximum end of its subtree. A lookup descends only into
+    subtrees that can contain an overlap: O(log n + k) for k results on
+    typical calendars, instead of a scan of all activities.
+    """
+
+    def __init__(self, items: Iterable[Tuple[datetime, datetime, dict]] = ()):
+        self._items = sorted(items, key=lambda item: (item[0], item[1]))
+        self._max_end: List[Optional[datetime]] = [None] * len(self._items)
+        if self._items:
+            self._build(0, len(self._items))
+
+    @classmethod
+    def from_activities(cls, activities: Iterable[dict]) -> 'IntervalIndex':
+        items = []
+        for activity in activities:
+            interval = activity_interval(activity)
+            if interval is not None:
+                items.append((*interval, activity))
+        return cls(items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _build(self, lo: int, hi: int) -> datetime:
+        mid = (lo + hi) // 2
+        max_end = self._items[mid][1]
+        if lo < mid:
+            max_end = max(max_end, self._build(lo, mid))
+        if mid + 1 < hi:
+            max_end = max(max_end, self._build(mid + 1, hi))
+        self._max_end[mid] = max_end
+        return max_end
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime, dict]]:
+        """Intervals overlapping [start, end), ordered by start"""
+        found: List[Tuple[datetime, datetime, dict]] = []
+        self._search(0, len(self._items), start, end, found)
+        return found
+
+    def _search(self, lo: int, hi: int, start: datetime, end: datetime, found: list) -> None:
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        if self._max_end[mid] <= start:
+            # Nessun intervallo del sottoalbero arriva oltre start
+            return
+        self._search(lo, mid, start, end, found)
+        item = self._items[mid]
+        if item[0] >= end:
+            # Il sottoalbero destro inizia ancora più tardi
+            return
+        if item[1] > start:
+            found.append(item)
+        self._search(mid + 1, hi, start, end, found)
+
+    def replace(self, activity_id: int, activity: Optional[dict]) -> 'IntervalIndex':
+        """New index with `activity_id` removed and `activity` (if given) added"""
+        items = [item for item in self._items if item[2]['id'] != activity_id]
+        if activity is not None:
+            interval = activity_interval(activity)
+            if interval is not None:
+                items.append((*interval, activity))
+        # Lista quasi ordinata: il sort di Python la riordina in tempo lineare
+        return IntervalIndex(items)
+
+
+# user_id -> (data version, index), in ordine LRU
+_indexes: 'OrderedDict[int, Tuple[int, IntervalIndex]]' = OrderedDict()
+_lock = threading.Lock()
+
+
+def _store(user_id: int, version: int, index: IntervalIndex) -> None:
+    with _lock:
+        _indexes[user_id] = (version, index)
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > settings.conflict_index_cache_size:
+            _indexes.popitem(last=False)
+
+
+def get_conflict_index(db: Session, user_id: int) -> IntervalIndex:
+    """Interval index of the timed activities of `user_id` (db bound to their shard)"""
+    version = get_data_version(user_id)
+    with _lock:
+        cached = _indexes.get(user_id)
+        if cached is not None and cached[0] == version:
+            _indexes.move_to_end(user_id)
+            return cached[1]
+
+    index = IntervalIndex.from_activities(select_activity_rows(
+        db, Activity.user_id == user_id, Activity.time.isnot(None)
+    ))
+    _store(user_id, version, index)
+    return index
+
+
+def note_activity_write(user_id: int, version: int, activity_id: int, activity: Optional[dict]) -> None:
+    """
+    Apply a committed write to the cached index of `user_id`
+
+    Args:
+        version: Data version returned by bump_data_version for this write
+        activity_id: Written activity
+        activity: Its new serialized row, None if it was deleted
+    """
+    with _lock:
+        cached = _indexes.get(user_id)
+        if cached is None:
+            return
+        if cached[0] != version - 1:
+            # Scritture non viste nel frattempo: ricostruzione alla prossima lettura
+            del _indexes[user_id]
+            return
+        index = cached[1]
+    _store(user_id, version, index.replace(activity_id, activity))
+
+
+def find_conflicts(db: Session, user_id: int, activity: dict) -> List[dict]:
+    """Timed activities of `user_id` overlapping `activity` (excluding itself)"""
+    interval = activity_interval(activity)
+    if interval is None:
+        return []
+    return [
+        other for _, _, other in get_conflict_index(db, user_id).overlapping(*interval)
+        if other['id'] != activity['id']
+    ]
+
+
+def conflicts_in_range(db: Session, user_id: int, start: datetime, end: datetime) -> List[Dict[str, object]]:
+    """
+    Pairs of overlapping activities of `user_id` whose overlap falls in [start, end)
+
+    Returns:
+        [{'start': ..., 'end': ..., 'activities': [first, second]}] ordered by
+        start of the overlap
+    """
+    conflicts = []
+    active: List[Tuple[datetime, datetime, dict]] = []
+
+    # Sweep line sugli intervalli del periodo, già ordinati per inizio
+    for item in get_conflict_index(db, user_id).overlapping(start, end):
+        active = [other for other in active if other[1] > item[0]]
+        for other in active:
+            overlap_start = max(other[0], item[0], start)
+            overlap_end = min(other[1], item[1], end)
+            if overlap_start < overlap_end:
+                conflicts.append({
+                    'start': overlap_start.isoformat(),
+                    'end': overlap_end.isoformat(),
+                    'activities': [other[2], item[2]],
+                })
+        active.append(item)
+
+    conflicts.sort(key=lambda conflict: conflict['start'])
+    return conflicts
@@ -1,21 +1,46 @@
 """
 Database configuration and session management for FastAPI
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Generator, List, Optional, TypeVar
 import os
+import threading
+import zlib
+
+from config_fastapi import settings
+from pool_metrics import InstrumentedQueuePool, instrument_engine
 
 # URL del database
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./instance/planner_activities_dev.db')
 
-# Crea engine SQLite con check_same_thread=False per FastAPI
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith('sqlite') else {},
-    echo=False  # Set to True for SQL query logging
-)
+def _pool_options(url: str) -> dict:
+    """Opzioni del pool da Settings (SQLite in memoria usa il pool di default)"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == 'sqlite' and parsed.database in (None, '', ':memory:'):
+        return {}
+    return dict(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping
+    )
+
+def _create_engine(url: str, name: str) -> Engine:
+    # Crea engine SQLite con check_same_thread=False per FastAPI
+    return instrument_engine(create_engine(
+        url,
+        connect_args={"check_same_thread": False} if url.startswith('sqlite') else {},
+        echo=False,  # Set to True for SQL query logging
+        **_pool_options(url)
+    ), name)
+
+engine = _create_engine(DATABASE_URL, 'primary')
 
 # SessionLocal class per creare sessioni database
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -39,11 +64,187 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
-def init_db():
+# ==================== SHARDING ====================
+#
+# Le attività sono partizionate per utente (User.shard_key) su N database
+# SQLite, ognuno con il proprio lock di scrittura. Lo shard 0 è il database
+# principale (utenti, RLS, attività degli utenti esistenti); gli shard 1..N-1
+# sono file separati che contengono solo le tabelle delle attività e rls_context.
+
+T = TypeVar('T')
+
+# Tabelle che vivono sullo shard dell'utente
+SHARDED_TABLES = ('activities', 'activities_archive')
+
+_shard_engines: Dict[int, Engine] = {0: engine}
+_shard_lock = threading.Lock()
+
+def shard_for_new_user(username: str) -> int:
+    """Scegli lo shard di un nuovo utente (stabile rispetto allo username)"""
+    return zlib.crc32(username.encode('utf-8')) % max(settings.shard_count, 1)
+
+def migrate_schema(target: Engine, shard: bool = False) -> None:
+    """
+    Porta il database alla revisione più recente delle migrazioni Alembic
+
+    Se non è aggiornato e db_auto_migrate è attivo applica le migrazioni
+    mancanti; altrimenti solleva un errore (in produzione si esegue
+    `alembic upgrade head`, con `-x shard=true` per gli shard secondari).
+    """
+    from db_migrations import get_current_revision, get_head_revision, upgrade_database
+    
+    current = get_current_revision(target)
+    head = get_head_revision()
+    
+    if current == head:
+        return
+    
+    if not settings.db_auto_migrate:
+        raise RuntimeError(
+            f"Schema database {target.url.database} alla revisione {current}, richiesta {head}: "
+            "eseguire `alembic upgrade head`"
+        )
+    
+    print(f"🔄 Migrazione schema database{' (shard)' if shard else ''}: {current} -> {head}")
+    upgrade_database(target, shard=shard)
+
+def get_shard_engine(shard: int) -> Engine:
+    """Restituisce l'engine dello shard, creando file e schema al primo uso"""
+    shard_engine = _shard_engines.get(shard)
+    if shard_engine is not None:
+        return shard_engine
+    
+    if not 0 <= shard < settings.shard_count:
+        raise ValueError(f"Shard {shard} fuori intervallo (shard_count={settings.shard_count})")
+    
+    with _shard_lock:
+        if shard not in _shard_engines:
+            path = settings.shard_path_template.format(shard=shard)
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            shard_engine = _create_engine(f"sqlite:///{path}", f'shard-{shard}')
+            # Stesse migrazioni del database principale (solo le tabelle delle attività)
+            migrate_schema(shard_engine, shard=True)
+            _shard_engines[shard] = shard_engine
+    
+    return _shard_engines[shard]
+
+def bind_shard(db: Session, shard: int, read_only: bool = False) -> Session:
     """
-    Inizializza il database creando tutte le tabelle.
-    Da chiamare all'avvio dell'applicazione.
+    Instrada le tabelle delle attività della sessione sullo shard indicato.
+    Utenti e contesto RLS restano sul database della sessione.
+    Con read_only=True usa la replica dello shard (vedi get_read_engine).
     """
-    from models import User, Activity  # Import qui per evitare circular imports
-    Base.metadata.create_all(bind=engine)
+    shard_engine = get_read_engine(shard) if read_only else get_shard_engine(shard)
+    for table in SHARDED_TABLES:
+        db.bind_table(Base.metadata.tables[table], shard_engine)
+    return db
+
+def get_shard_session(shard: int) -> Session:
+    """Nuova sessione interamente sullo shard (per job e writer in background)"""
+    return SessionLocal(bind=get_shard_engine(shard))
 
+def fan_out(query: Callable[[Session], T], read_only: bool = False) -> List[T]:
+    """
+    Esegui `query` su tutti gli shard in parallelo (query admin cross-shard)
+    
+    Args:
+        query: Funzione che riceve la sessione di uno shard
+        read_only: Esegui sulle repliche invece che sui primari
+    
+    Returns:
+        Un risultato per shard, in ordine di shard
+    """
+    def run(shard: int) -> T:
+        db = SessionLocal(bind=get_read_engine(shard)) if read_only else get_shard_session(shard)
+        try:
+            return query(db)
+        finally:
+            db.close()
+    
+    if settings.shard_count <= 1:
+        return [run(0)]
+    
+    with ThreadPoolExecutor(max_workers=settings.shard_count, thread_name_prefix='shard') as pool:
+        return list(pool.map(run, range(settings.shard_count)))
+
+# ==================== READ REPLICA ====================
+#
+# Le query di reporting admin possono leggere da una replica, con un pool di
+# connessioni separato da quello delle route utente:
+# - read_replica_url: replica esterna del database principale
+#   (es. streaming replica PostgreSQL)
+# - read_replica_snapshot_seconds > 0: per SQLite, copia in sola lettura di
+#   ogni database aggiornata periodicamente (vedi read_replica.py)
+# Le route utente leggono sempre dal primario e vedono le proprie scritture.
+
+_read_engines: Dict[int, Engine] = {}
+
+def get_database_path(shard: int = 0) -> Optional[str]:
+    """Percorso del file SQLite dello shard, None se non è un database su file"""
+    url = get_shard_engine(shard).url
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    return os.path.abspath(url.database)
+
+def replica_path(path: str) -> str:
+    """Percorso della copia in sola lettura di un database SQLite"""
+    base, ext = os.path.splitext(path)
+    return f"{base}_replica{ext or '.db'}"
+
+def get_read_engine(shard: int = 0) -> Engine:
+    """
+    Engine per le letture di reporting sullo shard
+    
+    Ricade sul primario se non è configurata una replica o se la prima
+    copia SQLite non è ancora stata creata.
+    """
+    read_engine = _read_engines.get(shard)
+    if read_engine is not None:
+        return read_engine
+    
+    if shard == 0 and settings.read_replica_url:
+        url = settings.read_replica_url
+    elif settings.read_replica_snapshot_seconds > 0:
+        path = get_database_path(shard)
+        if path is None or not os.path.exists(replica_path(path)):
+            return get_shard_engine(shard)
+        url = f"sqlite:///file:{replica_path(path)}?mode=ro&uri=true"
+    else:
+        return get_shard_engine(shard)
+    
+    with _shard_lock:
+        if shard not in _read_engines:
+            _read_engines[shard] = _create_engine(url, f'replica-{shard}')
+        return _read_engines[shard]
+
+def get_read_db() -> Generator[Session, None, None]:
+    """
+    Dependency per le route di sola lettura che tollerano dati leggermente
+    non aggiornati (statistiche e dashboard admin): usa la replica.
+    """
+    db = SessionLocal(bind=get_read_engine(0))
+    try:
+        yield db
+    finally:
+        db.close()
+
+def init_db():
+    """
+    Verifica la versione dello schema del database principale e degli shard.
+    Da chiamare all'avvio dell'applicazione (vedi migrate_schema).
+    """
+    migrate_schema(engine)
+    
+    # Con shard_count ridotto le attività degli utenti sugli shard tolti non
+    # sarebbero più raggiungibili: meglio non partire che rispondere 500
+    with engine.connect() as conn:
+        highest = conn.execute(text("SELECT MAX(shard_key) FROM users")).scalar()
+    if highest is not None and highest >= settings.shard_count:
+        raise RuntimeError(
+            f"Esistono utenti sullo shard {highest} ma shard_count={settings.shard_count}: "
+            f"riportare shard_count ad almeno {highest + 1}"
+        )
+    
+    # Gli shard secondari vengono creati e migrati qui, prima dell'avvio dei worker
+    for shard in range(1, settings.shard_count):
+        get_shard_engine(shard)
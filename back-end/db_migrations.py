@@ -0,0 +1,109 @@
+"""
+Schema version management (Alembic)
+
+The application never calls create_all: at startup init_db() compares the
+revision stored in alembic_version with the head of migrations/versions and
+upgrades only when they differ. Secondary shards go through the same
+migrations (see database.migrate_schema).
+"""
+import ast
+import os
+import re
+from typing import Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ALEMBIC_INI = os.path.join(BASE_DIR, 'alembic.ini')
+MIGRATIONS_DIR = os.path.join(BASE_DIR, 'migrations')
+VERSIONS_DIR = os.path.join(MIGRATIONS_DIR, 'versions')
+VERSION_TABLE = 'alembic_version'
+
+# Assegnazioni `revision = ...` / `down_revision = ...` nei file di migrazione
+_REVISION_RE = re.compile(r"^(revision|down_revision)\s*=\s*(.+?)\s*$", re.MULTILINE)
+
+
+def get_alembic_config():
+    """Build the Alembic config independently from the working directory"""
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    config.set_main_option('script_location', MIGRATIONS_DIR)
+    return config
+
+
+def _scan_head_revision() -> Optional[str]:
+    """
+    Find the head revision by reading the migration files as text
+
+    Avoids importing alembic (~100 ms) on every startup. Returns None when
+    the history is not a simple linear chain (e.g. merge revisions), so the
+    caller falls back to Alembic.
+    """
+    revisions, parents = set(), set()
+
+    for name in os.listdir(VERSIONS_DIR):
+        if not name.endswith('.py'):
+            continue
+        with open(os.path.join(VERSIONS_DIR, name), encoding='utf-8') as f:
+            found = dict(_REVISION_RE.findall(f.read()))
+        try:
+            revision = ast.literal_eval(found['revision'])
+            down_revision = ast.literal_eval(found.get('down_revision', 'None'))
+        except (KeyError, ValueError, SyntaxError):
+            return None
+        if not isinstance(revision, str) or not isinstance(down_revision, (str, type(None))):
+            return None
+        revisions.add(revision)
+        if down_revision:
+            parents.add(down_revision)
+
+    heads = revisions - parents
+    return heads.pop() if len(heads) == 1 else None
+
+
+def get_head_revision() -> str:
+    """Return the head revision of migrations/versions"""
+    head = _scan_head_revision()
+    if head is not None:
+        return head
+
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(get_alembic_config()).get_current_head()
+
+
+def get_current_revision(engine: Engine) -> Optional[str]:
+    """
+    Return the revision the database is at
+
+    Returns:
+        Revision id, or None for a database that was never migrated
+    """
+    with engine.connect() as connection:
+        if not inspect(connection).has_table(VERSION_TABLE):
+            return None
+        return connection.execute(text(f"SELECT version_num FROM {VERSION_TABLE}")).scalar()
+
+
+def upgrade_database(engine: Engine, revision: str = 'head', shard: bool = False) -> None:
+    """
+    Apply migrations up to `revision` using the application engine
+
+    Args:
+        engine: Engine of the database to migrate
+        revision: Target revision
+        shard: The database is a secondary shard (see migrations.helpers.is_shard)
+    """
+    from alembic import command
+
+    config = get_alembic_config()
+    # Non riconfigurare il logging dell'applicazione
+    config.attributes['configure_logger'] = False
+    config.attributes['shard'] = shard
+
+    with engine.connect() as connection:
+        config.attributes['connection'] = connection
+        command.upgrade(config, revision)
+        connection.commit()
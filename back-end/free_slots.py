@@ -0,0 +1,117 @@
+"""
+Free time slots of a user within working hours
+
+The busy intervals of the period are read from the interval index of
+conflicts.py, merged into disjoint intervals and swept together with the
+working-hours window of every day: the gaps at least `duration` long are
+the free slots. Results are cached per (user, data version, parameters),
+so repeated lookups between two writes cost a dictionary hit.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Hashable, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from config_fastapi import settings
+from conflicts import get_conflict_index
+from single_flight import get_data_version
+
+# Ampiezza massima del periodo richiesto
+MAX_RANGE_DAYS = 92
+
+_cache: 'OrderedDict[Hashable, List[Dict[str, object]]]' = OrderedDict()
+_lock = threading.Lock()
+
+
+def merge_intervals(intervals: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    """Merge intervals sorted by start into disjoint intervals"""
+    merged: List[Tuple[datetime, datetime]] = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def compute_free_slots(
+    busy: List[Tuple[datetime, datetime]],
+    first_day: date,
+    last_day: date,
+    duration: timedelta,
+    work_start: time,
+    work_end: time
+) -> List[Dict[str, object]]:
+    """
+    Gaps of at least `duration` between `busy` intervals (sorted by start)
+    inside the working hours of every day from first_day to last_day
+    """
+    merged = merge_intervals(busy)
+    slots = []
+    i = 0
+
+    day = first_day
+    while day <= last_day:
+        window_start = datetime.combine(day, work_start)
+        window_end = datetime.combine(day, work_end)
+        day += timedelta(days=1)
+
+        # Intervalli occupati già terminati prima della finestra
+        while i < len(merged) and merged[i][1] <= window_start:
+            i += 1
+
+        cursor = window_start
+        j = i
+        while j < len(merged) and merged[j][0] < window_end:
+            if merged[j][0] - cursor >= duration:
+                slots.append((cursor, merged[j][0]))
+            cursor = max(cursor, merged[j][1])
+            j += 1
+        if window_end - cursor >= duration:
+            slots.append((cursor, window_end))
+
+    return [
+        {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'minutes': int((end - start).total_seconds() // 60),
+        }
+        for start, end in slots
+    ]
+
+
+def find_free_slots(
+    db: Session,
+    user_id: int,
+    first_day: date,
+    last_day: date,
+    duration_minutes: int,
+    work_start: time,
+    work_end: time
+) -> List[Dict[str, object]]:
+    """Free slots of `user_id` (db bound to their shard), cached per data version"""
+    key = (user_id, get_data_version(user_id), first_day, last_day, duration_minutes, work_start, work_end)
+    with _lock:
+        slots = _cache.get(key)
+        if slots is not None:
+            _cache.move_to_end(key)
+            return slots
+
+    period_start = datetime.combine(first_day, work_start)
+    period_end = datetime.combine(last_day, work_end)
+    busy = [
+        (start, end)
+        for start, end, _ in get_conflict_index(db, user_id).overlapping(period_start, period_end)
+    ]
+    slots = compute_free_slots(
+        busy, first_day, last_day, timedelta(minutes=duration_minutes), work_start, work_end
+    )
+
+    with _lock:
+        _cache[key] = slots
+        while len(_cache) > settings.free_slots_cache_size:
+            _cache.popitem(last=False)
+    return slots
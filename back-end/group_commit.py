@@ -0,0 +1,187 @@
+"""
+Group commit for activity status updates
+
+The frontend cycles an activity's status with one PATCH per click. With
+group commit enabled, concurrent status updates are queued and applied by a
+single writer thread in short batched transactions: one COMMIT (one fsync on
+SQLite) per batch instead of one per click. Each caller is acknowledged only
+after the batch containing its update has been durably committed.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import select, text, update
+from sqlalchemy.orm import Session
+
+from models_fastapi import Activity
+from serializers import ACTIVITY_COLUMNS, activity_row_to_dict
+
+
+class _StatusUpdate:
+    """A queued status update and the future its caller waits on"""
+
+    __slots__ = ('activity_id', 'user_id', 'status', 'future')
+
+    def __init__(self, activity_id: int, user_id: int, status: str):
+        self.activity_id = activity_id
+        self.user_id = user_id
+        self.status = status
+        self.future: Future = Future()
+
+
+class StatusUpdateBatcher:
+    """
+    Single writer that applies queued status updates in batches
+
+    Args:
+        session_factory: Callable returning a new database Session
+        window_ms: How long to wait for more updates after the first one
+        max_batch: Maximum number of updates per transaction
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], window_ms: int = 5, max_batch: int = 64):
+        self.session_factory = session_factory
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[_StatusUpdate]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='status-group-commit', daemon=True)
+        self._thread.start()
+
+    def submit(self, activity_id: int, user_id: int, status: str, timeout: float = 10) -> Optional[dict]:
+        """
+        Queue a status update and wait for its durable commit
+
+        Returns:
+            The updated activity in the ActivityResponse shape, or None if
+            the activity does not exist or belongs to another user
+        """
+        item = _StatusUpdate(activity_id, user_id, status)
+        self._queue.put(item)
+        return item.future.result(timeout=timeout)
+
+    def close(self) -> None:
+        """Flush pending updates and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            deadline = time.monotonic() + self.window
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch: List[_StatusUpdate]) -> None:
+        """Apply a batch in one transaction, falling back to one per update on error"""
+        try:
+            results = self._apply(batch)
+        except Exception:
+            # Un aggiornamento non valido non deve far fallire gli altri
+            for item in batch:
+                try:
+                    item.future.set_result(self._apply([item])[0])
+                except Exception as e:
+                    item.future.set_exception(e)
+            return
+
+        for item, result in zip(batch, results):
+            item.future.set_result(result)
+
+    def _apply(self, batch: List[_StatusUpdate]) -> List[Optional[dict]]:
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            current_user_id = None
+
+            # Ordine di arrivo: per la stessa attività vince l'ultimo click
+            for item in batch:
+                if item.user_id != current_user_id:
+                    # I trigger RLS verificano l'utente del contesto
+                    db.execute(
+                        text("UPDATE rls_context SET current_user_id = :user_id WHERE id = 1"),
+                        {"user_id": item.user_id}
+                    )
+                    current_user_id = item.user_id
+                db.execute(
+                    update(Activity)
+                    .where(Activity.id == item.activity_id, Activity.user_id == item.user_id)
+                    .values(status=item.status, updated_at=now)
+                )
+
+            rows = db.execute(
+                select(*ACTIVITY_COLUMNS, Activity.user_id)
+                .where(Activity.id.in_({item.activity_id for item in batch}))
+            ).all()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        by_id = {row[0]: (row[-1], activity_row_to_dict(row[:-1])) for row in rows}
+        results = []
+        for item in batch:
+            owner, activity = by_id.get(item.activity_id, (None, None))
+            results.append(activity if owner == item.user_id else None)
+        return results
+
+
+_batchers: Dict[int, StatusUpdateBatcher] = {}
+_batcher_lock = threading.Lock()
+
+
+def get_status_batcher(shard: int = 0) -> StatusUpdateBatcher:
+    """
+    Return the status batcher of `shard`, starting it on first use
+
+    Each shard has its own write lock, so each gets its own writer thread.
+    """
+    batcher = _batchers.get(shard)
+
+    if batcher is None:
+        with _batcher_lock:
+            batcher = _batchers.get(shard)
+            if batcher is None:
+                from config_fastapi import settings
+                from database import get_shard_session
+
+                batcher = StatusUpdateBatcher(
+                    lambda: get_shard_session(shard),
+                    window_ms=settings.status_group_commit_window_ms,
+                    max_batch=settings.status_group_commit_max_batch
+                )
+                _batchers[shard] = batcher
+
+    return batcher
+
+
+def close_status_batcher() -> None:
+    """Flush and stop the status batchers (called on application shutdown)"""
+    with _batcher_lock:
+        for batcher in _batchers.values():
+            batcher.close()
+        _batchers.clear()
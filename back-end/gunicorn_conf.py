@@ -0,0 +1,36 @@
+"""
+Gunicorn configuration for multi-worker deployments
+
+Usage:
+    gunicorn -c gunicorn_conf.py main:app
+
+Each worker is a uvicorn process; caches, rate limits and pub/sub go
+through shared_state (SQLite backend when more than one worker is started,
+also with the cpu_count() default). On SIGTERM gunicorn stops accepting
+connections and gives in-flight requests up to graceful_timeout seconds
+before killing the worker.
+"""
+import multiprocessing
+import os
+
+from config_fastapi import settings
+
+bind = f"{settings.host}:{settings.port}"
+worker_class = "uvicorn.workers.UvicornWorker"
+# cpu_count() solo se WORKERS non è impostato (ambiente o .env): WORKERS=1 resta 1
+workers = settings.workers if 'workers' in settings.model_fields_set else multiprocessing.cpu_count()
+
+# Numero effettivo di processi, prima del fork: get_shared_state() sceglie
+# il backend SQLite anche quando WORKERS non è impostato (default cpu_count)
+settings.workers = workers
+os.environ['WORKERS'] = str(workers)
+
+graceful_timeout = settings.graceful_shutdown_timeout
+timeout = 60
+keepalive = 5
+
+
+def on_starting(server):
+    """Apply pending migrations once in the master, before workers are forked"""
+    from database import init_db
+    init_db()
@@ -0,0 +1,326 @@
+"""
+Local background job queue
+
+Non-critical work (archive moves, rollups, notifications, reconciliation)
+is enqueued as a row of the `jobs` table and run by a pool of worker
+threads started in the application lifespan, never in the request path.
+
+- Handlers are registered by name with @job("name") and receive the
+  JSON payload as a dict.
+- A worker claims one due job with a single UPDATE ... RETURNING that sets
+  it 'running' and locks it for `job_visibility_timeout` seconds. While the
+  handler runs, a heartbeat extends the lock every third of the timeout: a
+  job is claimable again only when its worker died (crash, restart). With
+  several processes the claim is still atomic.
+- enqueue(unique=True) relies on a unique index over the name of the
+  queued and running unique jobs (jobs.unique_key), so only one process
+  can enqueue it.
+- A failing job is retried with exponential backoff
+  (`job_retry_backoff` * 2^(attempt-1) seconds) up to `max_attempts`,
+  then left 'failed' with its last error.
+- Finished jobs are deleted after `job_retention_days`.
+
+With job_queue_enabled=False enqueue() runs the handler immediately in the
+caller's thread.
+"""
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config_fastapi import settings
+from database import SessionLocal
+from models_fastapi import Job
+from periodic import PeriodicTask
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_handlers: Dict[str, Callable[[dict], Any]] = {}
+
+
+def job(name: str) -> Callable:
+    """Register the decorated function as the handler of jobs named `name`"""
+    def register(func: Callable[[dict], Any]) -> Callable[[dict], Any]:
+        _handlers[name] = func
+        return func
+    return register
+
+
+class JobQueue:
+    """
+    SQL-table-backed job queue with a pool of worker threads
+
+    Args:
+        session_factory: Callable returning a session on the database
+            holding the jobs table
+        workers: Number of worker threads
+        poll_interval: Seconds between two polls when the queue is empty
+        visibility_timeout: Seconds a claimed job stays locked
+        retry_backoff: Delay before the first retry, doubled at every attempt
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        workers: int = 2,
+        poll_interval: float = 1.0,
+        visibility_timeout: float = 300,
+        retry_backoff: float = 10.0,
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.retry_backoff = retry_backoff
+        self._wake = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._prune_task: Optional[PeriodicTask] = None
+
+    def enqueue(
+        self,
+        name: str,
+        payload: Optional[dict] = None,
+        delay: float = 0,
+        max_attempts: Optional[int] = None,
+        unique: bool = False
+    ) -> Optional[int]:
+        """
+        Add a job to the queue
+
+        Args:
+            name: Handler name
+            payload: JSON-serializable arguments
+            delay: Seconds before the job may run
+            max_attempts: Attempts before giving up (default job_max_attempts)
+            unique: Skip if a job with this name is already queued or running
+
+        Returns:
+            The job id, or None if skipped because of `unique`
+        """
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            job_id = db.execute(
+                Job.__table__.insert().values(
+                    name=name,
+                    payload=json.dumps(payload or {}),
+                    status=QUEUED,
+                    attempts=0,
+                    max_attempts=max_attempts or settings.job_max_attempts,
+                    run_at=now + timedelta(seconds=delay),
+                    unique_key=name if unique else None,
+                    created_at=now,
+                    updated_at=now
+                )
+            ).inserted_primary_key[0]
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            if unique:
+                # Indice ux_jobs_unique_key: già in coda o in esecuzione
+                return None
+            raise
+        finally:
+            db.close()
+
+        if delay <= 0:
+            with self._wake:
+                self._wake.notify()
+        return job_id
+
+    def claim(self) -> Optional[tuple]:
+        """
+        Lock the next due job for this worker
+
+        Returns:
+            (id, name, payload, attempts, max_attempts) or None
+        """
+        now = datetime.utcnow()
+        due = or_(
+            and_(Job.status == QUEUED, Job.run_at <= now),
+            # Worker perso: il lock è scaduto
+            and_(Job.status == RUNNING, Job.locked_until <= now),
+        )
+        next_id = select(Job.id).where(due).order_by(Job.run_at).limit(1).scalar_subquery()
+        db = self.session_factory()
+        try:
+            # Condizione ripetuta: un altro worker può averlo preso nel frattempo
+            row = db.execute(
+                update(Job)
+                .where(Job.id == next_id, due)
+                .values(
+                    status=RUNNING,
+                    attempts=Job.attempts + 1,
+                    locked_until=now + timedelta(seconds=self.visibility_timeout),
+                    updated_at=now
+                )
+                .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts)
+                .execution_options(synchronize_session=False)
+            ).first()
+            db.commit()
+            return tuple(row) if row else None
+        finally:
+            db.close()
+
+    def _finish(self, job_id: int, attempts: int, values: dict) -> bool:
+        """Update a job only if this worker still owns it (same attempt)"""
+        db = self.session_factory()
+        try:
+            owned = db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.attempts == attempts, Job.status == RUNNING)
+                .values(updated_at=datetime.utcnow(), **values)
+                .execution_options(synchronize_session=False)
+            ).rowcount > 0
+            db.commit()
+            return owned
+        finally:
+            db.close()
+
+    def _heartbeat(self, job_id: int, attempts: int, done: threading.Event) -> None:
+        """Extend the lock of a running job until `done` is set or the job is lost"""
+        while not done.wait(self.visibility_timeout / 3):
+            try:
+                locked_until = datetime.utcnow() + timedelta(seconds=self.visibility_timeout)
+                if not self._finish(job_id, attempts, dict(locked_until=locked_until)):
+                    return
+            except Exception as e:
+                print(f"Error extending the lock of job {job_id}: {e}")
+
+    def run_next(self) -> bool:
+        """Claim and run one due job; False if none was due"""
+        claimed = self.claim()
+        if claimed is None:
+            return False
+
+        job_id, name, payload, attempts, max_attempts = claimed
+        handler = _handlers.get(name)
+        done = threading.Event()
+        threading.Thread(
+            target=self._heartbeat, args=(job_id, attempts, done), name=f'job-heartbeat-{job_id}', daemon=True
+        ).start()
+        try:
+            if handler is None:
+                raise LookupError(f"Nessun handler registrato per il job '{name}'")
+            handler(json.loads(payload) if payload else {})
+        except Exception as e:
+            done.set()
+            error = f"{type(e).__name__}: {e}"
+            if handler is not None and attempts < max_attempts:
+                delay = self.retry_backoff * 2 ** (attempts - 1)
+                self._finish(job_id, attempts, dict(
+                    status=QUEUED, last_error=error, locked_until=None,
+                    run_at=datetime.utcnow() + timedelta(seconds=delay)
+                ))
+            else:
+                print(f"❌ Job {job_id} '{name}' fallito dopo {attempts} tentativi: {error}")
+                self._finish(job_id, attempts, dict(status=FAILED, last_error=error, locked_until=None))
+        else:
+            done.set()
+            self._finish(job_id, attempts, dict(status=DONE, last_error=None, locked_until=None))
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs by status"""
+        db = self.session_factory()
+        try:
+            counts = dict(db.execute(select(Job.status, func.count(Job.id)).group_by(Job.status)).all())
+        finally:
+            db.close()
+        return {status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)}
+
+    def prune(self) -> None:
+        """Delete finished jobs older than job_retention_days"""
+        cutoff = datetime.utcnow() - timedelta(days=settings.job_retention_days)
+        db = self.session_factory()
+        try:
+            db.execute(delete(Job).where(Job.status.in_((DONE, FAILED)), Job.updated_at < cutoff))
+            db.commit()
+        finally:
+            db.close()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.run_next():
+                    continue
+            except Exception as e:
+                print(f"Error in job worker: {e}")
+            with self._wake:
+                self._wake.wait(self.poll_interval)
+
+    def start(self) -> 'JobQueue':
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f'job-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._prune_task = PeriodicTask('job-prune', 3600, self.prune, run_immediately=True).start()
+        return self
+
+    def stop(self, timeout: float = 5) -> None:
+        """Stop the workers; jobs still running are retried after their lock expires"""
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+        if self._prune_task is not None:
+            self._prune_task.stop()
+            self._prune_task = None
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide job queue (workers started by start_job_queue)"""
+    global _queue
+
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue(
+                    SessionLocal,
+                    workers=settings.job_workers,
+                    poll_interval=settings.job_poll_interval,
+                    visibility_timeout=settings.job_visibility_timeout,
+                    retry_backoff=settings.job_retry_backoff
+                )
+    return _queue
+
+
+def enqueue(name: str, payload: Optional[dict] = None, **options) -> Optional[int]:
+    """Enqueue a job (see JobQueue.enqueue), or run it now if the queue is disabled"""
+    if not settings.job_queue_enabled:
+        handler = _handlers.get(name)
+        if handler is None:
+            raise LookupError(f"Nessun handler registrato per il job '{name}'")
+        handler(payload or {})
+        return None
+    return get_job_queue().enqueue(name, payload, **options)
+
+
+def start_job_queue() -> None:
+    """Start the worker threads (called on application startup)"""
+    if settings.job_queue_enabled and not get_job_queue()._threads:
+        get_job_queue().start()
+
+
+def stop_job_queue() -> None:
+    """Stop the worker threads (called on application shutdown)"""
+    global _queue
+
+    with _queue_lock:
+        if _queue is not None:
+            _queue.stop()
+            _queue = None
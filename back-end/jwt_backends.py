@@ -0,0 +1,242 @@
+"""
+JWT encoding/verification backends
+
+- native: HMAC (HS256/HS384/HS512) with the standard library only
+- pyjwt: PyJWT, if installed
+- jose: python-jose (the original implementation, slow to import and decode)
+
+The backend is chosen with the JWT_BACKEND setting; native falls back to
+jose for non-HMAC algorithms. TokenCache keeps the claims of recently
+verified tokens so repeated requests with the same token skip decoding.
+"""
+import base64
+import calendar
+import hashlib
+import hmac
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+from config_fastapi import settings
+
+try:
+    import orjson
+except ImportError:  # orjson è opzionale: fallback su json della stdlib
+    orjson = None
+
+_HMAC_ALGORITHMS = {
+    'HS256': hashlib.sha256,
+    'HS384': hashlib.sha384,
+    'HS512': hashlib.sha512,
+}
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+
+def _json_dumps(data: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def _json_loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _numeric_dates(payload: dict) -> dict:
+    # Come python-jose/PyJWT: exp, iat e nbf datetime diventano timestamp
+    claims = dict(payload)
+    for claim in ('exp', 'iat', 'nbf'):
+        if isinstance(claims.get(claim), datetime):
+            claims[claim] = calendar.timegm(claims[claim].utctimetuple())
+    return claims
+
+
+class JWTBackend(ABC):
+    """Encode and verify JWTs signed with `key` and `algorithm`"""
+
+    name = 'base'
+
+    def __init__(self, key: str, algorithm: str):
+        self.key = key
+        self.algorithm = algorithm
+
+    @abstractmethod
+    def encode(self, payload: dict) -> str:
+        """Return the signed token of `payload`"""
+
+    @abstractmethod
+    def decode(self, token: str) -> Optional[dict]:
+        """Return the claims, or None if the token is invalid or expired"""
+
+
+class JoseBackend(JWTBackend):
+    name = 'jose'
+
+    def encode(self, payload: dict) -> str:
+        from jose import jwt  # import lazy: python-jose è lento da importare
+        return jwt.encode(payload, self.key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> Optional[dict]:
+        from jose import JWTError, jwt
+
+        try:
+            return jwt.decode(token, self.key, algorithms=[self.algorithm])
+        except JWTError:
+            return None
+
+
+class PyJWTBackend(JWTBackend):
+    name = 'pyjwt'
+
+    def __init__(self, key: str, algorithm: str):
+        super().__init__(key, algorithm)
+        import jwt
+        self._jwt = jwt
+
+    def encode(self, payload: dict) -> str:
+        return self._jwt.encode(payload, self.key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> Optional[dict]:
+        try:
+            return self._jwt.decode(token, self.key, algorithms=[self.algorithm])
+        except self._jwt.PyJWTError:
+            return None
+
+
+class NativeHMACBackend(JWTBackend):
+    """
+    HS256/HS384/HS512 with hmac + base64 + json
+
+    Checks the header algorithm, the signature (constant-time comparison),
+    exp and nbf, like python-jose does for the tokens issued by this app.
+    """
+
+    name = 'native'
+
+    def __init__(self, key: str, algorithm: str):
+        super().__init__(key, algorithm)
+        self._digest = _HMAC_ALGORITHMS[algorithm]
+        self._key = key.encode('utf-8')
+        self._header = _b64encode(_json_dumps({'alg': algorithm, 'typ': 'JWT'}))
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        return hmac.new(self._key, signing_input, self._digest).digest()
+
+    def encode(self, payload: dict) -> str:
+        signing_input = self._header + b'.' + _b64encode(_json_dumps(_numeric_dates(payload)))
+        return (signing_input + b'.' + _b64encode(self._sign(signing_input))).decode('ascii')
+
+    def decode(self, token: str) -> Optional[dict]:
+        try:
+            header_segment, payload_segment, signature_segment = token.split('.')
+            header = _json_loads(_b64decode(header_segment))
+            if not isinstance(header, dict) or header.get('alg') != self.algorithm:
+                return None
+
+            signing_input = f'{header_segment}.{payload_segment}'.encode('ascii')
+            if not hmac.compare_digest(self._sign(signing_input), _b64decode(signature_segment)):
+                return None
+
+            payload = _json_loads(_b64decode(payload_segment))
+        except (ValueError, UnicodeError, TypeError):
+            return None
+
+        if not isinstance(payload, dict):
+            return None
+
+        now = time.time()
+        try:
+            if 'exp' in payload and now > float(payload['exp']):
+                return None
+            if 'nbf' in payload and now < float(payload['nbf']):
+                return None
+        except (TypeError, ValueError):
+            return None
+
+        return payload
+
+
+BACKENDS = {
+    JoseBackend.name: JoseBackend,
+    PyJWTBackend.name: PyJWTBackend,
+    NativeHMACBackend.name: NativeHMACBackend,
+}
+
+
+def create_backend(name: str, key: str, algorithm: str) -> JWTBackend:
+    """
+    Create the backend `name`
+
+    Falls back to python-jose when the backend does not support the
+    algorithm (native) or is not installed (pyjwt).
+    """
+    if name == NativeHMACBackend.name and algorithm not in _HMAC_ALGORITHMS:
+        name = JoseBackend.name
+
+    try:
+        return BACKENDS[name](key, algorithm)
+    except ImportError:
+        print(f"⚠️  Backend JWT '{name}' non disponibile, uso python-jose")
+        return JoseBackend(key, algorithm)
+
+
+@lru_cache(maxsize=None)
+def get_jwt_backend() -> JWTBackend:
+    """Return the backend configured with JWT_BACKEND"""
+    return create_backend(settings.jwt_backend, settings.jwt_secret_key, settings.jwt_algorithm)
+
+
+class TokenCache:
+    """
+    LRU cache token -> claims for recently verified tokens
+
+    Entries are dropped when the token expires, so a cache hit never
+    returns the claims of an expired token. Revocation is checked by the
+    caller on every request (token_revocation.py), not cached here.
+
+    Args:
+        maxsize: Maximum number of tokens (0 disables the cache)
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[str, dict]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            payload = self._entries.get(token)
+            if payload is None:
+                return None
+            if time.time() > payload.get('exp', float('inf')):
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return payload
+
+    def put(self, token: str, payload: dict) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[token] = payload
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
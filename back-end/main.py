@@ -9,6 +9,17 @@ from contextlib import asynccontextmanager
 from config_fastapi import settings
 from database import init_db, engine
 from models_fastapi import Base
+from responses import FastJSONResponse
+from compression import CompressionMiddleware
+from rate_limit import RateLimitMiddleware
+from shared_state import get_shared_state, close_shared_state
+from group_commit import close_status_batcher
+from read_replica import start_replica_snapshots, stop_replica_snapshots
+from archive import start_archiver, stop_archiver
+from partitions import start_partition_maintenance, stop_partition_maintenance
+from token_revocation import get_revocation_store, close_revocation_store
+from job_queue import start_job_queue, stop_job_queue
+from reminders import start_reminders, stop_reminders
 
 # Import routers
 from routers import auth, activities, admin
@@ -22,11 +33,27 @@ async def lifespan(app: FastAPI):
     print("🚀 Initializing database...")
     init_db()
     print("✅ Database initialized")
+    get_shared_state()
+    start_job_queue()
+    start_reminders()
+    start_replica_snapshots()
+    start_archiver()
+    start_partition_maintenance()
+    get_revocation_store()
     
     yield
     
-    # Shutdown: Cleanup (if needed)
+    # Shutdown: il server ha già atteso le richieste in corso
+    # (graceful_shutdown_timeout), ora si rilasciano le risorse condivise
     print("👋 Shutting down...")
+    close_revocation_store()
+    stop_partition_maintenance()
+    stop_archiver()
+    stop_replica_snapshots()
+    stop_reminders()
+    stop_job_queue()
+    close_status_batcher()
+    close_shared_state()
 
 # Create FastAPI application
 app = FastAPI(
@@ -64,9 +91,21 @@ app = FastAPI(
     3. All routes are protected except `/auth/login` and `/auth/register`
     """,
     lifespan=lifespan,
-    debug=settings.debug
+    debug=settings.debug,
+    default_response_class=FastJSONResponse
 )
 
+# Rate limiting e controllo di ammissione (dentro CORS: anche le risposte
+# 429/503 hanno gli header CORS)
+if settings.rate_limit_enabled or settings.max_concurrent_requests:
+    app.add_middleware(
+        RateLimitMiddleware,
+        rules=settings.rate_limit_rules if settings.rate_limit_enabled else None,
+        default=settings.rate_limit_default if settings.rate_limit_enabled else None,
+        max_concurrent=settings.max_concurrent_requests,
+        queue_timeout=settings.request_queue_timeout,
+    )
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -76,6 +115,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Configure response compression (gzip/brotli)
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    )
+
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(activities.router, prefix="/api")
@@ -132,11 +180,25 @@ if __name__ == "__main__":
     
     """)
     
-    uvicorn.run(
-        "main:app",
-        host=settings.host,
-        port=settings.port,
-        reload=settings.debug,
-        log_level="info" if settings.debug else "warning"
-    )
+    if settings.workers > 1:
+        # Multi-worker: un processo per core, stato condiviso via shared_state.
+        # Le migrazioni girano qui, una sola volta, prima di avviare i worker
+        init_db()
+        uvicorn.run(
+            "main:app",
+            host=settings.host,
+            port=settings.port,
+            workers=settings.workers,
+            timeout_graceful_shutdown=settings.graceful_shutdown_timeout,
+            log_level="info" if settings.debug else "warning"
+        )
+    else:
+        uvicorn.run(
+            "main:app",
+            host=settings.host,
+            port=settings.port,
+            reload=settings.debug,
+            timeout_graceful_shutdown=settings.graceful_shutdown_timeout,
+            log_level="info" if settings.debug else "warning"
+        )
 
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Script per migrare il database esistente e aggiungere il supporto admin
+
+Deprecato: per il backend FastAPI lo schema è gestito dalle migrazioni
+Alembic (migrations/, `alembic upgrade head`).
 """
 
 import os
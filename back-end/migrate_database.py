@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Script per migrare il database esistente aggiungendo la colonna user_id
+
+Deprecato: per il backend FastAPI lo schema è gestito dalle migrazioni
+Alembic (migrations/, `alembic upgrade head`).
 """
 
 import os
@@ -0,0 +1,65 @@
+"""
+Alembic environment for the FastAPI backend
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+
+from database import DATABASE_URL, Base
+import models_fastapi  # noqa: F401 - registra i modelli su Base.metadata
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get('configure_logger', True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Emit SQL to stdout instead of running against a database"""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=DATABASE_URL.startswith('sqlite'),
+        transaction_per_migration=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run migrations on a live connection"""
+    # Connessione passata da db_migrations.upgrade_database() all'avvio
+    connection = config.attributes.get('connection')
+
+    if connection is None:
+        engine = create_engine(DATABASE_URL)
+        with engine.connect() as connection:
+            _run(connection)
+        engine.dispose()
+    else:
+        _run(connection)
+
+
+def _run(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == 'sqlite',
+        # Ogni migrazione nella propria transazione: gli autocommit_block
+        # (indici CONCURRENTLY, backfill a lotti) non spezzano le altre
+        transaction_per_migration=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,124 @@
+"""
+Helpers for online-safe migrations
+
+- create_index_online / drop_index_online: on PostgreSQL indexes are built
+  with CONCURRENTLY outside the migration transaction, so writes are not
+  blocked; on SQLite a plain CREATE INDEX is used. Both are idempotent.
+- batched_backfill: fills a column in small committed batches instead of a
+  single UPDATE that would hold the write lock for the whole table.
+- is_shard: True when migrating a secondary shard, which only holds the
+  activity tables and rls_context (see database.py): migrations of other
+  tables skip it.
+"""
+from typing import Optional, Sequence
+
+from alembic import context, op
+from sqlalchemy import inspect, text
+
+
+def is_shard() -> bool:
+    """
+    Check whether the database being migrated is a secondary shard
+
+    Set by database.py through the Alembic config, or from the command line
+    with `alembic -x shard=true upgrade head`.
+    """
+    if context.config.attributes.get('shard'):
+        return True
+    return context.get_x_argument(as_dictionary=True).get('shard', '').lower() in ('1', 'true', 'yes')
+
+
+def table_exists(table: str) -> bool:
+    """Check whether a table exists in the current database"""
+    return inspect(op.get_bind()).has_table(table)
+
+
+def column_exists(table: str, column: str) -> bool:
+    """Check whether a column exists in a table"""
+    columns = inspect(op.get_bind()).get_columns(table)
+    return any(col['name'] == column for col in columns)
+
+
+def index_exists(table: str, name: str) -> bool:
+    """Check whether an index exists on a table"""
+    indexes = inspect(op.get_bind()).get_indexes(table)
+    return any(index['name'] == name for index in indexes)
+
+
+def create_index_online(
+    name: str, table: str, columns: Sequence[str], unique: bool = False, where: Optional[str] = None
+) -> None:
+    """
+    Create an index without locking writes (no-op if it already exists)
+
+    Args:
+        name: Index name
+        table: Table name
+        columns: Indexed columns, in order
+        unique: Whether the index is unique
+        where: SQL condition of a partial index (same on SQLite and PostgreSQL)
+    """
+    if index_exists(table, name):
+        return
+
+    partial = {'sqlite_where': text(where), 'postgresql_where': text(where)} if where else {}
+    if op.get_bind().dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY non può girare dentro una transazione
+        with op.get_context().autocommit_block():
+            op.create_index(name, table, list(columns), unique=unique, postgresql_concurrently=True, **partial)
+    else:
+        op.create_index(name, table, list(columns), unique=unique, **partial)
+
+
+def drop_index_online(name: str, table: str) -> None:
+    """Drop an index without locking writes (no-op if it does not exist)"""
+    if not index_exists(table, name):
+        return
+
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    else:
+        op.drop_index(name, table_name=table)
+
+
+def batched_backfill(
+    table: str,
+    set_clause: str,
+    where_clause: str,
+    batch_size: int = 1000,
+    params: Optional[dict] = None
+) -> int:
+    """
+    Backfill rows in committed batches
+
+    Each batch updates at most `batch_size` rows matching `where_clause` and
+    is committed on its own, so locks are held only briefly. `where_clause`
+    must stop matching a row once it has been updated (e.g. "col IS NULL"),
+    otherwise the loop never ends.
+
+    Args:
+        table: Table name
+        set_clause: SQL SET expression (e.g. "priority_rank = 2")
+        where_clause: SQL condition selecting rows still to backfill
+        batch_size: Rows per batch
+        params: Optional bound parameters used by the clauses
+
+    Returns:
+        Total number of updated rows
+    """
+    statement = text(
+        f"UPDATE {table} SET {set_clause} "
+        f"WHERE id IN (SELECT id FROM {table} WHERE {where_clause} LIMIT :batch_size)"
+    )
+    bind_params = dict(params or {}, batch_size=batch_size)
+    total = 0
+
+    with op.get_context().autocommit_block():
+        while True:
+            updated = op.get_bind().execute(statement, bind_params).rowcount
+            total += updated
+            if updated < batch_size:
+                break
+
+    return total
@@ -0,0 +1,142 @@
+"""baseline schema
+
+Consolidates the schema changes that migrate_database.py, update_db.py,
+update_database_auth.py, migrate_admin.py (is_admin column) and
+setup_rls_correct.py (rls_context and rls_policies tables) used to apply by
+hand. Every step is idempotent, so databases created by those scripts (or
+by create_all) are adopted as-is and only the missing pieces are added.
+
+Not included: the default admin account of migrate_admin.py (a known
+password does not belong in a migration) and the activities_view view and
+RLS triggers of setup_rls_correct.py. Run those scripts where they are
+needed; later migrations keep the view and triggers when they rebuild
+activities.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import table_exists, column_exists, create_index_online, is_shard
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+USER_INDEXES = ['username', 'email', 'created_at', 'updated_at', 'is_active', 'is_admin']
+ACTIVITY_INDEXES = [
+    'title', 'date', 'time', 'end_date', 'end_time', 'is_multi_day', 'is_multi_hour',
+    'status', 'priority', 'category', 'user_id', 'created_at', 'updated_at'
+]
+
+
+def upgrade() -> None:
+    # Gli shard secondari contengono solo attività e rls_context
+    shard = is_shard()
+
+    # ==================== USERS ====================
+    if not shard:
+        if not table_exists('users'):
+            op.create_table(
+                'users',
+                sa.Column('id', sa.Integer(), primary_key=True),
+                sa.Column('username', sa.String(80), nullable=False, unique=True),
+                sa.Column('email', sa.String(120), nullable=False, unique=True),
+                sa.Column('password_hash', sa.String(255), nullable=False),
+                sa.Column('created_at', sa.DateTime()),
+                sa.Column('updated_at', sa.DateTime()),
+                sa.Column('is_active', sa.Boolean(), server_default=sa.true()),
+                sa.Column('is_admin', sa.Boolean(), server_default=sa.false()),
+            )
+        elif not column_exists('users', 'is_admin'):
+            # Ex migrate_admin.py
+            op.add_column('users', sa.Column('is_admin', sa.Boolean(), server_default=sa.false()))
+
+        for column in USER_INDEXES:
+            create_index_online(f'ix_users_{column}', 'users', [column])
+
+    # ==================== ACTIVITIES ====================
+    if not table_exists('activities'):
+        op.create_table(
+            'activities',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('title', sa.String(200), nullable=False),
+            sa.Column('description', sa.Text()),
+            sa.Column('date', sa.Date(), nullable=False),
+            sa.Column('time', sa.Time()),
+            sa.Column('end_date', sa.Date()),
+            sa.Column('end_time', sa.Time()),
+            sa.Column('is_multi_day', sa.Boolean(), server_default=sa.false()),
+            sa.Column('is_multi_hour', sa.Boolean(), server_default=sa.false()),
+            sa.Column('status', sa.String(20), server_default='da-fare'),
+            sa.Column('priority', sa.String(20), server_default='media'),
+            sa.Column('category', sa.String(100)),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+    else:
+        # Ex migrate_database.py e update_db.py
+        legacy_columns = [
+            sa.Column('user_id', sa.Integer()),
+            sa.Column('end_date', sa.Date()),
+            sa.Column('end_time', sa.Time()),
+            sa.Column('is_multi_day', sa.Boolean(), server_default=sa.false()),
+            sa.Column('is_multi_hour', sa.Boolean(), server_default=sa.false()),
+        ]
+        for column in legacy_columns:
+            if not column_exists('activities', column.name):
+                op.add_column('activities', column)
+
+    for column in ACTIVITY_INDEXES:
+        create_index_online(f'ix_activities_{column}', 'activities', [column])
+
+    # ==================== RLS ====================
+    # Ex setup_rls_correct.py
+    if not table_exists('rls_context'):
+        op.create_table(
+            'rls_context',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('current_user_id', sa.Integer()),
+            sa.Column('session_id', sa.Text()),
+            sa.Column('created_at', sa.DateTime(), server_default=sa.func.current_timestamp()),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.func.current_timestamp()),
+            sa.CheckConstraint('id = 1', name='ck_rls_context_single_row'),
+        )
+        op.execute("INSERT INTO rls_context (id, current_user_id, session_id) VALUES (1, NULL, 'default')")
+
+    if not shard and not table_exists('rls_policies'):
+        rls_policies = op.create_table(
+            'rls_policies',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('table_name', sa.Text(), nullable=False),
+            sa.Column('policy_name', sa.Text(), nullable=False),
+            sa.Column('policy_type', sa.Text(), nullable=False),
+            sa.Column('policy_definition', sa.Text(), nullable=False),
+            sa.Column('is_active', sa.Boolean(), server_default=sa.true()),
+            sa.Column('created_at', sa.DateTime(), server_default=sa.func.current_timestamp()),
+        )
+        op.bulk_insert(rls_policies, [
+            {
+                'table_name': 'activities',
+                'policy_name': 'user_isolation',
+                'policy_type': policy_type,
+                'policy_definition': 'user_id = (SELECT current_user_id FROM rls_context WHERE id = 1)'
+            }
+            for policy_type in ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+        ])
+
+
+def downgrade() -> None:
+    # Elimina tutti i dati: solo per ricreare lo schema da zero
+    op.execute("DROP VIEW IF EXISTS activities_view")
+    if not is_shard():
+        op.drop_table('rls_policies')
+    op.drop_table('rls_context')
+    op.drop_table('activities')
+    if not is_shard():
+        op.drop_table('users')
@@ -0,0 +1,27 @@
+"""composite index on activities (user_id, date)
+
+Every list query filters by user_id and orders or filters by date; the
+single-column indexes force SQLite to pick one of the two and sort the rest.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_index_online, drop_index_online
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    create_index_online('ix_activities_user_id_date', 'activities', ['user_id', 'date'])
+
+
+def downgrade() -> None:
+    drop_index_online('ix_activities_user_id_date', 'activities')
@@ -0,0 +1,37 @@
+"""users.shard_key for tenant-sharded activity storage
+
+Existing users stay on shard 0, the main database, so no data moves.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import column_exists, is_shard
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if is_shard():
+        # Tabella solo del database principale
+        return
+
+    if not column_exists('users', 'shard_key'):
+        op.add_column(
+            'users',
+            sa.Column('shard_key', sa.Integer(), nullable=False, server_default='0')
+        )
+
+
+def downgrade() -> None:
+    if is_shard():
+        return
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('shard_key')
@@ -0,0 +1,54 @@
+"""activities_archive table for completed activities
+
+Completed activities older than the configured age are moved here by the
+archive job (archive.py), keeping their id.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import table_exists, create_index_online
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not table_exists('activities_archive'):
+        op.create_table(
+            'activities_archive',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=False),
+            sa.Column('title', sa.String(200), nullable=False),
+            sa.Column('description', sa.Text()),
+            sa.Column('date', sa.Date(), nullable=False),
+            sa.Column('time', sa.Time()),
+            sa.Column('end_date', sa.Date()),
+            sa.Column('end_time', sa.Time()),
+            sa.Column('is_multi_day', sa.Boolean()),
+            sa.Column('is_multi_hour', sa.Boolean()),
+            sa.Column('status', sa.String(20)),
+            sa.Column('priority', sa.String(20)),
+            sa.Column('category', sa.String(100)),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+            sa.Column('archived_at', sa.DateTime()),
+        )
+    create_index_online('ix_activities_archive_user_id_date', 'activities_archive', ['user_id', 'date'])
+
+
+def downgrade() -> None:
+    # Riporta le attività archiviate nella tabella principale prima di eliminarla
+    op.execute(
+        "INSERT INTO activities (id, title, description, date, time, end_date, end_time, "
+        "is_multi_day, is_multi_hour, status, priority, category, user_id, created_at, updated_at) "
+        "SELECT id, title, description, date, time, end_date, end_time, is_multi_day, is_multi_hour, "
+        "status, priority, category, user_id, created_at, updated_at FROM activities_archive"
+    )
+    op.drop_table('activities_archive')
@@ -0,0 +1,37 @@
+"""time partitioning of activities
+
+PostgreSQL: activities becomes a table range-partitioned by month on date.
+SQLite: activities_archive is split into yearly tables behind a view.
+See partitions.py.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+from partitions import (
+    convert_archive_to_yearly, merge_yearly_archive, partition_activities_table, unpartition_activities_table
+)
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        partition_activities_table(bind)
+    elif bind.dialect.name == 'sqlite':
+        convert_archive_to_yearly(bind)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        unpartition_activities_table(bind)
+    elif bind.dialect.name == 'sqlite':
+        merge_yearly_archive(bind)
@@ -0,0 +1,42 @@
+"""revoked_tokens table for JWT revocation
+
+Revoked tokens (logout) and per-user revocations (password change,
+deactivation) until the tokens they cover expire (token_revocation.py).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import table_exists, create_index_online, is_shard
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if is_shard():
+        # Tabella solo del database principale
+        return
+
+    if not table_exists('revoked_tokens'):
+        op.create_table(
+            'revoked_tokens',
+            sa.Column('jti', sa.String(64), primary_key=True),
+            sa.Column('user_id', sa.Integer()),
+            sa.Column('revoked_before', sa.DateTime()),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+        )
+    create_index_online('ix_revoked_tokens_user_id', 'revoked_tokens', ['user_id'])
+    create_index_online('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'])
+
+
+def downgrade() -> None:
+    if is_shard():
+        return
+    op.drop_table('revoked_tokens')
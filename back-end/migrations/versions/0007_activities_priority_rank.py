@@ -0,0 +1,51 @@
+"""activities.priority_rank and agenda index
+
+Sortable rank of the string priority (alta=0, media=1, bassa=2), backfilled
+in batches, and the (user_id, status, date, priority_rank, time) index used
+by GET /activities/agenda.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import column_exists, index_exists, create_index_online, drop_index_online, batched_backfill
+from partitions import is_partitioned
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+AGENDA_COLUMNS = ['user_id', 'status', 'date', 'priority_rank', 'time']
+
+
+def upgrade() -> None:
+    if not column_exists('activities', 'priority_rank'):
+        op.add_column('activities', sa.Column('priority_rank', sa.Integer()))
+
+    batched_backfill(
+        'activities',
+        "priority_rank = CASE priority WHEN 'alta' THEN 0 WHEN 'bassa' THEN 2 ELSE 1 END",
+        "priority_rank IS NULL"
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql' and is_partitioned(bind):
+        # CONCURRENTLY non è supportato sulle tabelle partizionate:
+        # l'indice viene creato su ogni partizione
+        if not index_exists('activities', 'ix_activities_agenda'):
+            op.create_index('ix_activities_agenda', 'activities', AGENDA_COLUMNS)
+        return
+
+    create_index_online('ix_activities_agenda', 'activities', AGENDA_COLUMNS)
+
+
+def downgrade() -> None:
+    drop_index_online('ix_activities_agenda', 'activities')
+    # resolve_fks=False: sugli shard la tabella users non esiste
+    with op.batch_alter_table('activities', reflect_kwargs={'resolve_fks': False}) as batch_op:
+        batch_op.drop_column('priority_rank')
@@ -0,0 +1,48 @@
+"""jobs table for the background job queue
+
+Jobs enqueued outside the request path and run by the worker threads of
+job_queue.py, with retries, delayed runs and visibility timeouts.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import table_exists, create_index_online, is_shard
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if is_shard():
+        # Tabella solo del database principale
+        return
+
+    if not table_exists('jobs'):
+        op.create_table(
+            'jobs',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(100), nullable=False),
+            sa.Column('payload', sa.Text()),
+            sa.Column('status', sa.String(20), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('max_attempts', sa.Integer(), nullable=False),
+            sa.Column('run_at', sa.DateTime(), nullable=False),
+            sa.Column('locked_until', sa.DateTime()),
+            sa.Column('last_error', sa.Text()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+    create_index_online('ix_jobs_status_run_at', 'jobs', ['status', 'run_at'])
+
+
+def downgrade() -> None:
+    if is_shard():
+        return
+    op.drop_table('jobs')
@@ -0,0 +1,34 @@
+"""activities (date, time) index for the reminder scheduler
+
+The scheduler of reminders.py reads the next window of activity start
+times of all users as a range scan on (date, time).
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+from migrations.helpers import index_exists, create_index_online, drop_index_online
+from partitions import is_partitioned
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql' and is_partitioned(bind):
+        # CONCURRENTLY non è supportato sulle tabelle partizionate
+        if not index_exists('activities', 'ix_activities_date_time'):
+            op.create_index('ix_activities_date_time', 'activities', ['date', 'time'])
+        return
+
+    create_index_online('ix_activities_date_time', 'activities', ['date', 'time'])
+
+
+def downgrade() -> None:
+    drop_index_online('ix_activities_date_time', 'activities')
@@ -0,0 +1,70 @@
+"""activities ids are never reused (SQLite AUTOINCREMENT)
+
+Without AUTOINCREMENT SQLite hands out max(id) + 1, so once the newest
+activity is archived its id goes to the next new activity: two rows with
+the same id, one live and one archived. The table is rebuilt with
+AUTOINCREMENT and its sequence starts above every id already archived.
+PostgreSQL sequences never reuse ids: nothing to do there.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19
+"""
+from alembic import op
+from sqlalchemy import text
+
+from migrations.helpers import table_exists
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def _rebuild_activities(autoincrement: bool) -> None:
+    bind = op.get_bind()
+    # Viste e trigger degli script RLS che dipendono da activities: la
+    # ricostruzione elimina la tabella, vengono ricreati dopo
+    dependents = bind.execute(text(
+        "SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL AND ("
+        "(type = 'trigger' AND tbl_name = 'activities') OR "
+        "(type = 'view' AND name != 'activities_archive' AND sql LIKE '%activities%'))"
+    )).all()
+    for object_type, name, _ in dependents:
+        op.execute(f'DROP {object_type.upper()} IF EXISTS "{name}"')
+
+    # resolve_fks=False: sugli shard la tabella users non esiste
+    with op.batch_alter_table(
+        'activities', recreate='always',
+        table_kwargs={'sqlite_autoincrement': autoincrement},
+        reflect_kwargs={'resolve_fks': False}
+    ):
+        pass
+
+    # Prima le viste, poi i trigger (che possono riferirsi alle viste)
+    for object_type, _, sql in sorted(dependents, key=lambda item: item[0] != 'view'):
+        op.execute(sql)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    _rebuild_activities(autoincrement=True)
+
+    # La sequenza parte dal massimo id mai usato, anche se già archiviato
+    if table_exists('activities_archive'):
+        archived = "COALESCE((SELECT MAX(id) FROM activities_archive), 0)"
+        op.execute(f"UPDATE sqlite_sequence SET seq = MAX(seq, {archived}) WHERE name = 'activities'")
+        op.execute(
+            f"INSERT INTO sqlite_sequence (name, seq) SELECT 'activities', {archived} "
+            "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'activities')"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    _rebuild_activities(autoincrement=False)
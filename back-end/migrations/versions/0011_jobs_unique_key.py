@@ -0,0 +1,41 @@
+"""jobs.unique_key: at most one queued or running job per unique name
+
+enqueue(unique=True) checked for an active job and then inserted, so two
+processes could both enqueue. The name of a unique job is now stored in
+unique_key, covered by a unique index limited to queued and running jobs:
+the second INSERT fails and is skipped.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import column_exists, create_index_online, drop_index_online, is_shard
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+ACTIVE_JOBS = "status IN ('queued', 'running')"
+
+
+def upgrade() -> None:
+    if is_shard():
+        # Tabella solo del database principale
+        return
+
+    if not column_exists('jobs', 'unique_key'):
+        op.add_column('jobs', sa.Column('unique_key', sa.String(100)))
+    create_index_online('ux_jobs_unique_key', 'jobs', ['unique_key'], unique=True, where=ACTIVE_JOBS)
+
+
+def downgrade() -> None:
+    if is_shard():
+        return
+    drop_index_online('ux_jobs_unique_key', 'jobs')
+    with op.batch_alter_table('jobs') as batch:
+        batch.drop_column('unique_key')
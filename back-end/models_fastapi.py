@@ -2,13 +2,21 @@
 SQLAlchemy models for FastAPI
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Time, Text, ForeignKey
+from functools import lru_cache
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Time, Text, ForeignKey, Index, case, text
 from sqlalchemy.orm import relationship
-from passlib.context import CryptContext
 from database import Base
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """
+    Password hashing context
+    
+    Created on first use: passlib is only needed by login/registration,
+    so it is kept out of the application import path.
+    """
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 class User(Base):
     """User model"""
@@ -22,6 +30,8 @@ class User(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     is_active = Column(Boolean, default=True, index=True)
     is_admin = Column(Boolean, default=False, index=True)
+    # Shard delle attività dell'utente (vedi database.get_shard_engine)
+    shard_key = Column(Integer, default=0, server_default='0', nullable=False)
 
     # Relationship
     activities = relationship("Activity", back_populates="user", cascade="all, delete-orphan")
@@ -31,11 +41,11 @@ class User(Base):
 
     def set_password(self, password: str):
         """Set password hash"""
-        self.password_hash = pwd_context.hash(password)
+        self.password_hash = get_pwd_context().hash(password)
 
     def check_password(self, password: str) -> bool:
         """Verify password"""
-        return pwd_context.verify(password, self.password_hash)
+        return get_pwd_context().verify(password, self.password_hash)
 
     def to_dict(self):
         """Convert to dictionary"""
@@ -50,9 +60,37 @@ class User(Base):
         }
 
 
+# Ordine di priorità ordinabile (0 = più urgente), salvato in priority_rank
+PRIORITY_RANKS = {'alta': 0, 'media': 1, 'bassa': 2}
+DEFAULT_PRIORITY_RANK = PRIORITY_RANKS['media']
+
+
+def priority_to_rank(priority: str) -> int:
+    """Sortable rank of a priority value"""
+    return PRIORITY_RANKS.get(priority, DEFAULT_PRIORITY_RANK)
+
+
+def priority_rank_expression(priority_column):
+    """SQL expression computing priority_rank from a priority column"""
+    return case(PRIORITY_RANKS, value=priority_column, else_=DEFAULT_PRIORITY_RANK)
+
+
+def _default_priority_rank(context) -> int:
+    return priority_to_rank(context.get_current_parameters().get('priority') or 'media')
+
+
 class Activity(Base):
     """Activity model"""
     __tablename__ = 'activities'
+    __table_args__ = (
+        Index('ix_activities_user_id_date', 'user_id', 'date'),
+        # Agenda: attività aperte per stato e data, già in ordine di priorità e ora
+        Index('ix_activities_agenda', 'user_id', 'status', 'date', 'priority_rank', 'time'),
+        # Promemoria: prossime attività di tutti gli utenti per inizio (reminders.py)
+        Index('ix_activities_date_time', 'date', 'time'),
+        # Id mai riutilizzati: quelli delle attività archiviate restano loro (migrazione 0010)
+        {'sqlite_autoincrement': True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False, index=True)
@@ -65,6 +103,9 @@ class Activity(Base):
     is_multi_hour = Column(Boolean, default=False, index=True)
     status = Column(String(20), default='da-fare', index=True)
     priority = Column(String(20), default='media', index=True)
+    # Calcolata da priority in scrittura (priority_to_rank()); le UPDATE che
+    # cambiano priority devono aggiornarla
+    priority_rank = Column(Integer, default=_default_priority_rank)
     category = Column(String(100), index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -95,3 +136,81 @@ class Activity(Base):
             'updatedAt': self.updated_at.isoformat() if self.updated_at else None
         }
 
+
+class ArchivedActivity(Base):
+    """Completed activity moved out of the activities table (see archive.py)"""
+    __tablename__ = 'activities_archive'
+    __table_args__ = (
+        Index('ix_activities_archive_user_id_date', 'user_id', 'date'),
+    )
+
+    # Stesso id dell'attività originale
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    title = Column(String(200), nullable=False)
+    description = Column(Text)
+    date = Column(Date, nullable=False)
+    time = Column(Time)
+    end_date = Column(Date)
+    end_time = Column(Time)
+    is_multi_day = Column(Boolean, default=False)
+    is_multi_hour = Column(Boolean, default=False)
+    status = Column(String(20), default='fatta')
+    priority = Column(String(20), default='media')
+    category = Column(String(100))
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ArchivedActivity {self.id}: {self.title}>'
+
+
+class RevokedToken(Base):
+    """Revoked JWT access token, or all tokens of a user (see token_revocation.py)"""
+    __tablename__ = 'revoked_tokens'
+
+    # jti del token (revoked_before: istante della revoca), oppure "user:<id>"
+    # per tutti i token emessi prima di revoked_before
+    jti = Column(String(64), primary_key=True)
+    user_id = Column(Integer, index=True)
+    revoked_before = Column(DateTime)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti}>'
+
+
+class Job(Base):
+    """Background job of the local job queue (see job_queue.py)"""
+    __tablename__ = 'jobs'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    # Argomenti del job in JSON
+    payload = Column(Text)
+    # queued, running, done, failed
+    status = Column(String(20), nullable=False, default='queued')
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    # Prima esecuzione possibile (ritardo o backoff dopo un errore)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Un job 'running' oltre questo istante torna disponibile (worker perso)
+    locked_until = Column(DateTime)
+    last_error = Column(Text)
+    # Nome del job accodato con unique=True: al massimo uno in coda o in esecuzione
+    unique_key = Column(String(100))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_jobs_status_run_at', 'status', 'run_at'),
+        Index(
+            'ux_jobs_unique_key', 'unique_key', unique=True,
+            sqlite_where=text("status IN ('queued', 'running')"),
+            postgresql_where=text("status IN ('queued', 'running')")
+        ),
+    )
+
+    def __repr__(self):
+        return f'<Job {self.id}: {self.name} ({self.status})>'
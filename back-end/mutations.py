@@ -0,0 +1,50 @@
+"""
+Write helpers that return the persisted row in the same round-trip
+
+INSERT/UPDATE ... RETURNING (SQLite 3.35+, PostgreSQL) replaces the
+commit + db.refresh() pattern, which costs one extra SELECT per write.
+On databases without RETURNING the row is read back with a single SELECT.
+"""
+from typing import Optional, Sequence
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+
+def insert_returning(db: Session, model, values: dict, columns: Sequence) -> Row:
+    """
+    INSERT a row and return `columns` of the inserted row
+
+    Python-side column defaults (created_at, status, ...) are applied by
+    SQLAlchemy exactly as for ORM inserts.
+    """
+    stmt = insert(model).values(**values)
+
+    if db.get_bind(model).dialect.insert_returning:
+        return db.execute(stmt.returning(*columns)).one()
+
+    primary_key = db.execute(stmt).inserted_primary_key[0]
+    return db.execute(select(*columns).where(model.id == primary_key)).one()
+
+
+def update_returning(db: Session, model, criteria: Sequence, values: dict, columns: Sequence) -> Optional[Row]:
+    """
+    UPDATE the row matching `criteria` and return `columns` of the new row
+
+    Returns:
+        The updated row, or None if no row matched
+    """
+    stmt = (
+        update(model)
+        .where(*criteria)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+    if db.get_bind(model).dialect.update_returning:
+        return db.execute(stmt.returning(*columns)).first()
+
+    if db.execute(stmt).rowcount == 0:
+        return None
+    return db.execute(select(*columns).where(*criteria)).first()
@@ -0,0 +1,383 @@
+"""
+Time partitioning of activities
+
+PostgreSQL: `activities` is range-partitioned on `date`, one partition per
+month (activities_pYYYY_MM) plus a DEFAULT partition for anything outside
+the created months. A periodic job creates the partitions of the coming
+months ahead of time; queries filtering on `date` are pruned by the
+planner, and an old month is detached with a metadata-only
+ALTER TABLE ... DETACH PARTITION.
+
+SQLite has no native partitioning. There the cold data - the archive tier
+(archive.py) - is split into one table per year (activities_archive_YYYY)
+behind the `activities_archive` view. Date-filtered list queries read only
+the yearly tables that overlap the requested range (archive_tables), and
+detaching a year just takes its table out of the view.
+"""
+import re
+from datetime import date
+from functools import lru_cache
+from typing import List, Optional
+
+from sqlalchemy import Column, Index, MetaData, Table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from config_fastapi import settings
+from models_fastapi import ArchivedActivity
+from periodic import PeriodicTask
+
+ARCHIVE_VIEW = 'activities_archive'
+YEAR_TABLE_RE = re.compile(r'^activities_archive_(\d{4})$')
+
+# Metadata separato: le tabelle annuali non fanno parte dello schema Alembic
+_partition_metadata = MetaData()
+
+
+# ==================== SQLITE: ARCHIVIO ANNUALE ====================
+
+@lru_cache(maxsize=None)
+def year_table(year: int) -> Table:
+    """Table object of the archive partition for `year`"""
+    return Table(
+        f'{ARCHIVE_VIEW}_{year}',
+        _partition_metadata,
+        *[
+            Column(column.name, column.type, primary_key=column.primary_key,
+                   autoincrement=False, nullable=column.nullable)
+            for column in ArchivedActivity.__table__.columns
+        ],
+        Index(f'ix_{ARCHIVE_VIEW}_{year}_user_id_date', 'user_id', 'date')
+    )
+
+
+def _object_type(conn: Connection, name: str) -> Optional[str]:
+    row = conn.execute(
+        text("SELECT type FROM sqlite_master WHERE name = :name"), {"name": name}
+    ).fetchone()
+    return row[0] if row else None
+
+
+def sqlite_archive_years(conn: Connection) -> List[int]:
+    """Years that have an archive table, in ascending order"""
+    names = conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'activities_archive_%'")
+    ).scalars()
+    return sorted(int(match.group(1)) for match in map(YEAR_TABLE_RE.match, names) if match)
+
+
+def rebuild_archive_view(conn: Connection) -> None:
+    """
+    (Re)create the activities_archive view over the yearly tables, with an
+    INSTEAD OF DELETE trigger so deletes through the view keep working
+    """
+    years = sqlite_archive_years(conn)
+    if not years:
+        # La vista deve avere almeno una tabella
+        year_table(date.today().year).create(conn, checkfirst=True)
+        years = [date.today().year]
+
+    columns = ', '.join(column.name for column in ArchivedActivity.__table__.columns)
+    conn.execute(text(f"DROP VIEW IF EXISTS {ARCHIVE_VIEW}"))
+    conn.execute(text(
+        f"CREATE VIEW {ARCHIVE_VIEW} AS "
+        + " UNION ALL ".join(f"SELECT {columns} FROM {ARCHIVE_VIEW}_{year}" for year in years)
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {ARCHIVE_VIEW}_delete INSTEAD OF DELETE ON {ARCHIVE_VIEW} BEGIN "
+        + " ".join(f"DELETE FROM {ARCHIVE_VIEW}_{year} WHERE id = OLD.id;" for year in years)
+        + " END"
+    ))
+
+
+def ensure_year_table(conn: Connection, year: int) -> Table:
+    """Return the archive table for `year`, creating it (and updating the view) if needed"""
+    table = year_table(year)
+    if _object_type(conn, table.name) is None:
+        table.create(conn)
+        rebuild_archive_view(conn)
+    return table
+
+
+def convert_archive_to_yearly(conn: Connection) -> None:
+    """
+    Split a plain activities_archive table into yearly tables behind a view
+
+    Idempotent: does nothing if activities_archive is already a view.
+    """
+    if _object_type(conn, ARCHIVE_VIEW) != 'table':
+        return
+
+    years = conn.execute(
+        text(f"SELECT DISTINCT CAST(strftime('%Y', date) AS INTEGER) FROM {ARCHIVE_VIEW}")
+    ).scalars().all()
+    for year in years:
+        table = year_table(year)
+        table.create(conn, checkfirst=True)
+        conn.execute(
+            text(f"INSERT INTO {table.name} SELECT * FROM {ARCHIVE_VIEW} WHERE strftime('%Y', date) = :year"),
+            {"year": f"{year:04d}"}
+        )
+
+    conn.execute(text(f"DROP TABLE {ARCHIVE_VIEW}"))
+    rebuild_archive_view(conn)
+
+
+def merge_yearly_archive(conn: Connection) -> None:
+    """Inverse of convert_archive_to_yearly: back to a single table"""
+    if _object_type(conn, ARCHIVE_VIEW) != 'view':
+        return
+
+    conn.execute(text(f"CREATE TABLE {ARCHIVE_VIEW}_merged AS SELECT * FROM {ARCHIVE_VIEW}"))
+    conn.execute(text(f"DROP VIEW {ARCHIVE_VIEW}"))
+    for year in sqlite_archive_years(conn):
+        conn.execute(text(f"DROP TABLE {ARCHIVE_VIEW}_{year}"))
+    ArchivedActivity.__table__.create(conn)
+    conn.execute(text(f"INSERT INTO {ARCHIVE_VIEW} SELECT * FROM {ARCHIVE_VIEW}_merged"))
+    conn.execute(text(f"DROP TABLE {ARCHIVE_VIEW}_merged"))
+
+
+def detach_archive_year(conn: Connection, year: int) -> str:
+    """
+    Take the archive of `year` out of the view (O(1): a rename)
+
+    Returns:
+        Name of the detached table, which can be exported and dropped
+    """
+    detached = f'activities_detached_{year}'
+    conn.execute(text(f"ALTER TABLE {ARCHIVE_VIEW}_{year} RENAME TO {detached}"))
+    rebuild_archive_view(conn)
+    return detached
+
+
+def archive_tables(db: Session, date_from: Optional[date], date_to: Optional[date]) -> List[Table]:
+    """
+    Archive tables that can hold rows between date_from and date_to
+
+    On SQLite only the overlapping yearly tables are returned (partition
+    pruning); elsewhere the single archive table.
+    """
+    conn = db.connection(bind_arguments={'mapper': ArchivedActivity})
+    if conn.dialect.name != 'sqlite':
+        return [ArchivedActivity.__table__]
+
+    return [
+        year_table(year)
+        for year in sqlite_archive_years(conn)
+        if (date_from is None or year >= date_from.year) and (date_to is None or year <= date_to.year)
+    ]
+
+
+def archive_insert_table(db: Session, year: int) -> Table:
+    """Table new archived rows of `year` are inserted into"""
+    conn = db.connection(bind_arguments={'mapper': ArchivedActivity})
+    if conn.dialect.name != 'sqlite':
+        return ArchivedActivity.__table__
+    return ensure_year_table(conn, year)
+
+
+# ==================== POSTGRESQL: PARTIZIONI MENSILI ====================
+
+def month_partition_name(month: date) -> str:
+    return f'activities_p{month.year}_{month.month:02d}'
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def is_partitioned(conn: Connection) -> bool:
+    """Whether activities is a partitioned table (PostgreSQL)"""
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('activities')"
+    )).first() is not None
+
+
+def ensure_month_partition(conn: Connection, month: date) -> bool:
+    """
+    Create the partition for the month starting at `month` if missing
+
+    Rows of that month already in the DEFAULT partition are moved into it,
+    so creation never fails on a partition constraint violation.
+
+    Returns:
+        True if the partition was created
+    """
+    name = month_partition_name(month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return False
+
+    bounds = {"lo": month, "hi": _add_months(month, 1)}
+    conn.execute(text(f"CREATE TABLE {name} (LIKE activities INCLUDING DEFAULTS)"))
+    conn.execute(text(
+        f"INSERT INTO {name} SELECT * FROM activities_default WHERE date >= :lo AND date < :hi"
+    ), bounds)
+    conn.execute(text("DELETE FROM activities_default WHERE date >= :lo AND date < :hi"), bounds)
+    conn.execute(text(
+        f"ALTER TABLE activities ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['lo'].isoformat()}') TO ('{bounds['hi'].isoformat()}')"
+    ))
+    return True
+
+
+def ensure_month_partitions(conn: Connection, start: date, months_ahead: int) -> int:
+    """Create the monthly partitions from `start` to months_ahead after today"""
+    month = start.replace(day=1)
+    last = _add_months(date.today().replace(day=1), months_ahead)
+    created = 0
+    while month <= last:
+        created += ensure_month_partition(conn, month)
+        month = _add_months(month, 1)
+    return created
+
+
+def _index_definitions(conn: Connection, table: str) -> List[str]:
+    """
+    CREATE INDEX statements of `table` (constraints excluded), rewritten
+    for the new activities table that replaces it
+    """
+    definitions = conn.execute(text(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = :table AND indexname NOT IN "
+        "(SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:table))"
+    ), {"table": table}).scalars()
+    return [re.sub(r' ON (ONLY )?\S+ ', ' ON activities ', definition, count=1) for definition in definitions]
+
+
+def partition_activities_table(conn: Connection, months_back: int = 60) -> None:
+    """
+    Convert activities into a table partitioned by month on `date`
+
+    The primary key becomes (id, date), as PostgreSQL requires the partition
+    key in every unique constraint; ids still come from the same sequence.
+    Months older than `months_back` stay in the DEFAULT partition.
+    """
+    if is_partitioned(conn):
+        return
+
+    conn.execute(text("ALTER TABLE activities RENAME TO activities_unpartitioned"))
+    # Gli indici esistenti a questa revisione, non quelli del modello (che
+    # possono riferirsi a colonne aggiunte da migrazioni successive)
+    indexes = _index_definitions(conn, 'activities_unpartitioned')
+    # La sequenza degli id sopravvive alla tabella originale
+    conn.execute(text("ALTER SEQUENCE IF EXISTS activities_id_seq OWNED BY NONE"))
+    conn.execute(text(
+        "CREATE TABLE activities (LIKE activities_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (date)"
+    ))
+    conn.execute(text("ALTER TABLE activities ADD PRIMARY KEY (id, date)"))
+    conn.execute(text("ALTER TABLE activities ADD FOREIGN KEY (user_id) REFERENCES users (id)"))
+    conn.execute(text("CREATE TABLE activities_default PARTITION OF activities DEFAULT"))
+
+    oldest = conn.execute(text("SELECT MIN(date) FROM activities_unpartitioned")).scalar()
+    earliest = _add_months(date.today().replace(day=1), -months_back)
+    ensure_month_partitions(conn, max(oldest or date.today(), earliest), settings.partition_months_ahead)
+
+    conn.execute(text("INSERT INTO activities SELECT * FROM activities_unpartitioned"))
+    conn.execute(text("DROP TABLE activities_unpartitioned"))
+    conn.execute(text("ALTER SEQUENCE IF EXISTS activities_id_seq OWNED BY activities.id"))
+
+    # Gli indici creati sulla tabella madre valgono per tutte le partizioni
+    for definition in indexes:
+        conn.execute(text(definition))
+
+
+def unpartition_activities_table(conn: Connection) -> None:
+    """
+    Turn the partitioned activities back into a plain table with primary
+    key (id), keeping rows, ids and indexes (inverse of
+    partition_activities_table)
+    """
+    if not is_partitioned(conn):
+        return
+
+    conn.execute(text("ALTER TABLE activities RENAME TO activities_partitioned"))
+    indexes = _index_definitions(conn, 'activities_partitioned')
+    conn.execute(text("ALTER SEQUENCE IF EXISTS activities_id_seq OWNED BY NONE"))
+    conn.execute(text(
+        "CREATE TABLE activities (LIKE activities_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ))
+    conn.execute(text("ALTER TABLE activities ADD PRIMARY KEY (id)"))
+    conn.execute(text("ALTER TABLE activities ADD FOREIGN KEY (user_id) REFERENCES users (id)"))
+
+    conn.execute(text("INSERT INTO activities SELECT * FROM activities_partitioned"))
+    # Elimina anche le partizioni collegate
+    conn.execute(text("DROP TABLE activities_partitioned"))
+    conn.execute(text("ALTER SEQUENCE IF EXISTS activities_id_seq OWNED BY activities.id"))
+
+    for definition in indexes:
+        conn.execute(text(definition))
+
+
+def detach_month_partition(conn: Connection, month: date) -> str:
+    """
+    Detach the partition of `month` from activities (metadata-only)
+
+    Returns:
+        Name of the detached table, which can be archived and dropped
+    """
+    name = month_partition_name(month.replace(day=1))
+    conn.execute(text(f"ALTER TABLE activities DETACH PARTITION {name}"))
+    return name
+
+
+# ==================== MANUTENZIONE ====================
+
+def maintain_partitions() -> None:
+    """Create the partitions of the coming months (PostgreSQL only)"""
+    from database import engine
+
+    if engine.dialect.name != 'postgresql':
+        return
+
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            created = ensure_month_partitions(
+                conn, date.today(), settings.partition_months_ahead
+            )
+            if created:
+                print(f"🗓️  Create {created} partizioni mensili di activities")
+
+
+_task: Optional[PeriodicTask] = None
+
+
+def start_partition_maintenance() -> None:
+    """Run maintain_partitions now and then periodically (PostgreSQL only)"""
+    global _task
+    from database import engine
+
+    if engine.dialect.name == 'postgresql' and _task is None:
+        _task = PeriodicTask(
+            'partition-maintenance',
+            settings.partition_maintenance_seconds,
+            maintain_partitions,
+            run_immediately=True
+        ).start()
+
+
+def stop_partition_maintenance() -> None:
+    """Stop the maintenance job (called on application shutdown)"""
+    global _task
+
+    if _task is not None:
+        _task.stop()
+        _task = None
+
+
+if __name__ == '__main__':
+    # Distacco manuale: python partitions.py detach 2019      (SQLite, anno)
+    #                   python partitions.py detach 2019-03   (PostgreSQL, mese)
+    import sys
+    from database import engine
+
+    if len(sys.argv) != 3 or sys.argv[1] != 'detach':
+        raise SystemExit("Uso: python partitions.py detach <anno|anno-mese>")
+
+    with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            year, month = map(int, sys.argv[2].split('-'))
+            name = detach_month_partition(conn, date(year, month, 1))
+        else:
+            name = detach_archive_year(conn, int(sys.argv[2]))
+    print(f"✅ Partizione distaccata: {name}")
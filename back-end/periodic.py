@@ -0,0 +1,49 @@
+"""
+Periodic background tasks
+
+A PeriodicTask runs a function every `interval` seconds on a daemon thread
+until stopped. Errors are logged and the task keeps running.
+"""
+import threading
+from typing import Callable
+
+
+class PeriodicTask:
+    """
+    Run `func` every `interval` seconds on a background thread
+
+    Args:
+        name: Thread name (shown in logs)
+        interval: Seconds between the end of one run and the start of the next
+        func: Callable without arguments
+        run_immediately: Run once in the caller's thread before starting
+    """
+
+    def __init__(self, name: str, interval: float, func: Callable[[], None], run_immediately: bool = False):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.run_immediately = run_immediately
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+
+    def start(self) -> 'PeriodicTask':
+        if self.run_immediately:
+            self._run_once()
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+
+    def _run_once(self) -> None:
+        try:
+            self.func()
+        except Exception as e:
+            print(f"Error in periodic task '{self.name}': {e}")
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._run_once()
@@ -0,0 +1,155 @@
+"""
+Connection pool instrumentation
+
+Every engine created by database.py uses InstrumentedQueuePool, which
+records for each checkout how long it took to get a connection (including
+opening a new one), whether the pool was exhausted so the request had to
+wait, and timeouts. The "checkout"/"checkin" pool events keep the number of
+connections in use and its peak. pool_metrics() returns a snapshot per
+engine, exposed by GET /api/admin/metrics: tail latencies caused by pool
+starvation show up as waits and slow checkouts.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+# Limiti superiori (ms) dei bucket dell'istogramma dei tempi di checkout
+LATENCY_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+
+class PoolMetrics:
+    """Counters of one connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record_checkout(self, elapsed_ms: float, waited: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.waits += waited
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+            self.histogram[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def record_timeout(self) -> None:
+        # Attesa senza successo: conta sia come attesa sia come timeout
+        with self._lock:
+            self.waits += 1
+            self.timeouts += 1
+
+    def connection_out(self) -> None:
+        with self._lock:
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def connection_in(self) -> None:
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+
+    def percentile_ms(self, fraction: float) -> float:
+        """Upper bound of the bucket containing the given fraction of checkouts"""
+        target = self.checkouts * fraction
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.histogram):
+            seen += count
+            if count and seen >= target:
+                return bound
+        return self.max_ms
+
+    def snapshot(self, pool: QueuePool) -> Dict[str, object]:
+        with self._lock:
+            return {
+                'pool_size': pool.size(),
+                'max_overflow': pool._max_overflow,
+                'timeout_s': pool.timeout(),
+                'in_use': self.in_use,
+                'peak_in_use': self.peak_in_use,
+                'idle': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'checkout_ms': {
+                    'avg': round(self.total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                    'p50': self.percentile_ms(0.50),
+                    'p95': self.percentile_ms(0.95),
+                    'p99': self.percentile_ms(0.99),
+                    'max': round(self.max_ms, 3),
+                },
+                'histogram_ms': {
+                    **{f'<={bound}': count for bound, count in zip(LATENCY_BUCKETS_MS, self.histogram)},
+                    f'>{LATENCY_BUCKETS_MS[-1]}': self.histogram[-1],
+                },
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times every checkout into its PoolMetrics"""
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        # Pool esaurito: il checkout deve attendere una restituzione
+        waited = (
+            self._max_overflow > -1
+            and self._overflow >= self._max_overflow
+            and self._pool.empty()
+        )
+        start = time.perf_counter()
+        try:
+            entry = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record_checkout((time.perf_counter() - start) * 1000, waited)
+        return entry
+
+    def recreate(self) -> 'InstrumentedQueuePool':
+        # Dopo dispose() i contatori proseguono sul nuovo pool
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+
+def instrument_engine(engine: Engine, name: str) -> Engine:
+    """Register the pool of `engine` under `name` in the metrics"""
+    if not isinstance(engine.pool, InstrumentedQueuePool):
+        return engine
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        engine.pool.metrics.connection_out()
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        engine.pool.metrics.connection_in()
+
+    with _engines_lock:
+        _engines[name] = engine
+    return engine
+
+
+def pool_metrics() -> Dict[str, Dict[str, object]]:
+    """Snapshot of every instrumented pool, by engine name"""
+    with _engines_lock:
+        engines = dict(_engines)
+    return {name: engine.pool.metrics.snapshot(engine.pool) for name, engine in engines.items()}
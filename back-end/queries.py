@@ -0,0 +1,102 @@
+"""
+Hot statements as cached lambda statements
+
+Every request used to rebuild the same db.query(...).filter(...) construct
+and let SQLAlchemy derive its cache key before finding the compiled SQL in
+the compiled cache. lambda_stmt() keys the statement on the lambda's code
+location instead: the construct is built once per process and later calls
+only extract the bound parameters (the closure variables: ids, dates,
+statuses) and reuse the compiled SQL. Only plain values may be captured
+by the lambdas.
+"""
+from datetime import date
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, lambda_stmt, select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from models_fastapi import Activity, ArchivedActivity, User
+from serializers import ACTIVITY_COLUMNS, activity_row_to_dict
+
+# Le tabelle delle attività possono stare su uno shard: bind esplicito
+_ACTIVITY_BIND = {'mapper': Activity}
+
+
+def get_user(db: Session, user_id: int) -> Optional[User]:
+    """User by id (ORM object)"""
+    stmt = lambda_stmt(lambda: select(User))
+    stmt += lambda s: s.where(User.id == user_id)
+    return db.scalars(stmt).first()
+
+
+def get_activity_row(db: Session, activity_id: int, user_id: int) -> Optional[dict]:
+    """Serialized activity of `user_id`, None if it does not exist"""
+    stmt = lambda_stmt(lambda: select(*ACTIVITY_COLUMNS))
+    stmt += lambda s: s.where(Activity.id == activity_id, Activity.user_id == user_id)
+    row = db.execute(stmt, bind_arguments=_ACTIVITY_BIND).first()
+    return activity_row_to_dict(row) if row else None
+
+
+def get_activity_schedule(db: Session, activity_id: int, user_id: int) -> Optional[Row]:
+    """(date, end_date, time, end_time) of an activity, for write validation"""
+    stmt = lambda_stmt(lambda: select(Activity.date, Activity.end_date, Activity.time, Activity.end_time))
+    stmt += lambda s: s.where(Activity.id == activity_id, Activity.user_id == user_id)
+    return db.execute(stmt, bind_arguments=_ACTIVITY_BIND).first()
+
+
+def delete_activity(db: Session, activity_id: int, user_id: int) -> bool:
+    """Delete an activity of `user_id`; False if it does not exist"""
+    stmt = lambda_stmt(lambda: delete(Activity).execution_options(synchronize_session=False))
+    stmt += lambda s: s.where(Activity.id == activity_id, Activity.user_id == user_id)
+    return db.execute(stmt, bind_arguments=_ACTIVITY_BIND).rowcount > 0
+
+
+def count_by(db: Session, user_id: int, column_name: str) -> Dict[Optional[str], int]:
+    """Activities of `user_id` grouped by 'status', 'priority' or 'category' (None included)"""
+    # Una lambda per colonna: la colonna fa parte della struttura, non dei parametri
+    if column_name == 'status':
+        stmt = lambda_stmt(lambda: select(Activity.status, func.count(Activity.id)).group_by(Activity.status))
+    elif column_name == 'priority':
+        stmt = lambda_stmt(lambda: select(Activity.priority, func.count(Activity.id)).group_by(Activity.priority))
+    else:
+        stmt = lambda_stmt(lambda: select(Activity.category, func.count(Activity.id)).group_by(Activity.category))
+    stmt += lambda s: s.where(Activity.user_id == user_id)
+    return dict(db.execute(stmt, bind_arguments=_ACTIVITY_BIND).all())
+
+
+def count_in_range(db: Session, user_id: int, start: date, end: Optional[date] = None) -> int:
+    """Activities of `user_id` dated from `start` (inclusive) to `end` (exclusive)"""
+    stmt = lambda_stmt(lambda: select(func.count(Activity.id)))
+    stmt += lambda s: s.where(Activity.user_id == user_id, Activity.date >= start)
+    if end is not None:
+        stmt += lambda s: s.where(Activity.date < end)
+    return db.execute(stmt, bind_arguments=_ACTIVITY_BIND).scalar()
+
+
+def count_archived_by(db: Session, user_id: int, column_name: str) -> Dict[Optional[str], int]:
+    """Archived activities of `user_id` grouped by 'status', 'priority' or 'category'"""
+    if column_name == 'status':
+        stmt = lambda_stmt(lambda: select(ArchivedActivity.status, func.count()).group_by(ArchivedActivity.status))
+    elif column_name == 'priority':
+        stmt = lambda_stmt(lambda: select(ArchivedActivity.priority, func.count()).group_by(ArchivedActivity.priority))
+    else:
+        stmt = lambda_stmt(lambda: select(ArchivedActivity.category, func.count()).group_by(ArchivedActivity.category))
+    stmt += lambda s: s.where(ArchivedActivity.user_id == user_id)
+    return dict(db.execute(stmt, bind_arguments=_ACTIVITY_BIND).all())
+
+
+def count_archived_in_range(db: Session, user_id: int, start: date, end: date) -> int:
+    """Archived activities of `user_id` dated from `start` (inclusive) to `end` (exclusive)"""
+    stmt = lambda_stmt(lambda: select(func.count()).select_from(ArchivedActivity))
+    stmt += lambda s: s.where(
+        ArchivedActivity.user_id == user_id, ArchivedActivity.date >= start, ArchivedActivity.date < end
+    )
+    return db.execute(stmt, bind_arguments=_ACTIVITY_BIND).scalar()
+
+
+def list_categories(db: Session, user_id: int) -> List[str]:
+    """Distinct categories used by `user_id`"""
+    stmt = lambda_stmt(lambda: select(Activity.category).distinct())
+    stmt += lambda s: s.where(Activity.category.isnot(None), Activity.user_id == user_id)
+    return [category for category, in db.execute(stmt, bind_arguments=_ACTIVITY_BIND) if category]
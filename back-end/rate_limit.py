@@ -0,0 +1,172 @@
+"""
+Rate limiting and admission control middleware
+
+- Rate limiting: one token bucket per (budget, client). Clients are keyed
+  by user id (from the access token) or by IP for the auth routes and
+  anonymous requests. Budgets are configured per route
+  ("POST /api/auth/login": "10/minute"), with a default for everything
+  else. Buckets live in the shared state backend, so with the sqlite
+  backend the budgets hold across workers. Over budget: 429 + Retry-After.
+- Admission control: at most `max_concurrent` requests are processed at
+  once. Further requests wait up to `queue_timeout` seconds for a slot,
+  then are rejected with 503, instead of piling up in the threadpool and
+  waiting for a database connection.
+"""
+import asyncio
+import math
+from typing import Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from responses import FastJSONResponse
+from shared_state import LocalSharedState, get_shared_state
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600}
+
+# Route sempre ammesse (health check, documentazione)
+EXEMPT_PATHS = ('/', '/api/health', '/docs', '/redoc', '/openapi.json')
+
+
+def parse_budget(budget: str) -> Tuple[float, float]:
+    """
+    Parse a budget such as "10/minute"
+
+    Returns:
+        (tokens per second, bucket capacity)
+    """
+    count, _, period = budget.partition('/')
+    try:
+        count = float(count)
+        seconds = _PERIODS[period.strip().lower()]
+    except (KeyError, ValueError):
+        raise ValueError(f"Budget di rate limit non valido: {budget!r} (es. '10/minute')")
+    if not 0 < count < math.inf:
+        raise ValueError(f"Budget di rate limit non valido: {budget!r} (il numero di richieste deve essere positivo)")
+    return count / seconds, count
+
+
+class RateLimitMiddleware:
+    """
+    Token-bucket rate limiter and global concurrency limiter
+
+    Args:
+        app: ASGI application
+        rules: {"METHOD /path": "N/period"}; a path ending with "*" matches
+            every path with that prefix
+        default: Budget for the routes without a rule (None = unlimited)
+        max_concurrent: Requests processed at once (0 = unlimited)
+        queue_timeout: Seconds a request may wait for a free slot
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        rules: Optional[Dict[str, str]] = None,
+        default: Optional[str] = None,
+        max_concurrent: int = 0,
+        queue_timeout: float = 0.0,
+    ):
+        self.app = app
+        self.exact: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self.prefixes: List[Tuple[str, str, Tuple[float, float]]] = []
+        for rule, budget in (rules or {}).items():
+            method, _, path = rule.strip().partition(' ')
+            if path.endswith('*'):
+                self.prefixes.append((method.upper(), path[:-1], parse_budget(budget)))
+            else:
+                self.exact[(method.upper(), path)] = parse_budget(budget)
+        # Prefisso più lungo per primo
+        self.prefixes.sort(key=lambda prefix: len(prefix[1]), reverse=True)
+        self.default = parse_budget(default) if default else None
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def budget_for(self, method: str, path: str) -> Tuple[str, Optional[Tuple[float, float]]]:
+        """Return the budget name and (rate, capacity) for a request"""
+        budget = self.exact.get((method, path))
+        if budget is not None:
+            return f'{method} {path}', budget
+
+        for rule_method, prefix, budget in self.prefixes:
+            if rule_method == method and path.startswith(prefix):
+                return f'{method} {prefix}*', budget
+
+        return 'default', self.default
+
+    def client_key(self, scope: Scope, path: str) -> str:
+        """User id from the access token, or client IP for auth routes and anonymous requests"""
+        if not path.startswith('/api/auth/'):
+            authorization = Headers(scope=scope).get('authorization', '')
+            scheme, _, token = authorization.partition(' ')
+            if scheme.lower() == 'bearer' and token:
+                from auth_fastapi import verify_token  # verifica in cache (jwt_backends.py)
+
+                payload = verify_token(token)
+                if payload is not None and payload.get('user_id') is not None:
+                    return f"user:{payload['user_id']}"
+
+        client = scope.get('client')
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def _admit(self) -> bool:
+        """Take a processing slot, waiting at most queue_timeout seconds"""
+        if self._slots is None:
+            # Creato nel loop del server
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return True
+        if self.queue_timeout <= 0:
+            return False
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['method'] == 'OPTIONS' or scope['path'] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        method, path = scope['method'], scope['path']
+        name, budget = self.budget_for(method, path)
+        if budget is not None:
+            rate, capacity = budget
+            key = f'rate:{name}:{self.client_key(scope, path)}'
+            shared = get_shared_state()
+            if isinstance(shared, LocalSharedState):
+                wait = shared.take_token(key, rate, capacity)
+            else:
+                # Scrittura SQLite (con attesa del lock): fuori dal loop degli eventi
+                wait = await run_in_threadpool(shared.take_token, key, rate, capacity)
+            if wait > 0:
+                response = FastJSONResponse(
+                    {'detail': 'Troppe richieste, riprova più tardi'},
+                    status_code=429,
+                    headers={'Retry-After': str(math.ceil(wait))}
+                )
+                await response(scope, receive, send)
+                return
+
+        if not self.max_concurrent:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self._admit():
+            response = FastJSONResponse(
+                {'detail': 'Server sovraccarico, riprova più tardi'},
+                status_code=503,
+                headers={'Retry-After': '1'}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._slots.release()
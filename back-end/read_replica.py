@@ -0,0 +1,72 @@
+"""
+Read-only SQLite snapshots used as read replicas
+
+Every `read_replica_snapshot_seconds` each SQLite database (main database
+and activity shards) is copied with the SQLite online backup API next to the
+original (`planner_activities_dev_replica.db`). Admin reporting queries read
+from these copies through database.get_read_engine(), so they never hold
+locks on the primary files used by user writes.
+"""
+import os
+import sqlite3
+import time
+from typing import Optional
+
+from config_fastapi import settings
+from database import get_database_path, replica_path
+from periodic import PeriodicTask
+
+
+def snapshot_database(source: str, target: str) -> None:
+    """Copy the SQLite database `source` over `target` (consistent snapshot)"""
+    src = sqlite3.connect(source, timeout=30)
+    dst = sqlite3.connect(target, timeout=30)
+    try:
+        src.backup(dst)
+        # La copia viene aperta in sola lettura: niente WAL (richiede -shm scrivibile)
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+        src.close()
+
+
+def snapshot_replicas() -> None:
+    """Refresh the snapshot of every SQLite database"""
+    interval = settings.read_replica_snapshot_seconds
+    for shard in range(settings.shard_count):
+        if shard == 0 and settings.read_replica_url:
+            continue
+        path = get_database_path(shard)
+        if path is None:
+            continue
+
+        target = replica_path(path)
+        # Con più worker basta che uno aggiorni la copia
+        if os.path.exists(target) and time.time() - os.path.getmtime(target) < interval / 2:
+            continue
+        snapshot_database(path, target)
+
+
+_task: Optional[PeriodicTask] = None
+
+
+def start_replica_snapshots() -> None:
+    """Take a first snapshot and keep refreshing it (no-op if disabled)"""
+    global _task
+
+    if settings.read_replica_snapshot_seconds > 0 and _task is None:
+        _task = PeriodicTask(
+            'replica-snapshot',
+            settings.read_replica_snapshot_seconds,
+            snapshot_replicas,
+            run_immediately=True
+        ).start()
+
+
+def stop_replica_snapshots() -> None:
+    """Stop refreshing the snapshots (called on application shutdown)"""
+    global _task
+
+    if _task is not None:
+        _task.stop()
+        _task = None
@@ -0,0 +1,423 @@
+"""
+Reminders for upcoming timed activities
+
+A scheduler thread keeps a min-heap of the reminders of the next
+`reminder_window_hours`: each entry fires `reminder_lead_minutes` before
+the start of an open timed activity. The heap is filled incrementally,
+every `reminder_refill_seconds`, with a range scan of the (date, time)
+index of every shard covering only the start times not loaded yet, and is
+capped at `reminder_max_pending` entries: memory stays bounded whatever
+the number of future activities, the rest is loaded as the window moves.
+Entries left behind by moved activities are dropped by rebuilding the heap
+once they outnumber the current ones.
+
+Activities created or moved into the loaded window are pushed by the
+activity routes (schedule_activity, shared between workers through
+shared_state); changes received while a refill is reading are applied
+again once it has moved the loaded window. Before firing, the activity is
+read again by primary key: deleted, completed or rescheduled activities
+are skipped.
+
+Reminders go to a sink chosen with `reminder_sink`:
+- "log": printed on stdout
+- "publish": "reminders" channel of shared_state, for in-process consumers
+  such as an SSE hub
+- "webhook": POST of the event to `reminder_webhook_url`, sent by the job
+  queue with its retries
+"""
+import heapq
+import json
+import threading
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, select
+
+from agenda import OPEN_STATUSES
+from config_fastapi import settings
+from database import get_shard_session
+from job_queue import enqueue, job
+from models_fastapi import Activity
+from shared_state import LocalSharedState, get_shared_state
+
+CHANNEL = 'reminders'
+SCHEDULE_CHANNEL = 'reminder-schedule'
+
+# (ora di invio, inizio, shard, id attività)
+Entry = Tuple[datetime, datetime, int, int]
+
+
+def _start_of(activity_date: date, activity_time: time) -> datetime:
+    return datetime.combine(activity_date, activity_time).replace(microsecond=0)
+
+
+# ==================== SINKS ====================
+
+class LogSink:
+    """Print reminders on stdout"""
+
+    def emit(self, event: dict) -> None:
+        print(f"🔔 Promemoria per l'utente {event['user_id']}: '{event['title']}' alle {event['start']}")
+
+
+class PublishSink:
+    """Publish reminders on the shared_state channel "reminders" (every worker)"""
+
+    def emit(self, event: dict) -> None:
+        get_shared_state().publish(CHANNEL, event)
+
+
+class WebhookSink:
+    """POST reminders as JSON to a URL, through the job queue"""
+
+    def __init__(self, url: str):
+        if not url:
+            raise ValueError("reminder_webhook_url è obbligatorio con reminder_sink='webhook'")
+        self.url = url
+
+    def emit(self, event: dict) -> None:
+        enqueue('reminder.webhook', {'url': self.url, 'event': event})
+
+
+@job('reminder.webhook')
+def _send_webhook(payload: dict) -> None:
+    # Import qui: serve solo con reminder_sink='webhook'
+    import urllib.request
+
+    request = urllib.request.Request(
+        payload['url'],
+        data=json.dumps(payload['event']).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    with urllib.request.urlopen(request, timeout=10):
+        pass
+
+
+SINKS: Dict[str, Callable[[], object]] = {
+    'log': LogSink,
+    'publish': PublishSink,
+    'webhook': lambda: WebhookSink(settings.reminder_webhook_url),
+}
+
+
+def create_sink(name: str):
+    """Sink registered in SINKS under `name`"""
+    try:
+        return SINKS[name]()
+    except KeyError:
+        raise ValueError(f"Destinazione promemoria sconosciuta: {name!r} (valori: {', '.join(SINKS)})")
+
+
+# ==================== SCHEDULER ====================
+
+class ReminderScheduler:
+    """
+    Min-heap of the reminders due in the next window, fired by one thread
+
+    Args:
+        sink: Object with emit(event)
+        lead: How long before the start a reminder fires
+        window: How far ahead start times are loaded
+        max_pending: Maximum number of reminders kept in memory
+        refill_interval: Seconds between two loads of the next start times
+        now: Clock (local time, like the activity dates), for tests
+    """
+
+    def __init__(
+        self,
+        sink,
+        lead: timedelta,
+        window: timedelta,
+        max_pending: int,
+        refill_interval: float,
+        now: Callable[[], datetime] = datetime.now,
+    ):
+        self.sink = sink
+        self.lead = lead
+        self.window = window
+        self.max_pending = max_pending
+        self.refill_interval = refill_interval
+        self.now = now
+        self.fired = 0
+        self._heap: List[Entry] = []
+        # Inizio attuale di ogni attività in coda, per (shard, id): gli id sono
+        # per shard; le voci superate nel heap vengono ignorate
+        self._starts: Dict[Tuple[int, int], datetime] = {}
+        # Inizi già caricati fino a qui (compreso)
+        self._loaded_until = now().replace(microsecond=0)
+        # Modifiche ricevute durante la lettura di refill(), per (shard, id)
+        self._deferred: Optional[Dict[Tuple[int, int], Optional[datetime]]] = None
+        self._wake = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def pending(self) -> int:
+        return len(self._starts)
+
+    def _push(self, start: datetime, shard: int, activity_id: int) -> None:
+        heapq.heappush(self._heap, (start - self.lead, start, shard, activity_id))
+        self._starts[shard, activity_id] = start
+        self._compact()
+
+    def _forget(self, key: Tuple[int, int]) -> None:
+        self._starts.pop(key, None)
+        self._compact()
+
+    def _compact(self) -> None:
+        # Le voci superate restano nel heap fino all'ora di invio: quando sono
+        # più di quelle valide il heap si ricostruisce (costo ammortizzato O(1))
+        if len(self._heap) > 2 * len(self._starts) + 64:
+            self._heap = [
+                (start - self.lead, start, shard, activity_id)
+                for (shard, activity_id), start in self._starts.items()
+            ]
+            heapq.heapify(self._heap)
+
+    def refill(self) -> int:
+        """
+        Load the start times after the last loaded one, up to now + window
+        and to max_pending entries in memory
+
+        Returns:
+            Number of activities read
+        """
+        until = self.now().replace(microsecond=0) + self.window
+        with self._wake:
+            after = self._loaded_until
+            capacity = self.max_pending - len(self._starts)
+            if until <= after or capacity <= 0:
+                return 0
+            self._deferred = {}
+
+        rows, loaded_until = [], after
+        try:
+            rows, loaded_until = self._read(after, until, capacity)
+        finally:
+            with self._wake:
+                for row, shard in rows:
+                    start = _start_of(row.date, row.time)
+                    if row.status in OPEN_STATUSES and self._starts.get((shard, row.id)) != start:
+                        self._push(start, shard, row.id)
+                self._loaded_until = loaded_until
+                # Spostamenti e rimozioni arrivati durante la lettura: la riga
+                # letta può essere precedente, e il confronto con la finestra
+                # va rifatto con il nuovo _loaded_until
+                deferred, self._deferred = self._deferred, None
+                for (shard, activity_id), start in deferred.items():
+                    self._apply(shard, activity_id, start)
+                self._wake.notify()
+        return len(rows)
+
+    def _read(self, after: datetime, until: datetime, capacity: int) -> Tuple[list, datetime]:
+        """Rows of every shard to load after `after`, and the new loaded limit"""
+        rows = []
+        for shard in range(settings.shard_count):
+            rows.extend((row, shard) for row in self._load(shard, after, until, capacity + 1))
+        rows.sort(key=lambda item: _start_of(item[0].date, item[0].time))
+
+        loaded_until = until
+        if len(rows) > capacity:
+            # Oltre il limite: si tengono solo gli inizi precedenti al primo
+            # escluso, il resto verrà caricato quando si libera spazio
+            cut = _start_of(rows[capacity][0].date, rows[capacity][0].time)
+            kept = [item for item in rows if _start_of(item[0].date, item[0].time) < cut]
+            if kept:
+                rows = kept
+                loaded_until = cut - timedelta(microseconds=1)
+            else:
+                # Tutti allo stesso inizio: si caricano comunque tutti (anche
+                # quelli oltre il LIMIT di ogni shard), per avanzare
+                rows = []
+                for shard in range(settings.shard_count):
+                    rows.extend((row, shard) for row in self._load(shard, cut - timedelta(microseconds=1), cut))
+                loaded_until = cut
+        return rows, loaded_until
+
+    def _load(self, shard: int, after: datetime, until: datetime, limit: Optional[int] = None) -> list:
+        """Timed activities of a shard starting in (after, until], by start"""
+        db = get_shard_session(shard)
+        try:
+            # Solo intervallo sull'indice (date, time): con un filtro sullo
+            # stato SQLite sceglie ix_activities_status e ordina tutte le
+            # attività aperte. Lo stato si controlla in refill()
+            return db.execute(
+                select(Activity.id, Activity.date, Activity.time, Activity.status)
+                .where(
+                    Activity.date >= after.date(),
+                    Activity.date <= until.date(),
+                    or_(Activity.date > after.date(), Activity.time > after.time()),
+                    or_(Activity.date < until.date(), Activity.time <= until.time()),
+                    Activity.time.isnot(None)
+                )
+                .order_by(Activity.date, Activity.time)
+                .limit(limit)
+            ).all()
+        finally:
+            db.close()
+
+    def schedule(self, shard: int, activity_id: int, activity_date: Optional[date], activity_time: Optional[time]) -> None:
+        """Add or move the reminder of an activity written after its window was loaded"""
+        start = None
+        if activity_date is not None and activity_time is not None:
+            start = _start_of(activity_date, activity_time)
+        with self._wake:
+            if self._deferred is not None:
+                self._deferred[shard, activity_id] = start
+            self._apply(shard, activity_id, start)
+
+    def _apply(self, shard: int, activity_id: int, start: Optional[datetime]) -> None:
+        # Da chiamare con self._wake acquisito
+        key = (shard, activity_id)
+        if start is None or start > self._loaded_until or start <= self.now():
+            # Senza orario o fuori dalla finestra caricata: ci penserà refill()
+            self._forget(key)
+            return
+        if key not in self._starts and len(self._starts) >= self.max_pending:
+            # Coda piena: la finestra caricata si ferma prima di questo
+            # inizio, refill() lo caricherà quando si libera spazio
+            self._loaded_until = start - timedelta(microseconds=1)
+            return
+        self._push(start, shard, activity_id)
+        self._wake.notify()
+
+    def on_message(self, message: dict) -> None:
+        """Apply a schedule change published by a worker"""
+        self.schedule(
+            message['shard'],
+            message['id'],
+            date.fromisoformat(message['date']) if message.get('date') else None,
+            time.fromisoformat(message['time']) if message.get('time') else None
+        )
+
+    def _due(self) -> List[Entry]:
+        """Pop the entries due now that are still current"""
+        now = self.now()
+        due = []
+        with self._wake:
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                key = (entry[2], entry[3])
+                if self._starts.get(key) == entry[1]:
+                    del self._starts[key]
+                    due.append(entry)
+        return due
+
+    def fire(self, entry: Entry) -> bool:
+        """Send the reminder if the activity is still open and starts at the same time"""
+        fire_at, start, shard, activity_id = entry
+        db = get_shard_session(shard)
+        try:
+            row = db.execute(
+                select(Activity.user_id, Activity.title, Activity.date, Activity.time, Activity.status)
+                .where(Activity.id == activity_id)
+            ).first()
+        finally:
+            db.close()
+        if (row is None or row.time is None or row.status not in OPEN_STATUSES
+                or _start_of(row.date, row.time) != start):
+            return False
+
+        shared = get_shared_state()
+        if not isinstance(shared, LocalSharedState):
+            # Più worker caricano gli stessi promemoria: invia solo chi prende
+            # l'unico token del bucket (eliminato quando si ricarica, dopo un'ora)
+            key = f'reminder:{shard}:{activity_id}:{start.isoformat()}'
+            if shared.take_token(key, rate=1 / 3600, capacity=1) > 0:
+                return False
+
+        self.sink.emit({
+            'activity_id': activity_id,
+            'user_id': row.user_id,
+            'title': row.title,
+            'start': start.isoformat(),
+            'minutes_before': int(self.lead.total_seconds() // 60),
+        })
+        self.fired += 1
+        return True
+
+    def run_pending(self) -> int:
+        """Fire every due reminder; returns how many were sent"""
+        sent = 0
+        for entry in self._due():
+            try:
+                sent += self.fire(entry)
+            except Exception as e:
+                print(f"Error sending reminder for activity {entry[3]} (shard {entry[2]}): {e}")
+        return sent
+
+    def _loop(self) -> None:
+        next_refill = 0.0
+        while not self._stop.is_set():
+            if datetime.now().timestamp() >= next_refill:
+                try:
+                    self.refill()
+                except Exception as e:
+                    print(f"Error loading reminders: {e}")
+                next_refill = datetime.now().timestamp() + self.refill_interval
+            self.run_pending()
+
+            with self._wake:
+                timeout = next_refill - datetime.now().timestamp()
+                if self._heap:
+                    timeout = min(timeout, (self._heap[0][0] - self.now()).total_seconds())
+                if timeout > 0:
+                    self._wake.wait(timeout)
+
+    def start(self) -> 'ReminderScheduler':
+        self._thread = threading.Thread(target=self._loop, name='reminder-scheduler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+
+_scheduler: Optional[ReminderScheduler] = None
+
+
+def schedule_activity(activity: dict, shard: int) -> None:
+    """
+    Tell the schedulers of every worker that an activity was written
+    (call after commit with the serialized activity)
+    """
+    if not settings.reminders_enabled:
+        return
+    # Attività conclusa: senza orario il promemoria viene tolto dalla coda
+    is_open = activity['status'] in OPEN_STATUSES
+    get_shared_state().publish(SCHEDULE_CHANNEL, {
+        'id': activity['id'],
+        'shard': shard,
+        'date': activity['date'],
+        'time': activity['time'] if is_open else None,
+    })
+
+
+def start_reminders() -> None:
+    """Start the reminder scheduler (no-op if disabled)"""
+    global _scheduler
+
+    if settings.reminders_enabled and _scheduler is None:
+        _scheduler = ReminderScheduler(
+            create_sink(settings.reminder_sink),
+            lead=timedelta(minutes=settings.reminder_lead_minutes),
+            window=timedelta(hours=settings.reminder_window_hours),
+            max_pending=settings.reminder_max_pending,
+            refill_interval=settings.reminder_refill_seconds,
+        )
+        get_shared_state().subscribe(SCHEDULE_CHANNEL, _scheduler.on_message)
+        _scheduler.start()
+
+
+def stop_reminders() -> None:
+    """Stop the reminder scheduler (called on application shutdown)"""
+    global _scheduler
+
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
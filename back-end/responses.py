@@ -0,0 +1,102 @@
+"""
+Response classes for FastAPI
+"""
+import json
+from typing import Any, Dict, List
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # orjson è opzionale: fallback su json della stdlib
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack è opzionale: senza, solo il formato colonnare JSON
+    msgpack = None
+
+JSON_MEDIA_TYPE = 'application/json'
+COLUMNAR_MEDIA_TYPE = 'application/vnd.planner.columnar+json'
+MSGPACK_MEDIA_TYPE = 'application/x-msgpack'
+
+# Valori degli enum codificati come indici nei formati compatti
+ACTIVITY_ENUMS = {
+    'status': ['da-fare', 'in-corso', 'fatta', 'rimandata'],
+    'priority': ['bassa', 'media', 'alta'],
+}
+_ENUM_CODES = {
+    field: {value: code for code, value in enumerate(values)}
+    for field, values in ACTIVITY_ENUMS.items()
+}
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response serialized with orjson when available.
+
+    Content is expected to be already JSON-compatible (dict/list of
+    primitives), e.g. the rows produced by serializers.py, so FastAPI's
+    response_model validation is skipped when a route returns it directly.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+
+def negotiate_media_type(request: Request) -> str:
+    """
+    Wire format requested through the Accept header for activity lists:
+    MessagePack (if installed), columnar JSON, or plain JSON
+    """
+    accept = request.headers.get('accept', '')
+    if msgpack is not None and MSGPACK_MEDIA_TYPE in accept:
+        return MSGPACK_MEDIA_TYPE
+    if COLUMNAR_MEDIA_TYPE in accept:
+        return COLUMNAR_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def to_columnar(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Column-oriented form of serialized activities: every key appears once
+    and status/priority are indexes into `enums`
+
+        {"count": 2, "enums": {"status": [...], "priority": [...]},
+         "columns": {"id": [1, 2], "status": [0, 2], ...}}
+    """
+    columns: Dict[str, list] = {key: [] for key in rows[0]} if rows else {}
+    for row in rows:
+        for key, value in row.items():
+            columns[key].append(value)
+    for field, codes in _ENUM_CODES.items():
+        if field in columns:
+            columns[field] = [codes.get(value, value) for value in columns[field]]
+    return {'count': len(rows), 'enums': ACTIVITY_ENUMS, 'columns': columns}
+
+
+def render_activity_rows(rows: List[Dict[str, Any]], media_type: str) -> bytes:
+    """Serialize a list of activities in the negotiated wire format"""
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(to_columnar(rows), use_bin_type=True)
+    if media_type == COLUMNAR_MEDIA_TYPE:
+        return FastJSONResponse(to_columnar(rows)).body
+    return FastJSONResponse(rows).body
+
+
+def activity_rows_response(request: Request, rows: List[Dict[str, Any]]) -> Response:
+    """Response for a list of activities, in the format asked by the client"""
+    media_type = negotiate_media_type(request)
+    return Response(
+        content=render_activity_rows(rows, media_type),
+        media_type=media_type,
+        headers={'Vary': 'Accept'}
+    )
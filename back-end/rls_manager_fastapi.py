@@ -6,9 +6,9 @@ from typing import Optional
 from fastapi import Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from database import get_db
+from database import get_db, bind_shard
 from models_fastapi import User
-from auth_fastapi import get_current_user
+from auth_fastapi import get_token_user
 
 class RLSManager:
     """Manager for Row Level Security operations"""
@@ -96,7 +96,7 @@ def get_rls_manager(db: Session = Depends(get_db)) -> RLSManager:
     return RLSManager(db)
 
 def rls_dependency(
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_token_user),
     rls_manager: RLSManager = Depends(get_rls_manager)
 ) -> User:
     """
@@ -119,7 +119,7 @@ def rls_dependency(
     return current_user
 
 def admin_rls_dependency(
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_token_user),
     rls_manager: RLSManager = Depends(get_rls_manager)
 ) -> User:
     """
@@ -141,6 +141,22 @@ def admin_rls_dependency(
     
     return current_user
 
+def shard_dependency(
+    current_user: User = Depends(rls_dependency),
+    db: Session = Depends(get_db)
+) -> Session:
+    """
+    Dependency that returns the request session with the activities table
+    routed to the current user's shard
+    
+    Usage:
+        @router.get("/activities")
+        def get_activities(user: User = Depends(rls_dependency),
+                           db: Session = Depends(shard_dependency)):
+            ...
+    """
+    return bind_shard(db, current_user.shard_key)
+
 def get_rls_stats(db: Session) -> dict:
     """
     Get RLS statistics
@@ -1,55 +1,64 @@
 """
 Activities routes for FastAPI
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import or_
 from typing import List, Optional
-from datetime import datetime, date as date_type
+from datetime import datetime, timedelta, date as date_type
 
+from config_fastapi import settings
 from database import get_db
-from models_fastapi import User, Activity
+from models_fastapi import User, Activity, priority_to_rank
 from schemas import (
     ActivityCreate, ActivityUpdate, ActivityResponse, ActivityStatusUpdate,
-    ActivityStats, MessageResponse, HealthResponse, RLSStats, ActivityStatusEnum
+    ActivityWithConflicts, ActivityConflict, FreeSlot, ActivityStats, AgendaResponse, MessageResponse,
+    HealthResponse, RLSStats, ActivityStatusEnum,
+    ActivityPriorityEnum
 )
-from rls_manager_fastapi import rls_dependency, admin_rls_dependency, get_rls_stats, test_rls_isolation
+from rls_manager_fastapi import rls_dependency, admin_rls_dependency, shard_dependency, get_rls_stats, test_rls_isolation
+from serializers import ACTIVITY_COLUMNS, activity_row_to_dict, archive_select, select_activity_rows
+from mutations import insert_returning, update_returning
+from responses import FastJSONResponse, activity_rows_response
+from group_commit import get_status_batcher
+from archive import ARCHIVE_STATUS, archive_reaches
+from partitions import archive_tables
+from single_flight import bump_data_version, coalesced_response
+from agenda import build_agenda
+import queries
+from conflicts import conflicts_in_range, find_conflicts, note_activity_write
+from free_slots import MAX_RANGE_DAYS, find_free_slots
+from reminders import schedule_activity
 
 router = APIRouter(prefix="", tags=["Activities"])
 
 @router.get("/activities", response_model=List[ActivityResponse])
 def get_activities(
+    request: Request,
     status: Optional[str] = Query(None, description="Filter by status"),
     priority: Optional[str] = Query(None, description="Filter by priority"),
     category: Optional[str] = Query(None, description="Filter by category"),
     date_from: Optional[str] = Query(None, description="Filter from date (YYYY-MM-DD)"),
     date_to: Optional[str] = Query(None, description="Filter to date (YYYY-MM-DD)"),
     current_user: User = Depends(rls_dependency),
-    db: Session = Depends(get_db)
+    db: Session = Depends(shard_dependency)
 ):
     """
     Get all activities for current user with optional filters
     
+    Identical concurrent requests share one query (single_flight.py).
+    Compact formats are negotiated with the Accept header (responses.py).
+    
     - **status**: Filter by status (da-fare, in-corso, fatta, rimandata)
     - **priority**: Filter by priority (bassa, media, alta)
     - **category**: Filter by category
     - **date_from**: Filter from date
     - **date_to**: Filter to date
     """
-    # Base query - filter by user_id
-    query = db.query(Activity).filter(Activity.user_id == current_user.id)
-    
-    # Apply filters
-    if status:
-        query = query.filter(Activity.status == status)
-    if priority:
-        query = query.filter(Activity.priority == priority)
-    if category:
-        query = query.filter(Activity.category == category)
+    date_from_obj = date_to_obj = None
     if date_from:
         try:
             date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').date()
-            query = query.filter(Activity.date >= date_from_obj)
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -58,31 +67,249 @@ def get_activities(
     if date_to:
         try:
             date_to_obj = datetime.strptime(date_to, '%Y-%m-%d').date()
-            query = query.filter(Activity.date <= date_to_obj)
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Formato date_to non valido (usa YYYY-MM-DD)"
             )
     
-    # Order by date and time
-    activities = query.order_by(Activity.date.desc(), Activity.time.desc()).all()
+    def filters(model) -> list:
+        # Base criteria - filter by user_id
+        criteria = [model.user_id == current_user.id]
+        
+        # Apply filters
+        if status:
+            criteria.append(model.status == status)
+        if priority:
+            criteria.append(model.priority == priority)
+        if category:
+            criteria.append(model.category == category)
+        if date_from_obj:
+            criteria.append(model.date >= date_from_obj)
+        if date_to_obj:
+            criteria.append(model.date <= date_to_obj)
+        return criteria
+    
+    def compute() -> list:
+        # Completed activities older than the horizon live in the archive,
+        # split by year on SQLite: only the years in range are read
+        archived = [
+            archive_select(table).where(*filters(table.c))
+            for table in archive_tables(db, date_from_obj, date_to_obj)
+        ] if archive_reaches(date_from_obj, status) else None
+        
+        # Order by date and time - lean read path, no ORM hydration
+        return select_activity_rows(
+            db, *filters(Activity),
+            order_by=(Activity.date.desc(), Activity.time.desc()),
+            union=archived
+        )
+    
+    return coalesced_response(request, current_user.id, compute, activity_rows=True)
+
+# /agenda, /conflicts, /free-slots, /stats e /categories prima di /{activity_id}, che altrimenti le intercetta
+@router.get("/activities/agenda", response_model=AgendaResponse)
+def get_agenda(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of activities"),
+    date: Optional[str] = Query(None, description="Reference day (YYYY-MM-DD), default today"),
+    current_user: User = Depends(rls_dependency),
+    db: Session = Depends(shard_dependency)
+):
+    """
+    What to do next: open activities that are overdue, then today's by time
+    and priority, then upcoming ones, up to `limit` in total
+    
+    - **limit**: Maximum number of activities (1-100)
+    - **date**: Reference day, default today
+    """
+    today = datetime.now().date()
+    if date:
+        try:
+            today = datetime.strptime(date, '%Y-%m-%d').date()
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Formato data non valido (usa YYYY-MM-DD)"
+            )
+    
+    return coalesced_response(
+        request, current_user.id, lambda: build_agenda(db, current_user.id, today, limit)
+    )
+
+@router.get("/activities/conflicts", response_model=List[ActivityConflict])
+def get_conflicts(
+    request: Request,
+    date_from: Optional[str] = Query(None, alias="from", description="First day (YYYY-MM-DD), default today"),
+    date_to: Optional[str] = Query(None, alias="to", description="Last day (YYYY-MM-DD), default 30 days after from"),
+    current_user: User = Depends(rls_dependency),
+    db: Session = Depends(shard_dependency)
+):
+    """
+    Pairs of timed activities that overlap between two days (inclusive)
+    
+    - **from**: First day, default today
+    - **to**: Last day, default 30 days after `from`
+    """
+    try:
+        first_day = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else datetime.now().date()
+        last_day = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else first_day + timedelta(days=30)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato data non valido (usa YYYY-MM-DD)"
+        )
+    
+    if last_day < first_day:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La data di fine non può essere precedente alla data di inizio"
+        )
+    
+    start = datetime.combine(first_day, datetime.min.time())
+    end = datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+    return coalesced_response(
+        request, current_user.id, lambda: conflicts_in_range(db, current_user.id, start, end)
+    )
+
+@router.get("/activities/free-slots", response_model=List[FreeSlot])
+def get_free_slots(
+    date_from: Optional[str] = Query(None, alias="from", description="First day (YYYY-MM-DD), default today"),
+    date_to: Optional[str] = Query(None, alias="to", description="Last day (YYYY-MM-DD), default 7 days after from"),
+    duration: int = Query(60, ge=5, le=1440, description="Minimum slot length in minutes"),
+    work_start: str = Query("09:00", description="Start of working hours (HH:MM)"),
+    work_end: str = Query("18:00", description="End of working hours (HH:MM)"),
+    current_user: User = Depends(rls_dependency),
+    db: Session = Depends(shard_dependency)
+):
+    """
+    Free time slots between timed activities, within working hours
+    
+    - **from** / **to**: Days to search (inclusive), at most 92 days
+    - **duration**: Minimum slot length in minutes (5-1440)
+    - **work_start** / **work_end**: Working hours of every day
+    """
+    try:
+        first_day = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else datetime.now().date()
+        last_day = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else first_day + timedelta(days=7)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato data non valido (usa YYYY-MM-DD)"
+        )
+    
+    try:
+        start_time = datetime.strptime(work_start, '%H:%M').time()
+        end_time = datetime.strptime(work_end, '%H:%M').time()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato ora non valido (usa HH:MM)"
+        )
+    
+    if last_day < first_day:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La data di fine non può essere precedente alla data di inizio"
+        )
+    
+    if (last_day - first_day).days >= MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Periodo troppo ampio (massimo {MAX_RANGE_DAYS} giorni)"
+        )
+    
+    if end_time <= start_time:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="L'ora di fine deve essere successiva all'ora di inizio"
+        )
+    
+    return FastJSONResponse(find_free_slots(
+        db, current_user.id, first_day, last_day, duration, start_time, end_time
+    ))
+
+@router.get("/activities/stats", response_model=ActivityStats)
+def get_activity_stats(
+    request: Request,
+    current_user: User = Depends(rls_dependency),
+    db: Session = Depends(shard_dependency)
+):
+    """
+    Get activity statistics for current user
+    
+    Identical concurrent requests share one computation (single_flight.py).
+    """
+    return coalesced_response(
+        request, current_user.id, lambda: _activity_stats(db, current_user.id).model_dump()
+    )
+
+def _activity_stats(db: Session, user_id: int) -> ActivityStats:
+    """Compute the statistics of get_activity_stats"""
+    # By status and priority - one grouped query each (queries.py)
+    status_counts = queries.count_by(db, user_id, 'status')
+    priority_counts = queries.count_by(db, user_id, 'priority')
+    total = sum(status_counts.values())
+    by_status = {value: status_counts.get(value, 0) for value in ('da-fare', 'in-corso', 'fatta', 'rimandata')}
+    by_priority = {value: priority_counts.get(value, 0) for value in ('alta', 'media', 'bassa')}
+    
+    # By category
+    by_category = {cat: count for cat, count in queries.count_by(db, user_id, 'category').items() if cat}
+    
+    # Archived activities count too (see archive.py)
+    archived_status = queries.count_archived_by(db, user_id, 'status')
+    total += sum(archived_status.values())
+    for value, count in archived_status.items():
+        if value in by_status:
+            by_status[value] += count
+    for value, count in queries.count_archived_by(db, user_id, 'priority').items():
+        if value in by_priority:
+            by_priority[value] += count
+    for cat, count in queries.count_archived_by(db, user_id, 'category').items():
+        if cat:
+            by_category[cat] = by_category.get(cat, 0) + count
+    
+    # This week and month (simple implementation)
+    today = datetime.now().date()
+    this_week = queries.count_in_range(db, user_id, today)
+    
+    # Date range instead of strftime(date): uses the (user_id, date) index
+    # and prunes partitions
+    month_start = today.replace(day=1)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    this_month = queries.count_in_range(db, user_id, month_start, next_month)
+    if archive_reaches(month_start):
+        this_month += queries.count_archived_in_range(db, user_id, month_start, next_month)
     
-    return [ActivityResponse(**activity.to_dict()) for activity in activities]
+    return ActivityStats(
+        total=total,
+        byStatus=by_status,
+        byPriority=by_priority,
+        byCategory=by_category,
+        thisWeek=this_week,
+        thisMonth=this_month
+    )
+
+@router.get("/activities/categories", response_model=List[str])
+def get_categories(
+    current_user: User = Depends(rls_dependency),
+    db: Session = Depends(shard_dependency)
+):
+    """
+    Get all categories used by current user
+    """
+    return queries.list_categories(db, current_user.id)
 
 @router.get("/activities/{activity_id}", response_model=ActivityResponse)
 def get_activity(
     activity_id: int,
     current_user: User = Depends(rls_dependency),
-    db: Session = Depends(get_db)
+    db: Session = Depends(shard_dependency)
 ):
     """
     Get a specific activity by ID
     """
-    activity = db.query(Activity).filter(
-        Activity.id == activity_id,
-        Activity.user_id == current_user.id
-    ).first()
+    activity = queries.get_activity_row(db, activity_id, current_user.id)
     
     if not activity:
         raise HTTPException(
@@ -90,13 +317,13 @@ def get_activity(
             detail="Attività non trovata"
         )
     
-    return ActivityResponse(**activity.to_dict())
+    return FastJSONResponse(activity)
 
-@router.post("/activities", response_model=ActivityResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/activities", response_model=ActivityWithConflicts, status_code=status.HTTP_201_CREATED)
 def create_activity(
     activity_data: ActivityCreate,
     current_user: User = Depends(rls_dependency),
-    db: Session = Depends(get_db)
+    db: Session = Depends(shard_dependency)
 ):
     """
     Create a new activity
@@ -126,8 +353,8 @@ def create_activity(
             detail="L'ora di fine deve essere successiva all'ora di inizio"
         )
     
-    # Create activity
-    activity = Activity(
+    # Create activity - INSERT ... RETURNING, no refresh
+    activity = insert_returning(db, Activity, dict(
         title=activity_data.title,
         description=activity_data.description,
         date=activity_data.date,
@@ -140,31 +367,31 @@ def create_activity(
         priority=activity_data.priority.value,
         category=activity_data.category,
         user_id=current_user.id
-    )
-    
-    db.add(activity)
+    ), ACTIVITY_COLUMNS)
     db.commit()
-    db.refresh(activity)
+    version = bump_data_version(current_user.id)
+    
+    activity_dict = activity_row_to_dict(activity)
+    note_activity_write(current_user.id, version, activity_dict['id'], activity_dict)
+    schedule_activity(activity_dict, current_user.shard_key)
+    conflicts = find_conflicts(db, current_user.id, activity_dict)
     
-    return ActivityResponse(**activity.to_dict())
+    return FastJSONResponse({**activity_dict, 'conflicts': conflicts}, status_code=status.HTTP_201_CREATED)
 
-@router.put("/activities/{activity_id}", response_model=ActivityResponse)
+@router.put("/activities/{activity_id}", response_model=ActivityWithConflicts)
 def update_activity(
     activity_id: int,
     activity_data: ActivityUpdate,
     current_user: User = Depends(rls_dependency),
-    db: Session = Depends(get_db)
+    db: Session = Depends(shard_dependency)
 ):
     """
     Update an existing activity
     
     All fields are optional. Only provided fields will be updated.
     """
-    # Get activity
-    activity = db.query(Activity).filter(
-        Activity.id == activity_id,
-        Activity.user_id == current_user.id
-    ).first()
+    # Get current dates/times (needed for validation)
+    activity = queries.get_activity_schedule(db, activity_id, current_user.id)
     
     if not activity:
         raise HTTPException(
@@ -195,54 +422,65 @@ def update_activity(
             detail="L'ora di fine deve essere successiva all'ora di inizio"
         )
     
-    # Apply updates
+    # Map camelCase to snake_case
+    field_map = {
+        'endDate': 'end_date',
+        'endTime': 'end_time',
+        'isMultiDay': 'is_multi_day',
+        'isMultiHour': 'is_multi_hour'
+    }
+    values = {}
     for field, value in update_data.items():
-        if field == 'status' and isinstance(value, ActivityStatusEnum):
-            setattr(activity, field, value.value)
-        elif field in ['date', 'time', 'endDate', 'endTime', 'isMultiDay', 'isMultiHour']:
-            # Map camelCase to snake_case
-            field_map = {
-                'date': 'date',
-                'time': 'time',
-                'endDate': 'end_date',
-                'endTime': 'end_time',
-                'isMultiDay': 'is_multi_day',
-                'isMultiHour': 'is_multi_hour'
-            }
-            db_field = field_map.get(field, field)
-            setattr(activity, db_field, value)
-        else:
-            setattr(activity, field, value)
-    
-    activity.updated_at = datetime.utcnow()
+        if isinstance(value, (ActivityStatusEnum, ActivityPriorityEnum)):
+            value = value.value
+        values[field_map.get(field, field)] = value
+    
+    if 'priority' in values:
+        values['priority_rank'] = priority_to_rank(values['priority'])
+    values['updated_at'] = datetime.utcnow()
+    
+    # UPDATE ... RETURNING, no refresh
+    updated = update_returning(
+        db, Activity,
+        (Activity.id == activity_id, Activity.user_id == current_user.id),
+        values, ACTIVITY_COLUMNS
+    )
+    
+    # Eliminata (o archiviata) dopo la lettura iniziale
+    if not updated:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attività non trovata"
+        )
     
     db.commit()
-    db.refresh(activity)
+    version = bump_data_version(current_user.id)
+    
+    activity_dict = activity_row_to_dict(updated)
+    note_activity_write(current_user.id, version, activity_id, activity_dict)
+    schedule_activity(activity_dict, current_user.shard_key)
+    conflicts = find_conflicts(db, current_user.id, activity_dict)
     
-    return ActivityResponse(**activity.to_dict())
+    return FastJSONResponse({**activity_dict, 'conflicts': conflicts})
 
 @router.delete("/activities/{activity_id}", response_model=MessageResponse)
 def delete_activity(
     activity_id: int,
     current_user: User = Depends(rls_dependency),
-    db: Session = Depends(get_db)
+    db: Session = Depends(shard_dependency)
 ):
     """
     Delete an activity
     """
-    activity = db.query(Activity).filter(
-        Activity.id == activity_id,
-        Activity.user_id == current_user.id
-    ).first()
-    
-    if not activity:
+    # Single DELETE, no SELECT + ORM delete
+    if not queries.delete_activity(db, activity_id, current_user.id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Attività non trovata"
         )
     
-    db.delete(activity)
     db.commit()
+    note_activity_write(current_user.id, bump_data_version(current_user.id), activity_id, None)
     
     return MessageResponse(message="Attività eliminata con successo")
 
@@ -251,17 +489,34 @@ def update_activity_status(
     activity_id: int,
     status_data: ActivityStatusUpdate,
     current_user: User = Depends(rls_dependency),
-    db: Session = Depends(get_db)
+    db: Session = Depends(shard_dependency)
 ):
     """
     Update only the status of an activity
     
     - **status**: New status (da-fare, in-corso, fatta, rimandata)
     """
-    activity = db.query(Activity).filter(
-        Activity.id == activity_id,
-        Activity.user_id == current_user.id
-    ).first()
+    if settings.status_group_commit:
+        # Confermato dopo il COMMIT del lotto che contiene l'aggiornamento
+        activity_dict = get_status_batcher(current_user.shard_key).submit(
+            activity_id, current_user.id, status_data.status.value
+        )
+        if activity_dict is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Attività non trovata"
+            )
+        note_activity_write(current_user.id, bump_data_version(current_user.id), activity_id, activity_dict)
+        schedule_activity(activity_dict, current_user.shard_key)
+        return FastJSONResponse(activity_dict)
+    
+    # Single UPDATE ... RETURNING: no SELECT before nor refresh after
+    activity = update_returning(
+        db, Activity,
+        (Activity.id == activity_id, Activity.user_id == current_user.id),
+        {'status': status_data.status.value, 'updated_at': datetime.utcnow()},
+        ACTIVITY_COLUMNS
+    )
     
     if not activity:
         raise HTTPException(
@@ -269,19 +524,20 @@ def update_activity_status(
             detail="Attività non trovata"
         )
     
-    activity.status = status_data.status.value
-    activity.updated_at = datetime.utcnow()
-    
     db.commit()
-    db.refresh(activity)
+    version = bump_data_version(current_user.id)
     
-    return ActivityResponse(**activity.to_dict())
+    activity_dict = activity_row_to_dict(activity)
+    note_activity_write(current_user.id, version, activity_id, activity_dict)
+    schedule_activity(activity_dict, current_user.shard_key)
+    return FastJSONResponse(activity_dict)
 
 @router.get("/activities/date/{date}", response_model=List[ActivityResponse])
 def get_activities_by_date(
+    request: Request,
     date: str,
     current_user: User = Depends(rls_dependency),
-    db: Session = Depends(get_db)
+    db: Session = Depends(shard_dependency)
 ):
     """
     Get activities for a specific date (including multi-day activities)
@@ -296,34 +552,36 @@ def get_activities_by_date(
             detail="Formato data non valido (usa YYYY-MM-DD)"
         )
     
-    # Activities starting on this date
-    activities_starting = db.query(Activity).filter(
-        Activity.date == date_obj,
-        Activity.user_id == current_user.id
-    ).all()
-    
-    # Multi-day activities that include this date
-    activities_multi_day = db.query(Activity).filter(
-        Activity.end_date.isnot(None),
-        Activity.date <= date_obj,
-        Activity.end_date >= date_obj,
-        Activity.user_id == current_user.id
-    ).all()
-    
-    # Combine and remove duplicates
-    all_activities = activities_starting + activities_multi_day
-    unique_activities = list({activity.id: activity for activity in all_activities}.values())
-    
-    # Sort by time
-    unique_activities.sort(key=lambda x: x.time if x.time else datetime.min.time(), reverse=True)
+    def filters(model) -> list:
+        # Activities starting on this date or multi-day activities that include it
+        return [
+            model.user_id == current_user.id,
+            or_(
+                model.date == date_obj,
+                (model.end_date.isnot(None)) & (model.date <= date_obj) & (model.end_date >= date_obj)
+            )
+        ]
+    
+    # Past dates: completed activities may be in the archive (as in get_activities)
+    archived = [
+        archive_select(table).where(*filters(table.c))
+        for table in archive_tables(db, None, date_obj)
+    ] if archive_reaches(date_obj) else None
+    
+    activities = select_activity_rows(
+        db, *filters(Activity),
+        order_by=(Activity.time.desc().nullslast(),),
+        union=archived
+    )
     
-    return [ActivityResponse(**activity.to_dict()) for activity in unique_activities]
+    return activity_rows_response(request, activities)
 
 @router.get("/activities/status/{status}", response_model=List[ActivityResponse])
 def get_activities_by_status(
+    request: Request,
     status: str,
     current_user: User = Depends(rls_dependency),
-    db: Session = Depends(get_db)
+    db: Session = Depends(shard_dependency)
 ):
     """
     Get activities by status
@@ -338,84 +596,21 @@ def get_activities_by_status(
             detail=f"Stato non valido. Valori consentiti: {', '.join(valid_statuses)}"
         )
     
-    activities = db.query(Activity).filter(
-        Activity.status == status,
-        Activity.user_id == current_user.id
-    ).order_by(Activity.date.desc(), Activity.time.desc()).all()
-    
-    return [ActivityResponse(**activity.to_dict()) for activity in activities]
-
-@router.get("/activities/stats", response_model=ActivityStats)
-def get_activity_stats(
-    current_user: User = Depends(rls_dependency),
-    db: Session = Depends(get_db)
-):
-    """
-    Get activity statistics for current user
-    """
-    user_id = current_user.id
-    
-    # Total count
-    total = db.query(Activity).filter(Activity.user_id == user_id).count()
-    
-    # By status
-    by_status = {
-        'da-fare': db.query(Activity).filter(Activity.status == 'da-fare', Activity.user_id == user_id).count(),
-        'in-corso': db.query(Activity).filter(Activity.status == 'in-corso', Activity.user_id == user_id).count(),
-        'fatta': db.query(Activity).filter(Activity.status == 'fatta', Activity.user_id == user_id).count(),
-        'rimandata': db.query(Activity).filter(Activity.status == 'rimandata', Activity.user_id == user_id).count(),
-    }
-    
-    # By priority
-    by_priority = {
-        'alta': db.query(Activity).filter(Activity.priority == 'alta', Activity.user_id == user_id).count(),
-        'media': db.query(Activity).filter(Activity.priority == 'media', Activity.user_id == user_id).count(),
-        'bassa': db.query(Activity).filter(Activity.priority == 'bassa', Activity.user_id == user_id).count(),
-    }
-    
-    # By category
-    categories_result = db.query(Activity.category, func.count(Activity.id)).filter(
-        Activity.user_id == user_id,
-        Activity.category.isnot(None)
-    ).group_by(Activity.category).all()
-    
-    by_category = {cat: count for cat, count in categories_result if cat}
+    # Completed activities include the archived ones (as in get_activities)
+    archived = [
+        archive_select(table).where(table.c.status == status, table.c.user_id == current_user.id)
+        for table in archive_tables(db, None, None)
+    ] if archive_reaches(None, status) else None
     
-    # This week and month (simple implementation)
-    today = datetime.now().date()
-    this_week = db.query(Activity).filter(
-        Activity.user_id == user_id,
-        Activity.date >= today
-    ).count()
-    
-    this_month = db.query(Activity).filter(
-        Activity.user_id == user_id,
-        func.strftime('%Y-%m', Activity.date) == today.strftime('%Y-%m')
-    ).count()
-    
-    return ActivityStats(
-        total=total,
-        byStatus=by_status,
-        byPriority=by_priority,
-        byCategory=by_category,
-        thisWeek=this_week,
-        thisMonth=this_month
+    activities = select_activity_rows(
+        db,
+        Activity.status == status,
+        Activity.user_id == current_user.id,
+        order_by=(Activity.date.desc(), Activity.time.desc()),
+        union=archived
     )
-
-@router.get("/activities/categories", response_model=List[str])
-def get_categories(
-    current_user: User = Depends(rls_dependency),
-    db: Session = Depends(get_db)
-):
-    """
-    Get all categories used by current user
-    """
-    categories = db.query(Activity.category).filter(
-        Activity.category.isnot(None),
-        Activity.user_id == current_user.id
-    ).distinct().all()
     
-    return [cat[0] for cat in categories if cat[0]]
+    return activity_rows_response(request, activities)
 
 @router.get("/health", response_model=HealthResponse)
 def health_check():
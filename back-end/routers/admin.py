@@ -3,14 +3,23 @@ Admin routes for FastAPI
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, text
+from sqlalchemy import delete, func, select, text
 from typing import List, Optional
 from datetime import datetime
 
-from database import get_db
-from models_fastapi import User, Activity
-from schemas import UserResponse, UserCreate, UserUpdate, ActivityResponse, MessageResponse
+from database import get_db, get_read_db, bind_shard, get_shard_session, fan_out, shard_for_new_user
+from models_fastapi import User, Activity, ArchivedActivity
+from schemas import UserResponse, UserCreate, UserUpdate, MessageResponse
 from rls_manager_fastapi import admin_rls_dependency
+from serializers import USER_COLUMNS, archive_select, select_activity_rows, user_row_to_dict
+from mutations import update_returning
+from responses import FastJSONResponse
+from archive import ARCHIVE_STATUS, archive_reaches
+from partitions import archive_tables
+from token_revocation import get_revocation_store
+from single_flight import bump_data_version
+from pool_metrics import pool_metrics
+from job_queue import get_job_queue
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -51,13 +60,13 @@ def get_all_users(
     # Calculate pages
     pages = (total + per_page - 1) // per_page
     
-    return {
-        'users': [UserResponse(**user.to_dict()) for user in users],
+    return FastJSONResponse({
+        'users': [user.to_dict() for user in users],
         'total': total,
         'pages': pages,
         'current_page': page,
         'per_page': per_page
-    }
+    })
 
 @router.get("/users/{user_id}", response_model=UserResponse)
 def get_user(
@@ -76,7 +85,7 @@ def get_user(
             detail="Utente non trovato"
         )
     
-    return UserResponse(**user.to_dict())
+    return FastJSONResponse(user.to_dict())
 
 @router.post("/users", response_model=dict, status_code=status.HTTP_201_CREATED)
 def create_user(
@@ -112,7 +121,8 @@ def create_user(
     new_user = User(
         username=user_data.username,
         email=user_data.email.lower(),
-        is_admin=False
+        is_admin=False,
+        shard_key=shard_for_new_user(user_data.username)
     )
     new_user.set_password(user_data.password)
     
@@ -157,6 +167,7 @@ def update_user(
     
     # Update fields
     update_data = user_data.model_dump(exclude_unset=True)
+    values = {}
     
     if 'email' in update_data:
         new_email = update_data['email'].lower()
@@ -167,21 +178,59 @@ def update_user(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email già esistente"
             )
-        user.email = new_email
+        values['email'] = new_email
     
     if 'is_active' in update_data:
-        user.is_active = update_data['is_active']
+        values['is_active'] = update_data['is_active']
     
-    user.updated_at = datetime.utcnow()
+    values['updated_at'] = datetime.utcnow()
     
+    # UPDATE ... RETURNING, no refresh
+    row = update_returning(db, User, (User.id == user_id,), values, USER_COLUMNS)
     db.commit()
-    db.refresh(user)
+    
+    # Un account disattivato perde subito le sessioni aperte
+    if values.get('is_active') is False:
+        get_revocation_store().revoke_user(user_id)
     
     return {
         'message': 'Utente aggiornato con successo',
-        'user': UserResponse(**user.to_dict())
+        'user': UserResponse(**user_row_to_dict(row))
     }
 
+def _delete_user_activities(shard: int, user_id: int) -> None:
+    """Delete the activities and archive of a user in one transaction on their shard"""
+    shard_db = get_shard_session(shard)
+    try:
+        # Il trigger RLS (se installato) blocca le DELETE di altri utenti:
+        # disattivato per l'operazione admin e ricreato nella stessa transazione
+        had_trigger = shard_db.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'rls_activities_delete_trigger'"
+        )).first() is not None
+        if had_trigger:
+            shard_db.execute(text("DROP TRIGGER rls_activities_delete_trigger"))
+        
+        shard_db.execute(delete(Activity).where(Activity.user_id == user_id))
+        shard_db.execute(delete(ArchivedActivity).where(ArchivedActivity.user_id == user_id))
+        
+        if had_trigger:
+            shard_db.execute(text("""
+                CREATE TRIGGER rls_activities_delete_trigger
+                BEFORE DELETE ON activities
+                BEGIN
+                    SELECT CASE
+                        WHEN OLD.user_id != (SELECT current_user_id FROM rls_context WHERE id = 1)
+                        THEN RAISE(ABORT, 'Access denied: Row Level Security violation')
+                    END;
+                END;
+            """))
+        shard_db.commit()
+    except Exception:
+        shard_db.rollback()
+        raise
+    finally:
+        shard_db.close()
+
 @router.delete("/users/{user_id}", response_model=MessageResponse)
 def delete_user(
     user_id: int,
@@ -215,30 +264,19 @@ def delete_user(
             detail="Non è possibile eliminare il proprio account"
         )
     
-    # Delete user activities first (temporarily disable RLS triggers for admin operation)
+    # Le attività stanno sullo shard dell'utente, l'utente sul database
+    # principale: due transazioni distinte. Prima le attività, poi l'utente:
+    # se la seconda fallisce l'utente resta senza attività e l'eliminazione
+    # si può ripetere
     try:
-        # Disable RLS trigger temporarily
-        db.execute(text("DROP TRIGGER IF EXISTS rls_activities_delete_trigger"))
-        
-        # Delete user's activities
-        db.execute(text("DELETE FROM activities WHERE user_id = :user_id"), {"user_id": user_id})
+        _delete_user_activities(user.shard_key, user_id)
         
-        # Recreate RLS trigger
-        db.execute(text("""
-            CREATE TRIGGER rls_activities_delete_trigger
-            BEFORE DELETE ON activities
-            BEGIN
-                SELECT CASE
-                    WHEN OLD.user_id != (SELECT current_user_id FROM rls_context WHERE id = 1)
-                    THEN RAISE(ABORT, 'Access denied: Row Level Security violation')
-                END;
-            END;
-        """))
-        
-        # Delete user
         db.delete(user)
         db.commit()
         
+        get_revocation_store().revoke_user(user_id)
+        bump_data_version(user_id)
+        
         return MessageResponse(message="Utente eliminato con successo")
         
     except Exception as e:
@@ -257,7 +295,7 @@ def get_user_activities(
     date_from: Optional[str] = Query(None, description="Filter from date"),
     date_to: Optional[str] = Query(None, description="Filter to date"),
     current_admin: User = Depends(admin_rls_dependency),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all activities of a specific user (admin only)
@@ -270,20 +308,12 @@ def get_user_activities(
             detail="Utente non trovato"
         )
     
-    # Base query
-    query = db.query(Activity).filter(Activity.user_id == user_id)
-    
-    # Apply filters
-    if status:
-        query = query.filter(Activity.status == status)
-    if priority:
-        query = query.filter(Activity.priority == priority)
-    if category:
-        query = query.filter(Activity.category == category)
+    bind_shard(db, user.shard_key, read_only=True)
+    
+    date_from_obj = date_to_obj = None
     if date_from:
         try:
             date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').date()
-            query = query.filter(Activity.date >= date_from_obj)
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -292,27 +322,54 @@ def get_user_activities(
     if date_to:
         try:
             date_to_obj = datetime.strptime(date_to, '%Y-%m-%d').date()
-            query = query.filter(Activity.date <= date_to_obj)
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Formato date_to non valido"
             )
     
-    # Order by date and time
-    activities = query.order_by(Activity.date.desc(), Activity.time.desc()).all()
+    def filters(model) -> list:
+        # Base criteria
+        criteria = [model.user_id == user_id]
+        
+        # Apply filters
+        if status:
+            criteria.append(model.status == status)
+        if priority:
+            criteria.append(model.priority == priority)
+        if category:
+            criteria.append(model.category == category)
+        if date_from_obj:
+            criteria.append(model.date >= date_from_obj)
+        if date_to_obj:
+            criteria.append(model.date <= date_to_obj)
+        return criteria
+    
+    # Completed activities older than the horizon live in the archive,
+    # split by year on SQLite: only the years in range are read
+    archived = [
+        archive_select(table).where(*filters(table.c))
+        for table in archive_tables(db, date_from_obj, date_to_obj)
+    ] if archive_reaches(date_from_obj, status) else None
+    
+    # Order by date and time - lean read path, no ORM hydration
+    activities = select_activity_rows(
+        db, *filters(Activity),
+        order_by=(Activity.date.desc(), Activity.time.desc()),
+        union=archived
+    )
     
-    return {
-        'user': UserResponse(**user.to_dict()),
-        'activities': [ActivityResponse(**activity.to_dict()) for activity in activities]
-    }
+    return FastJSONResponse({
+        'user': user.to_dict(),
+        'activities': activities
+    })
 
 # ==================== STATISTICS ====================
 
 @router.get("/stats")
 def get_admin_stats(
     current_admin: User = Depends(admin_rls_dependency),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get system statistics (admin only)
@@ -322,22 +379,41 @@ def get_admin_stats(
     active_users = db.query(User).filter(User.is_active == True).count()
     admin_users = db.query(User).filter(User.is_admin == True).count()
     
-    # Activity statistics
-    total_activities = db.query(Activity).count()
-    
-    activities_by_status = {}
-    for status_val in ['da-fare', 'in-corso', 'fatta', 'rimandata']:
-        activities_by_status[status_val] = db.query(Activity).filter(
-            Activity.status == status_val
-        ).count()
+    # Activity statistics - one grouped query per shard, in parallel
+    per_shard = fan_out(lambda shard_db: (
+        shard_db.execute(
+            select(Activity.status, func.count(Activity.id)).group_by(Activity.status)
+        ).all(),
+        shard_db.execute(
+            select(Activity.user_id, func.count(Activity.id)).group_by(Activity.user_id)
+        ).all(),
+        shard_db.execute(
+            select(ArchivedActivity.user_id, func.count(ArchivedActivity.id)).group_by(ArchivedActivity.user_id)
+        ).all()
+    ), read_only=True)
+    
+    activities_by_status = {status_val: 0 for status_val in ['da-fare', 'in-corso', 'fatta', 'rimandata']}
+    counts_by_user = {}
+    total_activities = 0
+    for by_status, by_user, archived_by_user in per_shard:
+        for status_val, count in by_status:
+            total_activities += count
+            if status_val in activities_by_status:
+                activities_by_status[status_val] += count
+        # Archived activities are all completed
+        for owner_id, count in archived_by_user:
+            total_activities += count
+            activities_by_status[ARCHIVE_STATUS] += count
+        for owner_id, count in by_user + archived_by_user:
+            counts_by_user[owner_id] = counts_by_user.get(owner_id, 0) + count
     
     # Activities per user
-    user_activity_counts = db.query(
-        User.username,
-        func.count(Activity.id).label('activity_count')
-    ).outerjoin(Activity).group_by(User.id, User.username).all()
+    user_activity_counts = [
+        (username, counts_by_user.get(user_id, 0))
+        for user_id, username in db.query(User.id, User.username).order_by(User.id).all()
+    ]
     
-    return {
+    return FastJSONResponse({
         'users': {
             'total': total_users,
             'active': active_users,
@@ -351,12 +427,12 @@ def get_admin_stats(
             {'username': username, 'activity_count': count}
             for username, count in user_activity_counts
         ]
-    }
+    })
 
 @router.get("/dashboard")
 def get_admin_dashboard(
     current_admin: User = Depends(admin_rls_dependency),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get admin dashboard data (admin only)
@@ -364,8 +440,29 @@ def get_admin_dashboard(
     # Recent users
     recent_users = db.query(User).order_by(User.created_at.desc()).limit(5).all()
     
-    # Recent activities
-    recent_activities = db.query(Activity).order_by(Activity.created_at.desc()).limit(10).all()
+    # Recent activities and activities by month - fan out to every shard
+    per_shard = fan_out(lambda shard_db: (
+        select_activity_rows(
+            shard_db,
+            order_by=(Activity.created_at.desc(),),
+            limit=10
+        ),
+        shard_db.query(
+            func.strftime('%Y-%m', Activity.created_at).label('month'),
+            func.count(Activity.id).label('count')
+        ).group_by('month').all()
+    ), read_only=True)
+    
+    recent_activities = sorted(
+        (activity for recent, _ in per_shard for activity in recent),
+        key=lambda activity: activity['createdAt'] or '',
+        reverse=True
+    )[:10]
+    
+    activities_by_month = {}
+    for _, by_month in per_shard:
+        for month, count in by_month:
+            activities_by_month[month] = activities_by_month.get(month, 0) + count
     
     # Users by month
     users_by_month = db.query(
@@ -373,16 +470,25 @@ def get_admin_dashboard(
         func.count(User.id).label('count')
     ).group_by('month').order_by('month').all()
     
-    # Activities by month
-    activities_by_month = db.query(
-        func.strftime('%Y-%m', Activity.created_at).label('month'),
-        func.count(Activity.id).label('count')
-    ).group_by('month').order_by('month').all()
-    
-    return {
-        'recent_users': [UserResponse(**user.to_dict()) for user in recent_users],
-        'recent_activities': [ActivityResponse(**activity.to_dict()) for activity in recent_activities],
+    return FastJSONResponse({
+        'recent_users': [user.to_dict() for user in recent_users],
+        'recent_activities': recent_activities,
         'users_by_month': [{'month': month, 'count': count} for month, count in users_by_month],
-        'activities_by_month': [{'month': month, 'count': count} for month, count in activities_by_month]
-    }
+        'activities_by_month': [
+            {'month': month, 'count': activities_by_month[month]}
+            for month in sorted(activities_by_month, key=lambda month: month or '')
+        ]
+    })
+
 
+@router.get("/metrics")
+def get_admin_metrics(
+    current_admin: User = Depends(admin_rls_dependency)
+):
+    """
+    Get connection pool and job queue metrics (admin only)
+    
+    Checkout latency, connections in use and waits on an exhausted pool
+    since startup (pool_metrics.py), and jobs by status (job_queue.py).
+    """
+    return FastJSONResponse({'pools': pool_metrics(), 'jobs': get_job_queue().stats()})
@@ -4,15 +4,25 @@ Authentication routes for FastAPI
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from datetime import datetime
+from typing import Optional
 import re
+import time
 
-from database import get_db
+from config_fastapi import settings
+from database import get_db, shard_for_new_user
 from models_fastapi import User
 from schemas import (
     UserCreate, UserLogin, UserResponse, LoginResponse, RegisterResponse,
-    Token, TokenVerify, PasswordChange, MessageResponse
+    Token, TokenVerify, RefreshRequest, TokenPair, PasswordChange, PasswordChangeResponse,
+    MessageResponse
 )
-from auth_fastapi import create_access_token, verify_token, get_current_user
+from auth_fastapi import (
+    REFRESH_TOKEN, create_token_pair, verify_token, get_current_user, get_token_payload
+)
+from token_revocation import get_revocation_store
+from responses import FastJSONResponse
+from serializers import USER_COLUMNS, user_row_to_dict
+from mutations import insert_returning
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -77,24 +87,31 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
                 detail="Email già esistente"
             )
     
-    # Create new user
+    # Create new user - INSERT ... RETURNING, no refresh
     new_user = User(
         username=user_data.username,
         email=user_data.email.lower()
     )
     new_user.set_password(user_data.password)
+    shard_key = shard_for_new_user(new_user.username)
     
-    db.add(new_user)
+    row = insert_returning(db, User, dict(
+        username=new_user.username,
+        email=new_user.email,
+        password_hash=new_user.password_hash,
+        shard_key=shard_key
+    ), USER_COLUMNS)
     db.commit()
-    db.refresh(new_user)
     
-    # Generate token
-    token = create_access_token(data={"user_id": new_user.id})
+    user = user_row_to_dict(row)
+    
+    # Generate tokens
+    tokens = create_token_pair(user['id'], user['isAdmin'], shard_key)
     
     return RegisterResponse(
         message="Registrazione completata con successo",
-        token=token,
-        user=UserResponse(**new_user.to_dict())
+        user=UserResponse(**user),
+        **tokens
     )
 
 @router.post("/login", response_model=LoginResponse)
@@ -127,22 +144,68 @@ def login(credentials: UserLogin, db: Session = Depends(get_db)):
             detail="Account disattivato"
         )
     
-    # Generate token
-    token = create_access_token(data={"user_id": user.id})
+    # Generate tokens
+    tokens = create_token_pair(user.id, user.is_admin, user.shard_key)
     
     return LoginResponse(
         message="Login effettuato con successo",
-        token=token,
-        user=UserResponse(**user.to_dict())
+        user=UserResponse(**user.to_dict()),
+        **tokens
     )
 
+@router.post("/refresh", response_model=TokenPair)
+def refresh(token_data: RefreshRequest, db: Session = Depends(get_db)):
+    """
+    Exchange a refresh token for a new access token
+    
+    The refresh token is rotated: the one used is revoked and a new one is
+    returned. The revocation is the claim, so of two concurrent refreshes
+    with the same token only one gets a new pair. A rotated token reused
+    later is treated as stolen and every session of the user is revoked.
+    User status is read from the database here, so changes reach the
+    access-token claims at the next refresh.
+    
+    - **refresh_token**: Refresh token from login, register or a previous refresh
+    """
+    store = get_revocation_store()
+    payload = verify_token(token_data.refresh_token, REFRESH_TOKEN)
+    
+    if payload and store.is_revoked(payload):
+        revoked_at = store.revoked_at(payload)
+        if revoked_at and time.time() - revoked_at > settings.jwt_refresh_reuse_grace_seconds:
+            store.revoke_user(payload["user_id"])
+        payload = None
+    
+    if not payload:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token non valido o scaduto"
+        )
+    
+    user = db.query(User).filter(User.id == payload.get("user_id")).first()
+    
+    if not user or not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Utente non trovato o disattivato"
+        )
+    
+    if not store.claim_token(payload):
+        # Già ruotato da una richiesta concorrente
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token non valido o scaduto"
+        )
+    
+    return TokenPair(**create_token_pair(user.id, user.is_admin, user.shard_key))
+
 @router.get("/me", response_model=UserResponse)
 def get_me(current_user: User = Depends(get_current_user)):
     """
     Get current user information
     Requires authentication
     """
-    return UserResponse(**current_user.to_dict())
+    return FastJSONResponse(current_user.to_dict())
 
 @router.post("/verify")
 def verify_token_endpoint(token_data: TokenVerify, db: Session = Depends(get_db)):
@@ -153,7 +216,7 @@ def verify_token_endpoint(token_data: TokenVerify, db: Session = Depends(get_db)
     """
     payload = verify_token(token_data.token)
     
-    if not payload:
+    if not payload or get_revocation_store().is_revoked(payload):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token non valido o scaduto"
@@ -174,14 +237,27 @@ def verify_token_endpoint(token_data: TokenVerify, db: Session = Depends(get_db)
     }
 
 @router.post("/logout", response_model=MessageResponse)
-def logout(current_user: User = Depends(get_current_user)):
+def logout(
+    token_data: Optional[RefreshRequest] = None,
+    payload: dict = Depends(get_token_payload)
+):
     """
-    Logout user (client-side token removal)
+    Logout user: the current token is revoked until it expires
     Requires authentication
+    
+    - **refresh_token**: Refresh token of the session (optional, revoked too)
     """
+    store = get_revocation_store()
+    store.revoke_token(payload)
+    
+    if token_data:
+        refresh_payload = verify_token(token_data.refresh_token, REFRESH_TOKEN)
+        if refresh_payload and refresh_payload.get("user_id") == payload["user_id"]:
+            store.revoke_token(refresh_payload)
+    
     return MessageResponse(message="Logout effettuato con successo")
 
-@router.put("/change-password", response_model=MessageResponse)
+@router.put("/change-password", response_model=PasswordChangeResponse)
 def change_password(
     password_data: PasswordChange,
     current_user: User = Depends(get_current_user),
@@ -191,6 +267,9 @@ def change_password(
     Change user password
     Requires authentication
     
+    All the tokens issued before the change are revoked; the response
+    contains a new token for the current session.
+    
     - **current_password**: Current password
     - **new_password**: New password (at least 6 characters)
     """
@@ -214,5 +293,11 @@ def change_password(
     
     db.commit()
     
-    return MessageResponse(message="Password aggiornata con successo")
+    # Revoca i token emessi finora (anche quelli di altri dispositivi)
+    get_revocation_store().revoke_user(current_user.id)
+    
+    return PasswordChangeResponse(
+        message="Password aggiornata con successo",
+        **create_token_pair(current_user.id, current_user.is_admin, current_user.shard_key)
+    )
 
@@ -2,8 +2,8 @@
 Pydantic schemas for request/response validation
 """
 from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional
-from datetime import date, time, datetime
+from typing import List, Optional
+from datetime import date as date_type, time as time_type, datetime
 from enum import Enum
 
 # Enums
@@ -66,16 +66,30 @@ class TokenVerify(BaseModel):
     """Schema for token verification"""
     token: str
 
+class RefreshRequest(BaseModel):
+    """Schema for token refresh and logout"""
+    refresh_token: str
+
+class TokenPair(BaseModel):
+    """Schema for a short-lived access token with its refresh token"""
+    token: str
+    refresh_token: str
+    expires_in: int
+
 class LoginResponse(BaseModel):
     """Schema for login response"""
     message: str
     token: str
+    refresh_token: str
+    expires_in: int
     user: UserResponse
 
 class RegisterResponse(BaseModel):
     """Schema for register response"""
     message: str
     token: str
+    refresh_token: str
+    expires_in: int
     user: UserResponse
 
 # ==================== ACTIVITY SCHEMAS ====================
@@ -84,10 +98,10 @@ class ActivityBase(BaseModel):
     """Base activity schema"""
     title: str = Field(..., min_length=1, max_length=200)
     description: Optional[str] = None
-    date: date
-    time: Optional[time] = None
-    endDate: Optional[date] = None
-    endTime: Optional[time] = None
+    date: date_type
+    time: Optional[time_type] = None
+    endDate: Optional[date_type] = None
+    endTime: Optional[time_type] = None
     isMultiDay: bool = False
     isMultiHour: bool = False
     status: ActivityStatusEnum = ActivityStatusEnum.DA_FARE
@@ -102,10 +116,10 @@ class ActivityUpdate(BaseModel):
     """Schema for activity update - all fields optional"""
     title: Optional[str] = Field(None, min_length=1, max_length=200)
     description: Optional[str] = None
-    date: Optional[date] = None
-    time: Optional[time] = None
-    endDate: Optional[date] = None
-    endTime: Optional[time] = None
+    date: Optional[date_type] = None
+    time: Optional[time_type] = None
+    endDate: Optional[date_type] = None
+    endTime: Optional[time_type] = None
     isMultiDay: Optional[bool] = None
     isMultiHour: Optional[bool] = None
     status: Optional[ActivityStatusEnum] = None
@@ -125,6 +139,22 @@ class ActivityResponse(ActivityBase):
     class Config:
         from_attributes = True
 
+class ActivityWithConflicts(ActivityResponse):
+    """Created or updated activity with the timed activities it overlaps"""
+    conflicts: List[ActivityResponse] = []
+
+class ActivityConflict(BaseModel):
+    """Two overlapping timed activities and the overlapping window"""
+    start: datetime
+    end: datetime
+    activities: List[ActivityResponse]
+
+class FreeSlot(BaseModel):
+    """Free time slot within working hours"""
+    start: datetime
+    end: datetime
+    minutes: int
+
 # ==================== STATS SCHEMAS ====================
 
 class ActivityStats(BaseModel):
@@ -136,12 +166,26 @@ class ActivityStats(BaseModel):
     thisWeek: int
     thisMonth: int
 
+class AgendaResponse(BaseModel):
+    """Schema for the agenda: open activities grouped by urgency"""
+    date: str
+    overdue: List[ActivityResponse]
+    today: List[ActivityResponse]
+    upcoming: List[ActivityResponse]
+
 # ==================== RESPONSE SCHEMAS ====================
 
 class MessageResponse(BaseModel):
     """Generic message response"""
     message: str
 
+class PasswordChangeResponse(BaseModel):
+    """Password change response with new tokens"""
+    message: str
+    token: str
+    refresh_token: str
+    expires_in: int
+
 class ErrorResponse(BaseModel):
     """Error response"""
     error: str
@@ -0,0 +1,129 @@
+"""
+Lean read path for list endpoints
+
+Selects only the columns needed by ActivityResponse as plain rows and
+converts them straight to JSON-ready dicts, without hydrating ORM objects
+or re-validating every row through Pydantic.
+"""
+from typing import List, Optional
+
+from sqlalchemy import Select, Table, select, union_all
+from sqlalchemy.orm import Session
+
+from models_fastapi import User, Activity
+
+# Colonne lette dal database, nello stesso ordine di activity_row_to_dict
+ACTIVITY_COLUMNS = (
+    Activity.id,
+    Activity.title,
+    Activity.description,
+    Activity.date,
+    Activity.time,
+    Activity.end_date,
+    Activity.end_time,
+    Activity.is_multi_day,
+    Activity.is_multi_hour,
+    Activity.status,
+    Activity.priority,
+    Activity.category,
+    Activity.created_at,
+    Activity.updated_at,
+)
+
+
+def activity_row_to_dict(row) -> dict:
+    """
+    Convert a row selected with ACTIVITY_COLUMNS to the ActivityResponse shape
+
+    Produces exactly the same keys and formats as Activity.to_dict().
+    """
+    (activity_id, title, description, date, time, end_date, end_time,
+     is_multi_day, is_multi_hour, status, priority, category,
+     created_at, updated_at) = row
+
+    return {
+        'id': activity_id,
+        'title': title,
+        'description': description,
+        'date': date.isoformat() if date else None,
+        'time': time.isoformat(timespec='minutes') if time else None,
+        'endDate': end_date.isoformat() if end_date else None,
+        'endTime': end_time.isoformat(timespec='minutes') if end_time else None,
+        'isMultiDay': is_multi_day,
+        'isMultiHour': is_multi_hour,
+        'status': status,
+        'priority': priority,
+        'category': category,
+        'createdAt': created_at.isoformat() if created_at else None,
+        'updatedAt': updated_at.isoformat() if updated_at else None
+    }
+
+
+# Colonne di users, nello stesso ordine di user_row_to_dict
+USER_COLUMNS = (
+    User.id,
+    User.username,
+    User.email,
+    User.created_at,
+    User.updated_at,
+    User.is_active,
+    User.is_admin,
+)
+
+
+def user_row_to_dict(row) -> dict:
+    """
+    Convert a row selected with USER_COLUMNS to the UserResponse shape
+
+    Produces exactly the same keys and formats as User.to_dict().
+    """
+    user_id, username, email, created_at, updated_at, is_active, is_admin = row
+
+    return {
+        'id': user_id,
+        'username': username,
+        'email': email,
+        'createdAt': created_at.isoformat() if created_at else None,
+        'updatedAt': updated_at.isoformat() if updated_at else None,
+        'isActive': is_active,
+        'isAdmin': is_admin
+    }
+
+
+def archive_select(table: Table) -> Select:
+    """SELECT of ACTIVITY_COLUMNS on an archive table (see partitions.archive_tables)"""
+    return select(*[table.c[column.key] for column in ACTIVITY_COLUMNS])
+
+
+def select_activity_rows(
+    db: Session,
+    *criteria,
+    order_by: Optional[tuple] = None,
+    limit: Optional[int] = None,
+    union: Optional[List[Select]] = None
+) -> List[dict]:
+    """
+    Run a column-only SELECT on activities and return serialized rows
+
+    Args:
+        db: Database session
+        *criteria: WHERE clauses (e.g. Activity.user_id == 1)
+        order_by: Optional ORDER BY clauses
+        limit: Optional maximum number of rows
+        union: Further SELECTs with the same columns (e.g. archive_select)
+            combined with UNION ALL and ordered together
+
+    Returns:
+        List of dicts in the ActivityResponse shape
+    """
+    stmt = select(*ACTIVITY_COLUMNS).where(*criteria)
+    if union:
+        stmt = union_all(stmt, *union)
+    if order_by:
+        stmt = stmt.order_by(*order_by)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+
+    # Il bind esplicito instrada anche la UNION sullo shard delle attività
+    rows = db.execute(stmt, bind_arguments={'mapper': Activity})
+    return [activity_row_to_dict(row) for row in rows]
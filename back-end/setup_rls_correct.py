@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Script per configurare RLS nel database corretto
+
+Deprecato: per il backend FastAPI lo schema è gestito dalle migrazioni
+Alembic (migrations/, `alembic upgrade head`).
 """
 
 import os
@@ -0,0 +1,300 @@
+"""
+Shared state backends for multi-worker deployments
+
+In-process state (caches, rate limits, pub/sub for push notifications)
+breaks as soon as the app runs on more than one worker process. This module
+defines a small interface every such component goes through:
+
+- versions: monotonically increasing counters per key, used to invalidate
+  caches (e.g. "activities:42" bumped on every write of user 42)
+- pub/sub: fire-and-forget messages on named channels
+- token buckets: rate limiting shared by every worker (rate_limit.py)
+
+Backends:
+- LocalSharedState: in-process, for the single-worker default
+- SQLiteSharedState: a small SQLite file shared by all workers on one box
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config_fastapi import settings
+
+Callback = Callable[[dict], None]
+
+# Intervallo di eliminazione dei bucket tornati pieni
+BUCKET_PRUNE_SECONDS = 60
+
+
+class SharedStateBackend(ABC):
+    """Interface for state shared between worker processes"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callback]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def get_version(self, key: str) -> int:
+        """Return the current version of `key` (0 if never bumped)"""
+
+    @abstractmethod
+    def bump_version(self, key: str) -> int:
+        """Increment the version of `key` and return the new value"""
+
+    @abstractmethod
+    def publish(self, channel: str, message: dict) -> None:
+        """Deliver `message` to the subscribers of `channel` in every worker"""
+
+    @abstractmethod
+    def take_token(self, key: str, rate: float, capacity: float) -> float:
+        """
+        Take one token from the bucket `key` (refilled at `rate` tokens per
+        second up to `capacity`)
+
+        Returns:
+            0 if a token was taken, otherwise seconds until one is available
+        """
+
+    def subscribe(self, channel: str, callback: Callback) -> None:
+        """Register `callback` for the messages published on `channel`"""
+        with self._lock:
+            self._subscribers[channel].append(callback)
+
+    def _dispatch(self, channel: str, message: dict) -> None:
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, ()))
+        for callback in callbacks:
+            try:
+                callback(message)
+            except Exception as e:
+                print(f"Error in shared state subscriber for '{channel}': {e}")
+
+    def close(self) -> None:
+        """Release resources (threads, connections)"""
+
+
+class LocalSharedState(SharedStateBackend):
+    """Process-local backend: correct only with a single worker"""
+
+    def __init__(self):
+        super().__init__()
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}   # key -> (token, aggiornato, pieno)
+        self._buckets_pruned = time.monotonic()
+
+    def get_version(self, key: str) -> int:
+        return self._versions[key]
+
+    def bump_version(self, key: str) -> int:
+        with self._lock:
+            self._versions[key] += 1
+            return self._versions[key]
+
+    def publish(self, channel: str, message: dict) -> None:
+        self._dispatch(channel, message)
+
+    def take_token(self, key: str, rate: float, capacity: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if wait == 0:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+
+            # Un bucket di nuovo pieno equivale a uno mai usato: si scarta
+            if now - self._buckets_pruned > BUCKET_PRUNE_SECONDS:
+                self._buckets = {
+                    bucket_key: bucket for bucket_key, bucket in self._buckets.items() if bucket[2] > now
+                }
+                self._buckets_pruned = now
+        return wait
+
+
+class SQLiteSharedState(SharedStateBackend):
+    """
+    Backend stored in a SQLite file shared by all workers
+
+    Versions are read and written directly (single-row statements in WAL
+    mode). Messages are appended to an events table; each worker delivers
+    its own messages immediately and polls the table for the others'.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.2, retention_seconds: float = 300):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.origin = uuid.uuid4().hex
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._poller: Optional[threading.Thread] = None
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS versions (key TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, "
+            "origin TEXT NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+        row = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()
+        self._last_event_id = row[0]
+
+    def _connection(self) -> sqlite3.Connection:
+        # Una connessione per thread: sqlite3 non condivide connessioni tra thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_version(self, key: str) -> int:
+        row = self._connection().execute(
+            "SELECT version FROM versions WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, key: str) -> int:
+        conn = self._connection()
+        row = conn.execute(
+            "INSERT INTO versions (key, version) VALUES (?, 1) "
+            "ON CONFLICT(key) DO UPDATE SET version = version + 1 RETURNING version",
+            (key,)
+        ).fetchone()
+        return row[0]
+
+    def publish(self, channel: str, message: dict) -> None:
+        self._connection().execute(
+            "INSERT INTO events (channel, origin, payload, created_at) VALUES (?, ?, ?, ?)",
+            (channel, self.origin, json.dumps(message), time.time())
+        )
+        self._dispatch(channel, message)
+
+    def take_token(self, key: str, rate: float, capacity: float) -> float:
+        conn = self._connection()
+        now = time.time()
+        # BEGIN IMMEDIATE: lettura e aggiornamento del bucket atomici tra worker
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if wait == 0:
+                tokens -= 1
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated, "
+                "full_at = excluded.full_at",
+                (key, tokens, now, now + (capacity - tokens) / rate)
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def subscribe(self, channel: str, callback: Callback) -> None:
+        super().subscribe(channel, callback)
+        # Il polling parte solo quando qualcuno ascolta
+        if self._poller is None:
+            self._poller = threading.Thread(target=self._poll_loop, name='shared-state-poller', daemon=True)
+            self._poller.start()
+
+    def _poll_loop(self) -> None:
+        last_prune = 0.0
+        while not self._stop.wait(self.poll_interval):
+            try:
+                conn = self._connection()
+                rows = conn.execute(
+                    "SELECT id, channel, origin, payload FROM events WHERE id > ? ORDER BY id",
+                    (self._last_event_id,)
+                ).fetchall()
+                for event_id, channel, origin, payload in rows:
+                    self._last_event_id = event_id
+                    if origin != self.origin:
+                        self._dispatch(channel, json.loads(payload))
+
+                now = time.time()
+                if now - last_prune > self.retention_seconds:
+                    conn.execute("DELETE FROM events WHERE created_at < ?", (now - self.retention_seconds,))
+                    conn.execute("DELETE FROM buckets WHERE full_at < ?", (now,))
+                    last_prune = now
+            except sqlite3.Error as e:
+                print(f"Error polling shared state events: {e}")
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join(timeout=self.poll_interval * 5)
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_backend: Optional[SharedStateBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_shared_state() -> SharedStateBackend:
+    """
+    Return the process-wide shared state backend, creating it on first use
+
+    With more than one worker the local backend would silently diverge
+    between processes, so the SQLite backend is used instead.
+    """
+    global _backend
+
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend = settings.shared_state_backend
+                if backend == 'local' and settings.workers > 1:
+                    print("⚠️  shared_state_backend 'local' con più worker: uso 'sqlite'")
+                    backend = 'sqlite'
+
+                if backend == 'sqlite':
+                    _backend = SQLiteSharedState(
+                        settings.shared_state_path,
+                        poll_interval=settings.shared_state_poll_interval
+                    )
+                elif backend == 'local':
+                    _backend = LocalSharedState()
+                else:
+                    raise ValueError(f"Shared state backend non supportato: {backend}")
+
+    return _backend
+
+
+def close_shared_state() -> None:
+    """Close the shared state backend (called on application shutdown)"""
+    global _backend
+
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+            _backend = None
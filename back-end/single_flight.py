@@ -0,0 +1,133 @@
+"""
+Request coalescing (single-flight) for identical concurrent reads
+
+When the planner is open in several tabs, the same GET arrives several
+times within a few milliseconds. Reads are keyed by (user id, path,
+normalized query params, data version): the first request computes and
+serializes the response, identical requests arriving meanwhile wait for it
+and reuse the same bytes. Nothing is kept once the computation finishes,
+so this is not a cache.
+
+The data version of a user ("activities:<id>" in shared_state) is bumped
+after every committed write of their activities, so a read started after
+a write never joins a computation started before it.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from config_fastapi import settings
+from responses import FastJSONResponse, negotiate_media_type, render_activity_rows
+from shared_state import get_shared_state
+
+
+def activities_version_key(user_id: int) -> str:
+    return f'activities:{user_id}'
+
+
+def get_data_version(user_id: int) -> int:
+    """Current version of the activities of `user_id`"""
+    return get_shared_state().get_version(activities_version_key(user_id))
+
+
+def bump_data_version(user_id: int) -> int:
+    """Mark the activities of `user_id` as changed (call after commit)"""
+    return get_shared_state().bump_version(activities_version_key(user_id))
+
+
+class _Call:
+    """A computation in progress and its outcome"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Run at most one computation per key at a time
+
+    Routes run in the threadpool, so followers block on a threading.Event
+    until the leader has finished.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Return func()'s result, shared with concurrent calls with the same key
+
+        Returns:
+            (result, shared): shared is True if another call computed it
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, False
+
+
+_flight = SingleFlight()
+
+
+def coalesced_response(
+    request: Request,
+    user_id: int,
+    compute: Callable[[], Any],
+    activity_rows: bool = False
+) -> Response:
+    """
+    JSON response for a read of the activities of `user_id`, shared with
+    identical concurrent requests
+
+    Args:
+        request: Incoming request (path and query params are part of the key)
+        user_id: Owner of the data being read
+        compute: Callable returning JSON-compatible content
+        activity_rows: compute returns a list of activities, served in the
+            wire format negotiated with the Accept header (responses.py)
+    """
+    if activity_rows:
+        media_type = negotiate_media_type(request)
+        render = lambda: render_activity_rows(compute(), media_type)
+        headers = {'Vary': 'Accept'}
+    else:
+        media_type = 'application/json'
+        render = lambda: FastJSONResponse(compute()).body
+        headers = None
+
+    if not settings.single_flight_enabled:
+        return Response(content=render(), media_type=media_type, headers=headers)
+
+    key = (
+        user_id,
+        request.url.path,
+        tuple(sorted(request.query_params.multi_items())),
+        media_type,
+        get_data_version(user_id),
+    )
+    body, _ = _flight.do(key, render)
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,62 @@
+"""
+Shared test fixtures
+
+The settings and the engines are created when the backend modules are
+imported, so the environment is set up here, before any import: every test
+run gets a temporary main database with two shards. Tests create their own
+users (unique usernames) instead of relying on a clean database.
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP_DIR = tempfile.mkdtemp(prefix='planner-tests-')
+
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(TMP_DIR, 'planner.db')}",
+    'SHARD_COUNT': '2',
+    'SHARD_PATH_TEMPLATE': os.path.join(TMP_DIR, 'planner_shard_{shard}.db'),
+    'SHARED_STATE_PATH': os.path.join(TMP_DIR, 'shared_state.db'),
+    'RATE_LIMIT_ENABLED': 'false',
+})
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+_usernames = itertools.count()
+
+
+@pytest.fixture(scope='session')
+def client():
+    """TestClient with the application lifespan (migrations, background workers)"""
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_user(client):
+    """Register a new user and return (user id, shard, auth headers)"""
+    import database
+    from models_fastapi import User
+
+    def make(prefix: str = 'user'):
+        username = f'{prefix}{next(_usernames)}'
+        client.post('/api/auth/register', json={
+            'username': username, 'email': f'{username}@example.com', 'password': 'secret1'
+        })
+        response = client.post('/api/auth/login', json={'username': username, 'password': 'secret1'})
+        body = response.json()
+        user_id = body['user']['id']
+        db = database.SessionLocal()
+        try:
+            shard = db.get(User, user_id).shard_key
+        finally:
+            db.close()
+        return user_id, shard, {'Authorization': f"Bearer {body['token']}"}
+    return make
@@ -0,0 +1,41 @@
+"""Activity CRUD endpoints"""
+from routers import activities
+
+
+def test_update_sets_end_date(client, make_user):
+    _, _, headers = make_user('update')
+    created = client.post('/api/activities', headers=headers, json={
+        'title': 'viaggio', 'date': '2030-05-10'
+    }).json()
+
+    response = client.put(f"/api/activities/{created['id']}", headers=headers, json={
+        'endDate': '2030-05-12', 'isMultiDay': True
+    })
+
+    assert response.status_code == 200, response.text
+    assert response.json()['endDate'] == '2030-05-12'
+    assert client.get(f"/api/activities/{created['id']}", headers=headers).json()['endDate'] == '2030-05-12'
+
+
+def test_update_rejects_end_date_before_start(client, make_user):
+    _, _, headers = make_user('update')
+    created = client.post('/api/activities', headers=headers, json={
+        'title': 'viaggio', 'date': '2030-05-10'
+    }).json()
+
+    response = client.put(f"/api/activities/{created['id']}", headers=headers, json={'endDate': '2030-05-09'})
+
+    assert response.status_code == 400
+
+
+def test_update_of_activity_deleted_meanwhile_is_not_found(client, make_user, monkeypatch):
+    _, _, headers = make_user('update')
+    created = client.post('/api/activities', headers=headers, json={
+        'title': 'viaggio', 'date': '2030-05-10'
+    }).json()
+    # Eliminata da un'altra richiesta tra la lettura e l'UPDATE
+    monkeypatch.setattr(activities, 'update_returning', lambda *args, **kwargs: None)
+
+    response = client.put(f"/api/activities/{created['id']}", headers=headers, json={'title': 'gita'})
+
+    assert response.status_code == 404
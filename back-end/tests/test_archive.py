@@ -0,0 +1,81 @@
+"""Archive tier: moving completed activities and reading them back"""
+from datetime import date
+
+from sqlalchemy import insert, select
+
+from archive import archive_activities
+from database import get_shard_session
+from models_fastapi import Activity, ArchivedActivity
+from partitions import archive_insert_table
+
+OLD_DATE = '2020-03-02'
+
+
+def _create(client, headers, title, day=OLD_DATE, status='fatta'):
+    response = client.post('/api/activities', headers=headers, json={
+        'title': title, 'date': day, 'status': status, 'priority': 'alta', 'category': 'archivio'
+    })
+    assert response.status_code == 201, response.text
+    return response.json()['id']
+
+
+def _ids(shard, model, user_id):
+    db = get_shard_session(shard)
+    try:
+        return set(db.scalars(select(model.id).where(model.user_id == user_id)))
+    finally:
+        db.close()
+
+
+def test_archive_round_trip_never_reuses_ids(client, make_user):
+    user_id, shard, headers = make_user('archive')
+    first = _create(client, headers, 'prima')
+    archive_activities()
+    assert _ids(shard, ArchivedActivity, user_id) == {first}
+
+    # Prima della migrazione 0010 SQLite riassegnava l'id più alto, appena archiviato
+    second = _create(client, headers, 'seconda')
+    assert second > first
+    archive_activities()
+
+    assert _ids(shard, ArchivedActivity, user_id) == {first, second}
+    assert _ids(shard, Activity, user_id) == set()
+
+
+def test_id_collision_keeps_both_rows(client, make_user):
+    user_id, shard, headers = make_user('collision')
+    live = _create(client, headers, 'attiva')
+
+    # Id già presente nell'archivio (riutilizzato prima della migrazione 0010)
+    db = get_shard_session(shard)
+    try:
+        db.execute(insert(archive_insert_table(db, 2019)).values(
+            id=live, title='archiviata', date=date(2019, 5, 1), status='fatta', priority='media', user_id=user_id
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+    assert archive_activities()['skipped'] >= 1
+    assert _ids(shard, Activity, user_id) == {live}
+    assert _ids(shard, ArchivedActivity, user_id) == {live}
+
+
+def test_list_views_include_archived_activities(client, make_user):
+    user_id, shard, headers = make_user('views')
+    archived = _create(client, headers, 'archiviata')
+    archive_activities()
+    current = _create(client, headers, 'recente', day=date.today().isoformat())
+    assert _ids(shard, ArchivedActivity, user_id) == {archived}
+
+    by_status = client.get('/api/activities/status/fatta', headers=headers).json()
+    assert {activity['id'] for activity in by_status} == {archived, current}
+
+    by_date = client.get(f'/api/activities/date/{OLD_DATE}', headers=headers).json()
+    assert [activity['id'] for activity in by_date] == [archived]
+
+    stats = client.get('/api/activities/stats', headers=headers).json()
+    assert stats['total'] == 2
+    assert stats['byStatus']['fatta'] == 2
+    assert stats['byPriority']['alta'] == 2
+    assert stats['byCategory'] == {'archivio': 2}
@@ -0,0 +1,80 @@
+"""Refresh-token rotation: one claim per token, reuse revokes the sessions"""
+import itertools
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from config_fastapi import settings
+from models_fastapi import RevokedToken
+from token_revocation import RevocationStore
+
+_usernames = itertools.count()
+
+
+def _login(client):
+    username = f'refresh{next(_usernames)}'
+    client.post('/api/auth/register', json={
+        'username': username, 'email': f'{username}@example.com', 'password': 'secret1'
+    })
+    return client.post('/api/auth/login', json={'username': username, 'password': 'secret1'}).json()
+
+
+def _me(client, tokens):
+    return client.get('/api/auth/me', headers={'Authorization': f"Bearer {tokens['token']}"}).status_code
+
+
+def test_refresh_token_is_rotated_once(client):
+    login = _login(client)
+
+    first = client.post('/api/auth/refresh', json={'refresh_token': login['refresh_token']})
+    second = client.post('/api/auth/refresh', json={'refresh_token': login['refresh_token']})
+
+    assert first.status_code == 200
+    assert second.status_code == 401
+    # Entro il periodo di tolleranza (altra scheda) la nuova sessione resta valida
+    assert _me(client, first.json()) == 200
+
+
+def test_reused_rotated_token_revokes_all_sessions(client, monkeypatch):
+    monkeypatch.setattr(settings, 'jwt_refresh_reuse_grace_seconds', 0)
+    login = _login(client)
+    rotated = client.post('/api/auth/refresh', json={'refresh_token': login['refresh_token']}).json()
+    time.sleep(0.01)
+
+    reused = client.post('/api/auth/refresh', json={'refresh_token': login['refresh_token']})
+
+    assert reused.status_code == 401
+    assert _me(client, rotated) == 401
+    assert client.post('/api/auth/refresh', json={'refresh_token': rotated['refresh_token']}).status_code == 401
+
+
+@pytest.fixture
+def store(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'revocations.db'}")
+    RevokedToken.__table__.create(bind=engine)
+    yield RevocationStore(sessionmaker(bind=engine))
+    engine.dispose()
+
+
+def test_concurrent_claims_of_the_same_token(store):
+    payload = {'jti': 'abc', 'user_id': 1, 'exp': time.time() + 60}
+    barrier = threading.Barrier(8)
+    results = []
+
+    def claim():
+        # Store distinti: come worker diversi, senza la lista in memoria comune
+        other = RevocationStore(store.session_factory)
+        barrier.wait()
+        results.append(other.claim_token(payload))
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False] * 7 + [True]
+    assert not store.claim_token(payload)
@@ -0,0 +1,46 @@
+"""Response compression of the negotiated wire formats"""
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+from compression import CompressionMiddleware
+from responses import COLUMNAR_MEDIA_TYPE, MSGPACK_MEDIA_TYPE
+
+
+@pytest.mark.parametrize('media_type, compressed', [
+    ('application/json', True),
+    (COLUMNAR_MEDIA_TYPE, True),
+    (MSGPACK_MEDIA_TYPE, True),
+    ('application/problem+json; charset=utf-8', True),
+    ('image/png', False),
+    ('text/event-stream', False),
+])
+def test_compressible_media_types(media_type, compressed):
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=10)
+
+    @app.get('/payload')
+    def payload():
+        return Response(b'x' * 2000, media_type=media_type)
+
+    response = TestClient(app).get('/payload', headers={'Accept-Encoding': 'gzip'})
+
+    assert (response.headers.get('content-encoding') == 'gzip') is compressed
+    assert response.content == b'x' * 2000
+
+
+def test_columnar_activity_list_is_compressed(client, make_user):
+    _, _, headers = make_user('columnar')
+    for index in range(20):
+        client.post('/api/activities', headers=headers, json={
+            'title': f'attività {index}', 'date': '2030-01-01', 'description': 'descrizione ' * 10
+        })
+
+    response = client.get('/api/activities', headers={
+        **headers, 'Accept': COLUMNAR_MEDIA_TYPE, 'Accept-Encoding': 'gzip'
+    })
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith(COLUMNAR_MEDIA_TYPE)
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.json()['count'] == 20
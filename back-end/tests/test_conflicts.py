@@ -0,0 +1,132 @@
+"""Interval index and overlap detection, checked against brute force"""
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import conflicts
+from conflicts import IntervalIndex, activity_interval, conflicts_in_range
+
+DAY = date(2030, 1, 1)
+
+
+def _activity(activity_id, day, start=None, end_day=None, end=None):
+    return {
+        'id': activity_id, 'date': day.isoformat(), 'time': start,
+        'endDate': end_day.isoformat() if end_day else None, 'endTime': end,
+    }
+
+
+def _random_activities(rng, count):
+    activities = []
+    for activity_id in range(1, count + 1):
+        day = DAY + timedelta(days=rng.randrange(4))
+        kind = rng.random()
+        if kind < 0.1:
+            # Tutto il giorno: nessun intervallo
+            activities.append(_activity(activity_id, day))
+            continue
+        start = f'{rng.randrange(24):02d}:{rng.choice((0, 15, 30, 45)):02d}'
+        if kind < 0.3:
+            activities.append(_activity(activity_id, day, start))
+        elif kind < 0.45:
+            # Più giorni, con o senza ora di fine
+            end_day = day + timedelta(days=rng.randrange(1, 3))
+            activities.append(_activity(activity_id, day, start, end_day, rng.choice((None, '08:00'))))
+        else:
+            end = f'{rng.randrange(24):02d}:{rng.choice((0, 30)):02d}'
+            activities.append(_activity(activity_id, day, start, None, end))
+    return activities
+
+
+def _random_range(rng):
+    start = datetime.combine(DAY, datetime.min.time()) + timedelta(minutes=rng.randrange(0, 5 * 24 * 60, 15))
+    return start, start + timedelta(minutes=rng.randrange(15, 2 * 24 * 60, 15))
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_overlapping_matches_brute_force(seed):
+    rng = random.Random(seed)
+    activities = _random_activities(rng, rng.randrange(0, 60))
+    index = IntervalIndex.from_activities(activities)
+    intervals = {activity['id']: activity_interval(activity) for activity in activities}
+
+    for _ in range(30):
+        start, end = _random_range(rng)
+        found = index.overlapping(start, end)
+        expected = {
+            activity_id for activity_id, interval in intervals.items()
+            if interval is not None and interval[0] < end and interval[1] > start
+        }
+        assert {item[2]['id'] for item in found} == expected
+        assert [item[0] for item in found] == sorted(item[0] for item in found)
+
+
+def test_overlapping_touching_intervals_do_not_overlap():
+    index = IntervalIndex.from_activities([
+        _activity(1, DAY, '09:00', None, '10:00'),
+        _activity(2, DAY, '10:00', None, '11:00'),
+    ])
+
+    assert [item[2]['id'] for item in index.overlapping(datetime(2030, 1, 1, 10), datetime(2030, 1, 1, 10, 30))] == [2]
+    assert index.overlapping(datetime(2030, 1, 1, 11), datetime(2030, 1, 1, 12)) == []
+
+
+def test_replace_matches_rebuilt_index():
+    rng = random.Random(7)
+    activities = _random_activities(rng, 40)
+    index = IntervalIndex.from_activities(activities)
+    moved = _activity(5, DAY, '12:00', None, '13:00')
+
+    replaced = index.replace(5, moved).replace(6, None)
+    rebuilt = IntervalIndex.from_activities(
+        [moved] + [activity for activity in activities if activity['id'] not in (5, 6)]
+    )
+    window = (datetime(2029, 12, 31), datetime(2030, 1, 8))
+    assert [item[2]['id'] for item in replaced.overlapping(*window)] == \
+        [item[2]['id'] for item in rebuilt.overlapping(*window)]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_conflicts_in_range_matches_brute_force(seed, monkeypatch):
+    rng = random.Random(seed)
+    activities = _random_activities(rng, rng.randrange(0, 40))
+    index = IntervalIndex.from_activities(activities)
+    monkeypatch.setattr(conflicts, 'get_conflict_index', lambda db, user_id: index)
+    timed = [(activity, activity_interval(activity)) for activity in activities if activity['time']]
+
+    for _ in range(10):
+        start, end = _random_range(rng)
+        found = conflicts_in_range(None, 1, start, end)
+
+        expected = set()
+        for i, (first, a) in enumerate(timed):
+            for second, b in timed[i + 1:]:
+                overlap_start, overlap_end = max(a[0], b[0], start), min(a[1], b[1], end)
+                if overlap_start < overlap_end:
+                    expected.add((frozenset((first['id'], second['id'])), overlap_start.isoformat(), overlap_end.isoformat()))
+        assert {
+            (frozenset(activity['id'] for activity in conflict['activities']), conflict['start'], conflict['end'])
+            for conflict in found
+        } == expected
+        assert len(found) == len(expected)
+        assert [conflict['start'] for conflict in found] == sorted(conflict['start'] for conflict in found)
+
+
+def test_conflicts_endpoint_reports_overlap_across_midnight(client, make_user):
+    _, _, headers = make_user('conflicts')
+    for title, day, start, end_day, end in (
+        ('notte', '2030-02-01', '22:00', '2030-02-02', '02:00'),
+        ('volo', '2030-02-02', '01:00', None, '03:00'),
+        ('colazione', '2030-02-02', '08:00', None, '09:00'),
+    ):
+        response = client.post('/api/activities', headers=headers, json={
+            'title': title, 'date': day, 'time': start, 'endDate': end_day, 'endTime': end,
+            'isMultiDay': end_day is not None
+        })
+        assert response.status_code == 201, response.text
+
+    found = client.get('/api/activities/conflicts?from=2030-02-01&to=2030-02-03', headers=headers).json()
+
+    assert [(conflict['start'], conflict['end']) for conflict in found] == [('2030-02-02T01:00:00', '2030-02-02T02:00:00')]
+    assert {activity['title'] for activity in found[0]['activities']} == {'notte', 'volo'}
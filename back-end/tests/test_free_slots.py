@@ -0,0 +1,111 @@
+"""Free slots within working hours, checked against a minute-by-minute scan"""
+import random
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from free_slots import compute_free_slots, merge_intervals
+
+DAY = date(2030, 3, 4)
+
+
+def _at(day_offset, hour, minute=0):
+    return datetime.combine(DAY + timedelta(days=day_offset), time(hour, minute))
+
+
+def _slots(busy, days=1, duration=30, work_start=time(9), work_end=time(18)):
+    result = compute_free_slots(
+        sorted(busy), DAY, DAY + timedelta(days=days - 1), timedelta(minutes=duration), work_start, work_end
+    )
+    return [(slot['start'], slot['end']) for slot in result]
+
+
+def _brute_force(busy, days, duration, work_start, work_end):
+    slots = []
+    for offset in range(days):
+        minute = datetime.combine(DAY + timedelta(days=offset), work_start)
+        window_end = datetime.combine(DAY + timedelta(days=offset), work_end)
+        run_start = None
+        while minute <= window_end:
+            free = minute < window_end and not any(start <= minute < end for start, end in busy)
+            if free and run_start is None:
+                run_start = minute
+            elif not free and run_start is not None:
+                if minute - run_start >= duration:
+                    slots.append((run_start.isoformat(), minute.isoformat()))
+                run_start = None
+            minute += timedelta(minutes=1)
+    return slots
+
+
+def test_busy_intervals_crossing_the_window_edges():
+    busy = [(_at(0, 8), _at(0, 10)), (_at(0, 17), _at(0, 19))]
+
+    assert _slots(busy) == [(_at(0, 10).isoformat(), _at(0, 17).isoformat())]
+
+
+def test_busy_interval_across_midnight():
+    # Dalle 20 alle 10 del giorno dopo: il primo giorno resta libero fino alle 18
+    busy = [(_at(0, 20), _at(1, 10))]
+
+    assert _slots(busy, days=2) == [
+        (_at(0, 9).isoformat(), _at(0, 18).isoformat()),
+        (_at(1, 10).isoformat(), _at(1, 18).isoformat()),
+    ]
+
+
+def test_multi_day_busy_interval_covers_whole_days():
+    busy = [(_at(0, 12), _at(2, 11))]
+
+    assert _slots(busy, days=3) == [
+        (_at(0, 9).isoformat(), _at(0, 12).isoformat()),
+        (_at(2, 11).isoformat(), _at(2, 18).isoformat()),
+    ]
+
+
+def test_gap_exactly_as_long_as_duration_is_kept():
+    busy = [(_at(0, 9), _at(0, 10)), (_at(0, 10, 30), _at(0, 18))]
+
+    assert _slots(busy, duration=30) == [(_at(0, 10).isoformat(), _at(0, 10, 30).isoformat())]
+    assert _slots(busy, duration=31) == []
+
+
+def test_merge_intervals_joins_touching_and_nested():
+    merged = merge_intervals([(_at(0, 9), _at(0, 10)), (_at(0, 10), _at(0, 11)), (_at(0, 9, 30), _at(0, 9, 45))])
+
+    assert merged == [(_at(0, 9), _at(0, 11))]
+
+
+@pytest.mark.parametrize('seed', range(25))
+def test_matches_minute_by_minute_scan(seed):
+    rng = random.Random(seed)
+    days = rng.randrange(1, 4)
+    work_start = time(rng.randrange(0, 12), rng.choice((0, 30)))
+    work_end = time(rng.randrange(work_start.hour + 1, 24), rng.choice((0, 30)))
+    duration = timedelta(minutes=rng.choice((15, 30, 60, 90)))
+    busy = []
+    for _ in range(rng.randrange(0, 12)):
+        # Anche prima del periodo, oltre la mezzanotte e su più giorni
+        start = _at(-1, 0) + timedelta(minutes=rng.randrange(0, (days + 1) * 24 * 60, 15))
+        busy.append((start, start + timedelta(minutes=rng.randrange(15, 30 * 60, 15))))
+
+    result = compute_free_slots(
+        sorted(busy), DAY, DAY + timedelta(days=days - 1), duration, work_start, work_end
+    )
+
+    assert [(slot['start'], slot['end']) for slot in result] == _brute_force(busy, days, duration, work_start, work_end)
+    assert all(slot['minutes'] * 60 == (datetime.fromisoformat(slot['end']) - datetime.fromisoformat(slot['start'])).total_seconds()
+               for slot in result)
+
+
+def test_free_slots_endpoint_with_activity_across_midnight(client, make_user):
+    _, _, headers = make_user('slots')
+    response = client.post('/api/activities', headers=headers, json={
+        'title': 'turno di notte', 'date': '2030-03-03', 'time': '22:00',
+        'endDate': '2030-03-04', 'endTime': '11:00', 'isMultiDay': True
+    })
+    assert response.status_code == 201, response.text
+
+    slots = client.get('/api/activities/free-slots?from=2030-03-04&to=2030-03-04&duration=60', headers=headers).json()
+
+    assert [(slot['start'], slot['end']) for slot in slots] == [('2030-03-04T11:00:00', '2030-03-04T18:00:00')]
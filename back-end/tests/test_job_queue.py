@@ -0,0 +1,152 @@
+"""Job queue: retries, backoff, lock expiry and unique jobs"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+import job_queue
+from config_fastapi import settings
+from job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue, job
+from models_fastapi import Job
+
+_calls = []
+
+
+@job('test.flaky')
+def _flaky(payload: dict) -> None:
+    _calls.append(payload)
+    raise RuntimeError('errore temporaneo')
+
+
+@job('test.slow')
+def _slow(payload: dict) -> None:
+    time.sleep(payload['seconds'])
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # Database separato: i worker dell'applicazione non prendono questi job
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Job.__table__.create(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _job(session_factory, job_id):
+    db = session_factory()
+    try:
+        return db.get(Job, job_id)
+    finally:
+        db.close()
+
+
+def _make_due(session_factory, job_id):
+    db = session_factory()
+    try:
+        db.execute(update(Job).where(Job.id == job_id).values(run_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_failed_job_is_retried_with_backoff_then_failed(session_factory):
+    queue = JobQueue(session_factory, retry_backoff=60)
+    job_id = queue.enqueue('test.flaky', {'n': 1}, max_attempts=2)
+
+    assert queue.run_next()
+    first = _job(session_factory, job_id)
+    assert (first.status, first.attempts) == (QUEUED, 1)
+    assert 'errore temporaneo' in first.last_error
+    assert timedelta(seconds=55) < first.run_at - datetime.utcnow() <= timedelta(seconds=60)
+    # In attesa del backoff: niente da eseguire
+    assert not queue.run_next()
+
+    _make_due(session_factory, job_id)
+    assert queue.run_next()
+    last = _job(session_factory, job_id)
+    assert (last.status, last.attempts, last.locked_until) == (FAILED, 2, None)
+    assert queue.stats()[FAILED] == 1
+
+
+def test_backoff_doubles_at_every_attempt(session_factory):
+    queue = JobQueue(session_factory, retry_backoff=10)
+    job_id = queue.enqueue('test.flaky', max_attempts=5)
+    delays = []
+    for _ in range(3):
+        _make_due(session_factory, job_id)
+        queue.run_next()
+        delays.append((_job(session_factory, job_id).run_at - datetime.utcnow()).total_seconds())
+
+    assert [round(delay) for delay in delays] == [10, 20, 40]
+
+
+def test_expired_lock_is_reclaimed_and_stale_finish_ignored(session_factory):
+    queue = JobQueue(session_factory, visibility_timeout=0.2)
+    job_id = queue.enqueue('test.slow', {'seconds': 0})
+
+    # Worker perso dopo il claim: nessun heartbeat
+    claimed = queue.claim()
+    assert claimed[0] == job_id
+    assert queue.claim() is None
+    time.sleep(0.3)
+
+    reclaimed = queue.claim()
+    assert reclaimed[0] == job_id and reclaimed[3] == 2
+    # Il primo worker non possiede più il job
+    assert not queue._finish(job_id, claimed[3], dict(status=DONE, locked_until=None))
+    assert _job(session_factory, job_id).status == RUNNING
+
+
+def test_heartbeat_keeps_long_jobs_locked(session_factory):
+    # Il job dura più del doppio del timeout: senza heartbeat verrebbe ripreso
+    queue = JobQueue(session_factory, visibility_timeout=0.9)
+    job_id = queue.enqueue('test.slow', {'seconds': 2})
+    other = JobQueue(session_factory, visibility_timeout=0.9)
+
+    worker = threading.Thread(target=queue.run_next)
+    worker.start()
+    while _job(session_factory, job_id).status != RUNNING:
+        time.sleep(0.01)
+    stolen = []
+    while worker.is_alive():
+        stolen.append(other.claim())
+        time.sleep(0.05)
+    worker.join()
+
+    assert not any(stolen)
+    finished = _job(session_factory, job_id)
+    assert (finished.status, finished.attempts) == (DONE, 1)
+
+
+def test_unique_job_is_enqueued_once(session_factory):
+    queue = JobQueue(session_factory)
+    barrier = threading.Barrier(8)
+    ids = []
+
+    def enqueue():
+        barrier.wait()
+        ids.append(queue.enqueue('test.slow', {'seconds': 0}, unique=True))
+
+    threads = [threading.Thread(target=enqueue) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len([job_id for job_id in ids if job_id is not None]) == 1
+    # Job non unici con lo stesso nome restano ammessi
+    assert queue.enqueue('test.slow', {'seconds': 0}) is not None
+
+    while queue.run_next():
+        pass
+    assert queue.enqueue('test.slow', {'seconds': 0}, unique=True) is not None
+
+
+def test_disabled_queue_rejects_unknown_jobs(monkeypatch):
+    monkeypatch.setattr(settings, 'job_queue_enabled', False)
+
+    with pytest.raises(LookupError, match='test.missing'):
+        job_queue.enqueue('test.missing')
@@ -0,0 +1,89 @@
+"""Native HMAC backend against python-jose/PyJWT, and the token cache"""
+import time
+
+import pytest
+
+from jwt_backends import JWTBackend, NativeHMACBackend, TokenCache, _b64encode, _json_dumps
+
+KEY = 'chiave-di-test'
+
+
+@pytest.fixture(params=['jose', 'pyjwt'])
+def reference(request):
+    # Solo le librerie installate
+    if request.param == 'jose':
+        pytest.importorskip('jose')
+        from jwt_backends import JoseBackend
+        return JoseBackend
+    pytest.importorskip('jwt')
+    from jwt_backends import PyJWTBackend
+    return PyJWTBackend
+
+
+def _claims(**extra):
+    now = int(time.time())
+    return {'user_id': 1, 'jti': 'abc', 'iat': now, 'exp': now + 60, **extra}
+
+
+def _unsigned(header: dict, payload: dict) -> str:
+    return f"{_b64encode(_json_dumps(header)).decode()}.{_b64encode(_json_dumps(payload)).decode()}."
+
+
+def _tampered(token: str) -> str:
+    header, _, signature = token.split('.')
+    return '.'.join((header, _b64encode(_json_dumps(_claims(user_id=2))).decode(), signature))
+
+
+def _both(reference, algorithm='HS256'):
+    return NativeHMACBackend(KEY, algorithm), reference(KEY, algorithm)
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        JWTBackend(KEY, 'HS256')
+
+
+@pytest.mark.parametrize('algorithm', ['HS256', 'HS384', 'HS512'])
+def test_tokens_are_interchangeable(reference, algorithm):
+    native, other = _both(reference, algorithm)
+    claims = _claims()
+
+    assert native.decode(other.encode(claims)) == claims
+    assert other.decode(native.encode(claims)) == claims
+
+
+@pytest.mark.parametrize('token', [
+    lambda other: other.encode(_claims(exp=int(time.time()) - 10)),
+    lambda other: other.encode(_claims(nbf=int(time.time()) + 60)),
+    lambda other: _tampered(other.encode(_claims())),
+    lambda other: type(other)('altra-chiave', 'HS256').encode(_claims()),
+    lambda other: type(other)(KEY, 'HS512').encode(_claims()),
+    lambda other: _unsigned({'alg': 'none', 'typ': 'JWT'}, _claims()),
+    lambda other: 'non.un.token',
+], ids=['expired', 'not-yet-valid', 'tampered', 'other-key', 'other-alg', 'alg-none', 'garbage'])
+def test_same_tokens_are_rejected(reference, token):
+    native, other = _both(reference)
+    value = token(other)
+
+    assert other.decode(value) is None
+    assert native.decode(value) is None
+
+
+def test_past_nbf_is_accepted(reference):
+    native, other = _both(reference)
+    claims = _claims(nbf=int(time.time()) - 10)
+
+    assert native.decode(other.encode(claims)) == claims == other.decode(native.encode(claims))
+
+
+def test_token_cache_respects_exp(monkeypatch):
+    cache = TokenCache(maxsize=2)
+    now = time.time()
+    cache.put('a', {'exp': now + 10})
+    cache.put('b', {'exp': now + 100})
+
+    assert cache.get('a') == {'exp': now + 10}
+    monkeypatch.setattr(time, 'time', lambda: now + 50)
+    assert cache.get('a') is None
+    assert cache.get('b') == {'exp': now + 100}
+    assert 'a' not in cache._entries
@@ -0,0 +1,54 @@
+"""Rate limit budgets and token buckets"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import rate_limit
+from rate_limit import RateLimitMiddleware, parse_budget
+
+
+def test_parse_budget():
+    assert parse_budget('10/minute') == (10 / 60, 10)
+    assert parse_budget('2/second') == (2, 2)
+
+
+@pytest.mark.parametrize('budget', ['0/minute', '-5/hour', 'inf/second', 'nan/minute', '10/day', 'dieci/minute'])
+def test_parse_budget_rejects_invalid_budgets(budget):
+    with pytest.raises(ValueError):
+        parse_budget(budget)
+
+
+class _SharedBuckets:
+    """Shared backend stub: one token, then Retry-After 5; records the calling thread"""
+
+    def __init__(self):
+        self.calls = []
+
+    def take_token(self, key, rate, capacity):
+        try:
+            asyncio.get_running_loop()
+            self.calls.append('event loop')
+        except RuntimeError:
+            self.calls.append('threadpool')
+        return 0.0 if len(self.calls) == 1 else 5.0
+
+
+def test_shared_buckets_are_taken_off_the_event_loop(monkeypatch):
+    shared = _SharedBuckets()
+    monkeypatch.setattr(rate_limit, 'get_shared_state', lambda: shared)
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, default='1/minute')
+
+    @app.get('/ping')
+    def ping():
+        return {'ok': True}
+
+    test_client = TestClient(app)
+    assert test_client.get('/ping').status_code == 200
+    response = test_client.get('/ping')
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '5'
+    assert shared.calls == ['threadpool', 'threadpool']
@@ -0,0 +1,168 @@
+"""Reminder scheduler: window and cap, schedule changes, skipped activities"""
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from reminders import ReminderScheduler
+
+
+class _Clock:
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self):
+        return self.value
+
+
+class _Sink:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+
+
+@pytest.fixture
+def make_scheduler():
+    def make(now, max_pending=100, window=timedelta(hours=6)):
+        clock = _Clock(now)
+        sink = _Sink()
+        scheduler = ReminderScheduler(
+            sink, lead=timedelta(minutes=10), window=window, max_pending=max_pending, refill_interval=60, now=clock
+        )
+        return scheduler, clock, sink
+    return make
+
+
+@pytest.fixture
+def add_activity(client, make_user):
+    # Date nel 2040: nessun altro test crea attività con orario in quei giorni
+    _, shard, headers = make_user('reminders')
+
+    def add(day, start, **fields):
+        response = client.post('/api/activities', headers=headers, json={
+            'title': f'attività {start}', 'date': day, 'time': start, **fields
+        })
+        assert response.status_code == 201, response.text
+        return response.json()['id']
+    add.shard = shard
+    add.headers = headers
+    return add
+
+
+def test_window_and_cap_with_many_activities_at_the_same_start(add_activity, make_scheduler):
+    same_start = {add_activity('2040-01-01', '10:00') for _ in range(5)}
+    later = {add_activity('2040-01-01', '11:00') for _ in range(3)}
+    add_activity('2040-01-02', '10:00')
+    scheduler, clock, sink = make_scheduler(datetime(2040, 1, 1, 8), max_pending=3)
+
+    # Oltre il limite ma tutti allo stesso inizio: caricati comunque, per avanzare
+    scheduler.refill()
+    assert scheduler.pending() == 5
+    assert scheduler.refill() == 0
+
+    clock.value = datetime(2040, 1, 1, 9, 50)
+    assert scheduler.run_pending() == 5
+    assert {event['activity_id'] for event in sink.events} == same_start
+
+    # Il giorno dopo è fuori dalla finestra di 6 ore
+    scheduler.refill()
+    assert set(key[1] for key in scheduler._starts) == later
+
+
+def test_schedule_respects_max_pending(add_activity, make_scheduler):
+    first = add_activity('2040-01-05', '10:00')
+    scheduler, clock, sink = make_scheduler(datetime(2040, 1, 5, 8), max_pending=1)
+    scheduler.refill()
+
+    second = add_activity('2040-01-05', '11:00')
+    scheduler.schedule(add_activity.shard, second, date(2040, 1, 5), time(11))
+    assert scheduler.pending() == 1
+
+    # Caricato da refill() quando si libera spazio
+    clock.value = datetime(2040, 1, 5, 9, 50)
+    scheduler.run_pending()
+    scheduler.refill()
+    assert list(scheduler._starts) == [(add_activity.shard, second)]
+    assert [event['activity_id'] for event in sink.events] == [first]
+
+
+def test_schedule_moves_and_cancels(add_activity, client, make_scheduler):
+    moved = add_activity('2040-02-01', '10:00')
+    cancelled = add_activity('2040-02-01', '10:30')
+    scheduler, clock, sink = make_scheduler(datetime(2040, 2, 1, 8))
+    scheduler.refill()
+
+    client.put(f'/api/activities/{moved}', headers=add_activity.headers, json={'time': '12:00'})
+    scheduler.schedule(add_activity.shard, moved, date(2040, 2, 1), time(12))
+    # Tolta dalla coda anche se nel database è ancora aperta
+    scheduler.schedule(add_activity.shard, cancelled, date(2040, 2, 1), None)
+
+    clock.value = datetime(2040, 2, 1, 10, 30)
+    assert scheduler.run_pending() == 0
+    clock.value = datetime(2040, 2, 1, 11, 50)
+    assert scheduler.run_pending() == 1
+    assert [event['start'] for event in sink.events] == ['2040-02-01T12:00:00']
+
+
+def test_deleted_and_completed_activities_are_skipped(add_activity, client, make_scheduler):
+    deleted = add_activity('2040-02-05', '10:00')
+    completed = add_activity('2040-02-05', '10:00')
+    add_activity('2040-02-05', '10:00', status='fatta')
+    scheduler, clock, sink = make_scheduler(datetime(2040, 2, 5, 8))
+    scheduler.refill()
+    assert scheduler.pending() == 2
+
+    client.delete(f'/api/activities/{deleted}', headers=add_activity.headers)
+    client.patch(f'/api/activities/{completed}/status', headers=add_activity.headers, json={'status': 'fatta'})
+    clock.value = datetime(2040, 2, 5, 9, 50)
+
+    assert scheduler.run_pending() == 0
+    assert sink.events == []
+
+
+def test_load_across_midnight(add_activity, make_scheduler):
+    before = add_activity('2040-03-01', '23:30')
+    after = add_activity('2040-03-02', '00:30')
+    add_activity('2040-03-02', '05:00')
+    scheduler, _, _ = make_scheduler(datetime(2040, 3, 1, 22), window=timedelta(hours=3))
+
+    rows = scheduler._load(add_activity.shard, datetime(2040, 3, 1, 23), datetime(2040, 3, 2, 1))
+    assert [row.id for row in rows] == [before, after]
+    # Inizio escluso, fine compresa
+    rows = scheduler._load(add_activity.shard, datetime(2040, 3, 1, 23, 30), datetime(2040, 3, 2, 0, 30))
+    assert [row.id for row in rows] == [after]
+
+    scheduler.refill()
+    assert set(key[1] for key in scheduler._starts) == {before, after}
+
+
+def test_schedule_during_refill_is_not_lost(add_activity, make_scheduler, monkeypatch):
+    moved = add_activity('2040-04-02', '10:00')
+    cancelled = add_activity('2040-04-01', '11:00')
+    scheduler, _, _ = make_scheduler(datetime(2040, 4, 1, 8))
+    load = scheduler._load
+
+    def load_then_schedule(*args, **kwargs):
+        rows = load(*args, **kwargs)
+        # Scritture confermate mentre refill() legge: oltre il vecchio limite
+        scheduler.schedule(add_activity.shard, moved, date(2040, 4, 1), time(12))
+        scheduler.schedule(add_activity.shard, cancelled, date(2040, 4, 1), None)
+        return rows
+    monkeypatch.setattr(scheduler, '_load', load_then_schedule)
+
+    scheduler.refill()
+
+    assert scheduler._starts == {(add_activity.shard, moved): datetime(2040, 4, 1, 12)}
+
+
+def test_stale_heap_entries_are_compacted(add_activity, make_scheduler):
+    activity = add_activity('2040-05-01', '10:00')
+    scheduler, _, _ = make_scheduler(datetime(2040, 5, 1, 8))
+    scheduler.refill()
+
+    for minute in range(1000):
+        scheduler.schedule(add_activity.shard, activity, date(2040, 5, 1), time(9 + minute % 5, minute % 60))
+
+    assert scheduler.pending() == 1
+    assert len(scheduler._heap) <= 2 * scheduler.pending() + 65
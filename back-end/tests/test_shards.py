@@ -0,0 +1,87 @@
+"""Schema of the secondary shards and cross-shard admin operations"""
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+import database
+from config_fastapi import settings
+from database import Base, SHARDED_TABLES, get_shard_engine, migrate_schema
+from db_migrations import get_current_revision, get_head_revision
+from models_fastapi import User
+
+
+def _user_on_shard(make_user, shard):
+    for _ in range(50):
+        user = make_user('sharded')
+        if user[1] == shard:
+            return user
+    pytest.fail(f'nessun utente assegnato allo shard {shard}')
+
+
+def _admin_headers(client, make_user):
+    user_id, _, _ = make_user('admin')
+    db = database.SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        user.is_admin = True
+        username = user.username
+        db.commit()
+    finally:
+        db.close()
+    token = client.post('/api/auth/login', json={'username': username, 'password': 'secret1'}).json()['token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_shards_are_migrated_to_head(client):
+    shard_engine = get_shard_engine(1)
+    assert get_current_revision(shard_engine) == get_head_revision()
+
+    schema = inspect(shard_engine)
+    # Solo le tabelle delle attività: utenti, job e token restano sul principale
+    assert not schema.has_table('users')
+    assert not schema.has_table('jobs')
+    assert 'priority_rank' in [column['name'] for column in schema.get_columns('activities')]
+    assert 'ix_activities_date_time' in [index['name'] for index in schema.get_indexes('activities')]
+
+
+def test_shard_created_before_alembic_is_adopted(tmp_path):
+    # Shard creato come prima: tabelle da Base.metadata, senza alembic_version
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy_shard.db'}")
+    for table in SHARDED_TABLES:
+        Base.metadata.tables[table].create(bind=legacy)
+    with legacy.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO activities (title, date, status, priority, user_id) "
+            "VALUES ('vecchia', '2030-01-01', 'da-fare', 'media', 1)"
+        ))
+
+    migrate_schema(legacy, shard=True)
+
+    assert get_current_revision(legacy) == get_head_revision()
+    with legacy.connect() as conn:
+        assert conn.execute(text("SELECT title FROM activities")).scalars().all() == ['vecchia']
+    legacy.dispose()
+
+
+def test_delete_user_removes_activities_on_their_shard(client, make_user):
+    user_id, shard, headers = _user_on_shard(make_user, 1)
+    created = client.post('/api/activities', headers=headers, json={
+        'title': 'da eliminare', 'date': '2030-01-01', 'status': 'da-fare', 'priority': 'media'
+    })
+    assert created.status_code == 201
+
+    response = client.delete(f'/api/admin/users/{user_id}', headers=_admin_headers(client, make_user))
+
+    assert response.status_code == 200
+    with get_shard_engine(shard).connect() as conn:
+        remaining = conn.execute(
+            text("SELECT COUNT(*) FROM activities WHERE user_id = :user_id"), {'user_id': user_id}
+        ).scalar()
+    assert remaining == 0
+
+
+def test_startup_fails_when_shard_count_is_lowered(client, make_user, monkeypatch):
+    _user_on_shard(make_user, 1)
+    monkeypatch.setattr(settings, 'shard_count', 1)
+
+    with pytest.raises(RuntimeError, match='shard_count'):
+        database.init_db()
@@ -0,0 +1,144 @@
+"""Token revocation list: by jti, by user cutoff, pruning and propagation"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+import token_revocation
+from models_fastapi import RevokedToken
+from token_revocation import RevocationStore
+
+
+class _Published:
+    """shared_state stub recording the published messages"""
+
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, channel, message):
+        self.messages.append((channel, message))
+
+
+@pytest.fixture
+def published(monkeypatch):
+    shared = _Published()
+    monkeypatch.setattr(token_revocation, 'get_shared_state', lambda: shared)
+    return shared
+
+
+@pytest.fixture
+def store(tmp_path, published):
+    engine = create_engine(f"sqlite:///{tmp_path / 'revocations.db'}")
+    RevokedToken.__table__.create(bind=engine)
+    yield RevocationStore(sessionmaker(bind=engine))
+    engine.dispose()
+
+
+def _payload(jti, user_id=1, iat=None, exp=None):
+    now = time.time()
+    return {'jti': jti, 'user_id': user_id, 'iat': iat or now, 'exp': exp or now + 900}
+
+
+def _rows(store):
+    db = store.session_factory()
+    try:
+        return set(db.execute(select(RevokedToken.jti)).scalars())
+    finally:
+        db.close()
+
+
+def test_revoke_by_jti(store):
+    revoked, other = _payload('a'), _payload('b')
+
+    store.revoke_token(revoked)
+
+    assert store.is_revoked(revoked)
+    assert not store.is_revoked(other)
+    assert _rows(store) == {'a'}
+
+
+def test_revoke_user_cuts_tokens_issued_before(store):
+    issued = time.time()
+    store.revoke_user(1, before=datetime.utcfromtimestamp(issued + 1))
+
+    assert store.is_revoked(_payload('old', iat=issued))
+    assert not store.is_revoked(_payload('new', iat=issued + 2))
+    assert not store.is_revoked(_payload('other', user_id=2, iat=issued))
+    assert _rows(store) == {'user:1'}
+
+
+def test_prune_drops_expired_entries(store):
+    expired, current = _payload('expired', exp=time.time() - 1), _payload('current')
+    store.revoke_token(expired)
+    store.revoke_token(current)
+    store.revoke_user(2, before=datetime.utcnow() - timedelta(days=31))
+
+    store.prune()
+
+    assert not store.is_revoked(expired)
+    assert store.is_revoked(current)
+    assert not store.is_revoked(_payload('old', user_id=2, iat=1))
+    assert _rows(store) == {'current'}
+
+
+def test_revocations_reach_other_workers(store, published):
+    other = RevocationStore(store.session_factory)
+    token = _payload('a')
+    store.revoke_token(token)
+    store.revoke_user(3)
+
+    for channel, message in published.messages:
+        assert channel == token_revocation.CHANNEL
+        other.on_message(message)
+
+    assert other.is_revoked(token)
+    assert other.is_revoked(_payload('old', user_id=3, iat=time.time() - 10))
+
+
+def test_load_restores_both_kinds(store):
+    token = _payload('a')
+    store.revoke_token(token)
+    store.revoke_user(4)
+
+    restarted = RevocationStore(store.session_factory)
+    restarted.load()
+
+    assert restarted.is_revoked(token)
+    assert restarted.revoked_at(token) == store.revoked_at(token)
+    assert restarted.is_revoked(_payload('old', user_id=4, iat=time.time() - 10))
+
+
+def _login(client, make_user):
+    _, _, headers = make_user('revoke')
+    username = client.get('/api/auth/me', headers=headers).json()['username']
+    login = client.post('/api/auth/login', json={'username': username, 'password': 'secret1'}).json()
+    return headers, login
+
+
+def test_logout_revokes_the_session(client, make_user):
+    other_session, login = _login(client, make_user)
+    headers = {'Authorization': f"Bearer {login['token']}"}
+
+    response = client.post('/api/auth/logout', headers=headers, json={'refresh_token': login['refresh_token']})
+
+    assert response.status_code == 200
+    assert client.get('/api/auth/me', headers=headers).status_code == 401
+    assert client.post('/api/auth/refresh', json={'refresh_token': login['refresh_token']}).status_code == 401
+    assert client.get('/api/auth/me', headers=other_session).status_code == 200
+
+
+def test_password_change_revokes_previous_tokens(client, make_user):
+    other_session, login = _login(client, make_user)
+    headers = {'Authorization': f"Bearer {login['token']}"}
+
+    response = client.put('/api/auth/change-password', headers=headers, json={
+        'current_password': 'secret1', 'new_password': 'secret2'
+    })
+
+    assert response.status_code == 200, response.text
+    assert client.get('/api/auth/me', headers=headers).status_code == 401
+    assert client.get('/api/auth/me', headers=other_session).status_code == 401
+    assert client.post('/api/auth/refresh', json={'refresh_token': login['refresh_token']}).status_code == 401
+    assert client.get('/api/auth/me', headers={'Authorization': f"Bearer {response.json()['token']}"}).status_code == 200
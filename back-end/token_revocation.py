@@ -0,0 +1,220 @@
+"""
+Revocation list for JWT access tokens
+
+Every token carries a `jti` claim. Revocations are kept in memory for O(1)
+checks on every request and persisted in the small `revoked_tokens` table:
+
+- single token (logout, rotated refresh token): keyed by its jti; the
+  revocation instant is kept in revoked_before. A refresh token is rotated
+  with claim_token(), a plain INSERT: of two concurrent refreshes with the
+  same token only one succeeds
+- all tokens of a user issued before a given instant (password change,
+  account deactivation): keyed by "user:<id>"
+
+Entries are only needed until the tokens they cover have expired, so they
+are pruned from memory and from the table by a periodic task. With several
+workers, revocations are propagated through shared_state pub/sub.
+"""
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config_fastapi import settings
+from models_fastapi import RevokedToken
+from periodic import PeriodicTask
+from shared_state import get_shared_state
+
+CHANNEL = 'token-revocations'
+
+
+def _timestamp(value: datetime) -> float:
+    # I datetime del database sono UTC naive
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+class RevocationStore:
+    """
+    In-memory revocation list backed by the revoked_tokens table
+
+    Args:
+        session_factory: Callable returning a new database Session
+    """
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+        self._tokens: Dict[str, Tuple[float, float]] = {}   # jti -> (revocato il, scadenza)
+        self._users: Dict[int, Tuple[float, float]] = {}    # user_id -> (revocati prima di, scadenza)
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Load the unexpired revocations from the database"""
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            db.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+            db.commit()
+            rows = db.execute(select(
+                RevokedToken.jti, RevokedToken.user_id,
+                RevokedToken.revoked_before, RevokedToken.expires_at
+            )).all()
+        finally:
+            db.close()
+
+        for jti, user_id, revoked_before, expires_at in rows:
+            if not jti.startswith('user:'):
+                # Righe precedenti senza istante di revoca: 0
+                self._add_token(jti, _timestamp(expires_at), _timestamp(revoked_before) if revoked_before else 0.0)
+            else:
+                self._add_user(user_id, _timestamp(revoked_before), _timestamp(expires_at))
+
+    def is_revoked(self, payload: dict) -> bool:
+        """O(1) check of a decoded token payload, without database access"""
+        jti = payload.get('jti')
+        if jti is not None and jti in self._tokens:
+            return True
+
+        user_cutoff = self._users.get(payload.get('user_id'))
+        return user_cutoff is not None and payload.get('iat', 0) <= user_cutoff[0]
+
+    def revoked_at(self, payload: dict) -> Optional[float]:
+        """When the token itself was revoked (timestamp), None if not revoked by jti"""
+        entry = self._tokens.get(payload.get('jti'))
+        return entry[0] if entry is not None else None
+
+    def revoke_token(self, payload: dict) -> None:
+        """Revoke a single token (e.g. on logout); no-op if already revoked"""
+        self._revoke(payload, claim=False)
+
+    def claim_token(self, payload: dict) -> bool:
+        """
+        Revoke a single token only if nobody did it before (refresh rotation)
+
+        Returns:
+            False if the token was already revoked, also by another worker
+        """
+        return self._revoke(payload, claim=True)
+
+    def _revoke(self, payload: dict, claim: bool) -> bool:
+        jti = payload.get('jti')
+        if jti is None:
+            return not claim
+
+        now = datetime.utcnow()
+        expires_at = float(payload['exp'])
+        if not self._persist(RevokedToken(
+            jti=jti,
+            user_id=payload.get('user_id'),
+            revoked_before=now,
+            expires_at=datetime.utcfromtimestamp(expires_at)
+        ), claim):
+            return False
+        self._add_token(jti, expires_at, _timestamp(now))
+        get_shared_state().publish(CHANNEL, {'jti': jti, 'exp': expires_at, 'at': _timestamp(now)})
+        return True
+
+    def revoke_user(self, user_id: int, before: Optional[datetime] = None) -> None:
+        """Revoke every token of `user_id` issued up to `before` (default: now)"""
+        before = before or datetime.utcnow()
+        # Oltre questa data tutti i token emessi prima di `before` (anche i
+        # refresh token) sono scaduti
+        expires_at = before + timedelta(days=settings.jwt_refresh_token_days)
+
+        self._persist(RevokedToken(
+            jti=f'user:{user_id}',
+            user_id=user_id,
+            revoked_before=before,
+            expires_at=expires_at
+        ))
+        self._add_user(user_id, _timestamp(before), _timestamp(expires_at))
+        get_shared_state().publish(CHANNEL, {
+            'user_id': user_id, 'before': _timestamp(before), 'exp': _timestamp(expires_at)
+        })
+
+    def prune(self) -> None:
+        """Drop the entries whose tokens have all expired"""
+        now = _timestamp(datetime.utcnow())
+        with self._lock:
+            self._tokens = {jti: entry for jti, entry in self._tokens.items() if entry[1] >= now}
+            self._users = {user_id: entry for user_id, entry in self._users.items() if entry[1] >= now}
+
+        db = self.session_factory()
+        try:
+            db.execute(delete(RevokedToken).where(RevokedToken.expires_at < datetime.utcnow()))
+            db.commit()
+        finally:
+            db.close()
+
+    def on_message(self, message: dict) -> None:
+        """Apply a revocation published by another worker"""
+        if 'jti' in message:
+            self._add_token(message['jti'], message['exp'], message.get('at', 0.0))
+        else:
+            self._add_user(message['user_id'], message['before'], message['exp'])
+
+    def _persist(self, entry: RevokedToken, claim: bool = False) -> bool:
+        """Save a revocation; with `claim` a plain INSERT, False if the row exists"""
+        db = self.session_factory()
+        try:
+            if claim:
+                db.add(entry)
+            else:
+                db.merge(entry)
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            if claim:
+                return False
+            raise
+        finally:
+            db.close()
+
+    def _add_token(self, jti: str, expires_at: float, revoked_at: float) -> None:
+        with self._lock:
+            self._tokens.setdefault(jti, (revoked_at, expires_at))
+
+    def _add_user(self, user_id: int, before: float, expires_at: float) -> None:
+        with self._lock:
+            current = self._users.get(user_id)
+            if current is None or before > current[0]:
+                self._users[user_id] = (before, expires_at)
+
+
+_store: Optional[RevocationStore] = None
+_store_lock = threading.Lock()
+_task: Optional[PeriodicTask] = None
+
+
+def get_revocation_store() -> RevocationStore:
+    """Return the process-wide revocation store, loading it on first use"""
+    global _store, _task
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                from database import SessionLocal
+
+                store = RevocationStore(SessionLocal)
+                store.load()
+                get_shared_state().subscribe(CHANNEL, store.on_message)
+                _task = PeriodicTask(
+                    'token-revocation-prune', settings.token_revocation_prune_seconds, store.prune
+                ).start()
+                _store = store
+
+    return _store
+
+
+def close_revocation_store() -> None:
+    """Stop the prune task (called on application shutdown)"""
+    global _store, _task
+
+    with _store_lock:
+        if _task is not None:
+            _task.stop()
+            _task = None
+        _store = None
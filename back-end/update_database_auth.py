@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Script per aggiornare il database con le nuove tabelle di autenticazione
+
+Deprecato: per il backend FastAPI lo schema è gestito dalle migrazioni
+Alembic (migrations/, `alembic upgrade head`).
 """
 
 import os
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Script per aggiornare il database con i nuovi campi per attività multi-giorno e multi-ora
+
+Deprecato: per il backend FastAPI lo schema è gestito dalle migrazioni
+Alembic (migrations/, `alembic upgrade head`).
 """
 
 import sqlite3
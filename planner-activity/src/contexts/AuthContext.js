@@ -1,4 +1,5 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
+import { authService, storeTokens, clearTokens, refreshAccessToken } from '../services/api';
 
 const AuthContext = createContext();
 
@@ -32,13 +33,18 @@ export const AuthProvider = ({ children }) => {
             const data = await response.json();
             setUser(data.user);
           } else {
-            // Token non valido, rimuovilo
-            localStorage.removeItem('token');
-            setToken(null);
+            // Access token scaduto: prova a rinnovarlo, altrimenti rimuovilo
+            try {
+              setToken(await refreshAccessToken());
+              return;
+            } catch (refreshError) {
+              clearTokens();
+              setToken(null);
+            }
           }
         } catch (error) {
           console.error('Errore nella verifica del token:', error);
-          localStorage.removeItem('token');
+          clearTokens();
           setToken(null);
         }
       }
@@ -48,6 +54,18 @@ export const AuthProvider = ({ children }) => {
     verifyToken();
   }, [token]);
 
+  // Rinnova l'access token prima della scadenza finché l'utente è collegato
+  useEffect(() => {
+    if (!user) {
+      return undefined;
+    }
+    const expiresIn = Number(localStorage.getItem('tokenExpiresIn')) || 900;
+    const interval = setInterval(() => {
+      refreshAccessToken().catch(() => {});
+    }, expiresIn * 800);
+    return () => clearInterval(interval);
+  }, [user]);
+
   const login = async (usernameOrEmail, password) => {
     try {
       const response = await fetch('http://localhost:5000/api/auth/login', {
@@ -66,7 +84,7 @@ export const AuthProvider = ({ children }) => {
       if (response.ok) {
         setToken(data.token);
         setUser(data.user);
-        localStorage.setItem('token', data.token);
+        storeTokens(data);
         return { success: true };
       } else {
         return { success: false, error: data.error };
@@ -95,7 +113,7 @@ export const AuthProvider = ({ children }) => {
       if (response.ok) {
         setToken(data.token);
         setUser(data.user);
-        localStorage.setItem('token', data.token);
+        storeTokens(data);
         return { success: true };
       } else {
         return { success: false, error: data.error };
@@ -105,16 +123,22 @@ export const AuthProvider = ({ children }) => {
     }
   };
 
-  const logout = () => {
+  const logout = async () => {
+    try {
+      // Revoca sul server access e refresh token, poi rimuove i token locali
+      await authService.logout();
+    } catch (error) {
+      console.error('Errore durante il logout:', error);
+    }
     setToken(null);
     setUser(null);
-    localStorage.removeItem('token');
   };
 
   const getAuthHeaders = () => {
     return {
       'Content-Type': 'application/json',
-      'Authorization': `Bearer ${token}`,
+      // Il token salvato può essere stato rinnovato in background
+      'Authorization': `Bearer ${localStorage.getItem('token') || token}`,
     };
   };
 
@@ -31,15 +31,83 @@ api.interceptors.request.use(
   }
 );
 
+// Salva i token restituiti da login, registrazione, refresh e cambio password
+export const storeTokens = (data) => {
+  localStorage.setItem('token', data.token);
+  if (data.refresh_token) {
+    localStorage.setItem('refreshToken', data.refresh_token);
+  }
+  if (data.expires_in) {
+    localStorage.setItem('tokenExpiresIn', String(data.expires_in));
+  }
+};
+
+export const clearTokens = () => {
+  localStorage.removeItem('token');
+  localStorage.removeItem('refreshToken');
+  localStorage.removeItem('tokenExpiresIn');
+};
+
+// Rinnova l'access token (di breve durata) con il refresh token.
+// Le richieste concorrenti condividono lo stesso rinnovo
+let refreshPromise = null;
+export const refreshAccessToken = () => {
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (!refreshToken) {
+    return Promise.reject(new Error('Refresh token mancante'));
+  }
+  if (!refreshPromise) {
+    refreshPromise = axios
+      .post(`${API_BASE_URL}/auth/refresh`, { refresh_token: refreshToken })
+      .then((response) => {
+        storeTokens(response.data);
+        return response.data.token;
+      })
+      .catch((error) => {
+        // Un'altra scheda ha già ruotato lo stesso refresh token: usa i suoi
+        const token = localStorage.getItem('token');
+        if (localStorage.getItem('refreshToken') !== refreshToken && token) {
+          return token;
+        }
+        throw error;
+      })
+      .finally(() => {
+        refreshPromise = null;
+      });
+  }
+  return refreshPromise;
+};
+
 // Interceptor per gestire gli errori globalmente
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const request = error.config;
+    
+    // Access token scaduto: rinnovalo e ripeti la richiesta una volta
+    if (
+      error.response?.status === 401 &&
+      request &&
+      !request._retried &&
+      request.url !== '/auth/login' &&
+      localStorage.getItem('refreshToken')
+    ) {
+      request._retried = true;
+      try {
+        const token = await refreshAccessToken();
+        request.headers.Authorization = `Bearer ${token}`;
+        return api(request);
+      } catch (refreshError) {
+        clearTokens();
+        return Promise.reject(error);
+      }
+    }
+    
     console.error('Errore API:', error.response?.data || error.message);
     
     // Se il token è scaduto o non valido, rimuovilo
     if (error.response?.status === 401) {
-      localStorage.removeItem('token');
+      clearTokens();
       // Potresti anche reindirizzare al login qui se necessario
     }
     
@@ -137,6 +205,38 @@ export const activityService = {
     }
   },
 
+  // Agenda: attività scadute, di oggi e prossime, già ordinate dal server
+  getAgenda: async (limit = 20) => {
+    try {
+      const response = await api.get('/activities/agenda', { params: { limit } });
+      return response.data;
+    } catch (error) {
+      throw new Error(`Errore nel recupero dell'agenda: ${error.response?.data?.error || error.message}`);
+    }
+  },
+
+  // Coppie di attività con orario sovrapposto tra due date (YYYY-MM-DD)
+  getConflicts: async (from, to) => {
+    try {
+      const response = await api.get('/activities/conflicts', { params: { from, to } });
+      return response.data;
+    } catch (error) {
+      throw new Error(`Errore nel recupero delle sovrapposizioni: ${error.response?.data?.error || error.message}`);
+    }
+  },
+
+  // Slot liberi di almeno `duration` minuti nell'orario di lavoro
+  getFreeSlots: async (from, to, duration = 60, workStart = '09:00', workEnd = '18:00') => {
+    try {
+      const response = await api.get('/activities/free-slots', {
+        params: { from, to, duration, work_start: workStart, work_end: workEnd }
+      });
+      return response.data;
+    } catch (error) {
+      throw new Error(`Errore nel recupero degli slot liberi: ${error.response?.data?.error || error.message}`);
+    }
+  },
+
   // Ottiene le statistiche delle attività
   getActivityStats: async () => {
     try {
@@ -210,11 +310,12 @@ export const authService = {
   // Logout
   logout: async () => {
     try {
-      await api.post('/auth/logout');
-      localStorage.removeItem('token');
+      const refreshToken = localStorage.getItem('refreshToken');
+      await api.post('/auth/logout', refreshToken ? { refresh_token: refreshToken } : undefined);
+      clearTokens();
     } catch (error) {
       // Anche se il logout fallisce, rimuoviamo il token localmente
-      localStorage.removeItem('token');
+      clearTokens();
       throw new Error('Errore durante il logout');
     }
   },
@@ -226,6 +327,10 @@ export const authService = {
         current_password: currentPassword,
         new_password: newPassword,
       });
+      // I token precedenti sono stati revocati: usa quelli nuovi
+      if (response.data.token) {
+        storeTokens(response.data);
+      }
       return response.data;
     } catch (error) {
       throw new Error(error.response?.data?.error || 'Errore nel cambio password');